@@ -0,0 +1,110 @@
+"""
+Micro benchmark for extract_year over publish_date strings as they appear in openlibrary edition records
+
+Compares the current regex extractor, with and without its memo, against the previous strptime version:
+
+    python benchmarks/extract_year.py --repeat 200
+"""
+
+import argparse
+import logging
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from calls.openlib import extract_year  # noqa: E402
+
+
+# publish_date values taken from editions of popular works, repeats are deliberate
+# as the same few dates turn up across hundreds of editions of a work
+EDITION_DATES = [
+    "1999",
+    "2003",
+    "2003",
+    "1996-05-01",
+    "2004/11/02",
+    "June 1, 1999",
+    "Jun 01, 1999",
+    "September 2003",
+    "Sep 2003",
+    "19 December 1999",
+    "19 Dec 1999",
+    "c1999",
+    "1999?",
+    "[1999]",
+    "[c1985]",
+    "1985, c1950",
+    "198-?",
+    "[19--]",
+    "18--",
+    "2006 printing",
+    "1st ed. 1985",
+    "Spring 2001",
+    "May 2006",
+    "2012-08",
+    "March 7, 2013",
+    "2013",
+    "2013",
+    "1866",
+    "1869",
+    "1991",
+]
+
+
+def legacy_extract_year(date_str: str) -> Optional[int]:
+    date_formats = [
+        "%Y",
+        "%Y-%m-%d",
+        "%Y/%m/%d",
+        "%B %d, %Y",
+        "%b %d, %Y",
+        "%d %B %Y",
+        "%d %b %Y",
+    ]
+
+    for fmt in date_formats:
+        try:
+            return datetime.strptime(date_str.strip(), fmt).year
+        except ValueError:
+            continue
+    logging.warning("Could not parse: %s", date_str)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="times to run over the corpus")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    corpus = EDITION_DATES * args.repeat
+
+    def run_legacy():
+        for date in corpus:
+            legacy_extract_year(date)
+
+    def run_uncached():
+        for date in corpus:
+            extract_year.__wrapped__(date)
+
+    def run_cached():
+        for date in corpus:
+            extract_year(date)
+
+    legacy_found = sum(legacy_extract_year(date) is not None for date in EDITION_DATES)
+    found = sum(extract_year(date) is not None for date in EDITION_DATES)
+    print(
+        f"{len(corpus):,} dates, parsed by strptime: {legacy_found}/{len(EDITION_DATES)}, regex: {found}/{len(EDITION_DATES)}"
+    )
+
+    for label, func in (("strptime", run_legacy), ("regex", run_uncached), ("regex + memo", run_cached)):
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{label:>13}: {seconds * 1000:8.2f}ms total, {seconds / len(corpus) * 1e6:6.2f}us per date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Throughput of OpenLibCaller._get_complete_book_data against replayed fixtures, with no network
+
+Record fixtures for some works first, then replay them with synthetic latency and errors:
+
+    books call --record data/fixtures -db OL45804W
+    python benchmarks/replay_complete_book_data.py --fixtures data/fixtures --latency 0.2 --error-rate 0.05
+
+Or generate synthetic fixtures for a number of works:
+
+    python benchmarks/replay_complete_book_data.py --synthetic 50 --latency 0.05 --jitter 0.02 --seed 1
+
+To load test the app or huey worker instead, serve the fixtures with `books stub` and set OPENLIB_ROOT_URL.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import median, quantiles
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from calls.client import Client  # noqa: E402
+from calls.openlib import OpenLibCaller  # noqa: E402
+from calls.replay import FixtureStore, ReplayTransport  # noqa: E402
+
+JSON_HEADERS = httpx.Headers({"content-type": "application/json"})
+
+
+def write_synthetic_fixtures(directory: Path, works: int) -> list[str]:
+    store = FixtureStore(directory)
+    caller = OpenLibCaller(client=Client(), pprint_results=False)
+    work_ids = [f"/works/OL{1000 + i}W" for i in range(works)]
+
+    for i, work_id in enumerate(work_ids):
+        work = {"key": work_id, "title": f"Work {i}", "authors": [{"author": {"key": f"/authors/OL{i}A"}}]}
+        editions = {
+            "size": 5,
+            "entries": [
+                {"isbn_13": [f"978{i:05d}{n:05d}"], "publishers": ["Penguin"], "publish_date": str(1950 + n)}
+                for n in range(5)
+            ],
+        }
+        search = {"num_found": 1, "docs": [{"key": work_id, "title": f"Work {i}", "first_publish_year": 1950}]}
+
+        store.save(caller.get_work_id_url(work_id), 200, JSON_HEADERS, json.dumps(work).encode())
+        store.save(caller.get_editions_url(work_id), 200, JSON_HEADERS, json.dumps(editions).encode())
+        search_url = f"{caller.search_url}?q=key:{work_id}&fields={caller.search_fields}"
+        store.save(search_url, 200, JSON_HEADERS, json.dumps(search).encode())
+
+    return work_ids
+
+
+def recorded_work_ids(directory: Path) -> list[str]:
+    work_ids = []
+    for path in sorted((directory / "works").glob("*.json")):
+        fixture = json.loads(path.read_text())
+        if fixture["status_code"] == 200:
+            work_ids.append(json.loads(fixture["content"])["key"])
+    return work_ids
+
+
+async def run(directory: Path, work_ids: list[str], args) -> list[float]:
+    transport = ReplayTransport(
+        directory, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed
+    )
+    client = Client(retry_delay=0.01, transport=transport)
+    caller = OpenLibCaller(client=client, pprint_results=False, max_concurrent_requests=args.concurrency)
+    timings = []
+
+    async def one(work_id: str) -> None:
+        start = time.perf_counter()
+        await caller._get_complete_book_data(work_id=work_id)
+        timings.append(time.perf_counter() - start)
+
+    for _ in range(args.rounds):
+        await asyncio.gather(*(one(work_id) for work_id in work_ids))
+
+    await client.close_session()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, help="directory of recorded fixtures")
+    parser.add_argument("--synthetic", type=int, help="generate fixtures for this many works instead")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=10, help="max concurrent requests for the caller")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    if args.synthetic:
+        directory = args.fixtures or Path(tempfile.mkdtemp(prefix="fixtures-"))
+        work_ids = write_synthetic_fixtures(directory, args.synthetic)
+    elif args.fixtures:
+        directory = args.fixtures
+        work_ids = recorded_work_ids(directory)
+    else:
+        parser.error("pass --fixtures or --synthetic")
+
+    if not work_ids:
+        parser.error(f"no works recorded in {directory}")
+
+    start = time.perf_counter()
+    # the search parser prints its results
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings = asyncio.run(run(directory, work_ids, args))
+    elapsed = time.perf_counter() - start
+
+    p95 = quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    print(f"{len(timings)} books in {elapsed:.2f}s, {len(timings) / elapsed:.1f} books/s")
+    print(f"per book: median {median(timings) * 1000:.1f}ms, p95 {p95 * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare search.json payload size and decode/parse time with and without field projection
+
+Needs network access to openlibrary.org, run from the project root:
+
+    python benchmarks/search_fields.py "charles dickens" --limit 10 --runs 5
+
+Or offline against a saved search.json response, projecting the docs locally:
+
+    python benchmarks/search_fields.py --from-file dickens.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from statistics import median
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from calls.client import Client  # noqa: E402
+from calls.openlib import SEARCH_FIELDS, OpenLibCaller  # noqa: E402
+
+
+def time_parse(content: bytes, limit: int, runs: int) -> tuple[float, float]:
+    """
+    Returns median json decode and parse times in ms
+    """
+    decode_times, parse_times = [], []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = json.loads(content)
+        decode_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            OpenLibCaller.parse_books_search_results(response, limit=limit)
+        parse_times.append(time.perf_counter() - start)
+
+    return median(decode_times) * 1000, median(parse_times) * 1000
+
+
+def project_response(content: bytes) -> bytes:
+    response = json.loads(content)
+    response["docs"] = [{k: v for k, v in doc.items() if k in SEARCH_FIELDS} for doc in response.get("docs", [])]
+    return json.dumps(response).encode()
+
+
+def fetch_payloads(query: str, limit: int, email: str) -> list[tuple[str, bytes]]:
+    caller = OpenLibCaller(client=Client(email=email), pprint_results=False)
+    projected_url = caller.get_general_query_url(query, limit=str(limit))
+    full_url = projected_url.replace(f"&fields={caller.search_fields}", "")
+
+    with httpx.Client(headers=caller.client.headers, timeout=30) as session:
+        return [
+            (label, session.get(url).content) for label, url in (("full docs", full_url), ("projected", projected_url))
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", nargs="?", help="search query to send to openlibrary")
+    parser.add_argument("--from-file", type=Path, help="saved search.json response to use instead of calling the api")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--email", default="", help="included in the user agent, as openlibrary asks")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    if args.from_file:
+        content = args.from_file.read_bytes()
+        payloads = [("full docs", content), ("projected", project_response(content))]
+    elif args.query:
+        payloads = fetch_payloads(args.query, args.limit, args.email)
+    else:
+        parser.error("pass a query or --from-file")
+
+    for label, content in payloads:
+        decode_ms, parse_ms = time_parse(content, args.limit, args.runs)
+        print(f"{label:>10}: {len(content):>9,} bytes, decode {decode_ms:7.3f}ms, parse {parse_ms:7.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Persistent sqlite cache for api responses
+
+The same file can be shared by the web app, huey worker and cli,
+so each operation opens its own short lived connection. Those are blocking calls,
+so the Client runs them in a thread rather than on the event loop.
+
+Hit and miss counters are kept in memory and added to the file every flush_interval seconds,
+so counting them doesn't need a write transaction on every request.
+
+Entries are keyed by the normalised url and params, and expire after a ttl
+set by the kind of endpoint. Stale entries are kept so they can be revalidated
+with the ETag or Last-Modified headers sent with the original response.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from calls.endpoints import endpoint_kind
+
+
+logger = logging.getLogger("app.calls")
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / "data" / "http_cache.db"
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+DEFAULT_TTLS = {
+    "search": HOUR,
+    "works": 7 * DAY,
+    "editions": 7 * DAY,
+    "authors": 30 * DAY,
+    "google": DAY,
+    "other": DAY,
+}
+
+STAT_NAMES = ("hits", "misses", "revalidated", "stored")
+
+
+@dataclass
+class CachedResponse:
+    data: Any
+    kind: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    expires_at: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def revalidation_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def make_cache_key(url: str, params: Optional[dict] = None, paths: Optional[Iterable[str]] = None) -> str:
+    """
+    Query values from the url and params are merged and sorted,
+    so the same request always gives the same key however it was built.
+
+    Streamed responses only hold the paths asked for, so those are kept separately from the full response.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query.extend((key, str(value)) for key, value in (params or {}).items())
+    query.sort()
+    fragment = ",".join(sorted(paths)) if paths else ""
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), fragment))
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str | Path,
+        ttls: Optional[dict[str, int]] = None,
+        timeout: float = 5.0,
+        flush_interval: float = 30.0,
+    ):
+        self.path = Path(path)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+
+        # counted from the event loop and flushed from whichever thread reads or writes next
+        self._counts: Counter[str] = Counter()
+        self._counts_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._create_tables()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_tables(self) -> None:
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0)")
+            conn.executemany("INSERT OR IGNORE INTO stats (name, count) VALUES (?, 0)", [(n,) for n in STAT_NAMES])
+
+    def ttl_for(self, url: str) -> int:
+        return self.ttls[endpoint_kind(url)]
+
+    """ Reading and writing entries """
+
+    def get(
+        self, url: str, params: Optional[dict] = None, paths: Optional[Iterable[str]] = None
+    ) -> Optional[CachedResponse]:
+        """
+        Returns the entry even if it has expired, check is_fresh before using it
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT body, kind, etag, last_modified, stored_at, expires_at FROM responses WHERE key = ?",
+                (make_cache_key(url, params, paths),),
+            ).fetchone()
+        self._flush_if_due()
+
+        if row is None:
+            return None
+
+        body, kind, etag, last_modified, stored_at, expires_at = row
+        return CachedResponse(
+            data=json.loads(body),
+            kind=kind,
+            etag=etag,
+            last_modified=last_modified,
+            stored_at=stored_at,
+            expires_at=expires_at,
+        )
+
+    def set(
+        self,
+        url: str,
+        params: Optional[dict],
+        data: Any,
+        headers: Optional[dict] = None,
+        paths: Optional[Iterable[str]] = None,
+    ) -> None:
+        headers = headers or {}
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO responses (key, kind, body, etag, last_modified, stored_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    make_cache_key(url, params, paths),
+                    endpoint_kind(url),
+                    json.dumps(data),
+                    headers.get("etag"),
+                    headers.get("last-modified"),
+                    now,
+                    now + self.ttl_for(url),
+                ),
+            )
+        self.record("stored")
+        self._flush_if_due()
+
+    def refresh(self, url: str, params: Optional[dict] = None, paths: Optional[Iterable[str]] = None) -> None:
+        """
+        Used after a 304 response, the stored body is still valid so start a new ttl
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE responses SET expires_at = ? WHERE key = ?",
+                (time.time() + self.ttl_for(url), make_cache_key(url, params, paths)),
+            )
+        self.record("revalidated")
+        self._flush_if_due()
+
+    """ Counters and maintenance """
+
+    def record(self, stat: str) -> None:
+        with self._counts_lock:
+            self._counts[stat] += 1
+
+    def flush(self) -> None:
+        """
+        Add the counts recorded since the last flush to the file
+        """
+        with self._counts_lock:
+            counts, self._counts = self._counts, Counter()
+            self._flushed_at = time.monotonic()
+        if not counts:
+            return
+
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE stats SET count = count + ? WHERE name = ?", [(n, stat) for stat, n in counts.items()]
+                )
+        except sqlite3.Error as exc:
+            logger.warning("could not write response cache counters, keeping them for the next flush: %s", exc)
+            with self._counts_lock:
+                self._counts.update(counts)
+
+    def _flush_if_due(self) -> None:
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        self.flush()
+        now = time.time()
+
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, count FROM stats").fetchall())
+            rows = conn.execute(
+                """
+                SELECT kind, COUNT(*), SUM(expires_at <= ?), SUM(LENGTH(body))
+                FROM responses
+                GROUP BY kind
+                ORDER BY kind
+                """,
+                (now,),
+            ).fetchall()
+
+        entries = {kind: {"entries": count, "expired": expired, "bytes": size} for kind, count, expired, size in rows}
+        return {"path": str(self.path), "counters": counters, "entries": entries}
+
+    def purge(self, expired_only: bool = False) -> int:
+        """
+        Returns number of entries deleted
+        """
+        with self._connect() as conn:
+            if expired_only:
+                cursor = conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            else:
+                cursor = conn.execute("DELETE FROM responses")
+                conn.execute("UPDATE stats SET count = 0")
+                with self._counts_lock:
+                    self._counts.clear()
+        logger.info("purged %s entries from response cache", cursor.rowcount)
+        return cursor.rowcount
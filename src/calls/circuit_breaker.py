@@ -0,0 +1,139 @@
+"""
+Circuit breakers for outgoing api calls
+
+Like the rate limits, breakers are kept per host at module level, so every Client in a process
+calling the same host sees the same state. An open breaker means calls to that host fail straight away,
+rather than waiting on retries against an api that is already struggling.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Any
+from urllib.parse import urlsplit
+
+
+logger = logging.getLogger("app.calls")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Tracks the last window calls to a host, a call fails if it errors or takes longer than slow_call_seconds.
+
+    Once at least min_calls have been made and failure_rate of them failed, the breaker opens
+    and calls are refused. After reset_timeout seconds it goes half open and lets a single probe through,
+    which closes the breaker if it succeeds or opens it again if it doesn't.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        window: int = 20,
+        min_calls: int = 10,
+        reset_timeout: float = 30.0,
+    ):
+        if not 0 < failure_rate <= 1:
+            raise ValueError("failure_rate must be greater than 0 and at most 1")
+        self.host = host
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min(min_calls, window)
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self.calls: deque[tuple[bool, float]] = deque(maxlen=window)
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.trips = 0
+        self.short_circuits = 0
+
+    def _set_state(self, state: str) -> None:
+        if state == self.state:
+            return
+
+        logger.warning("circuit for %s changed from %s to %s", self.host, self.state, state)
+        self.state = state
+
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.trips += 1
+        elif state == CLOSED:
+            self.calls.clear()
+
+    def allow_request(self) -> bool:
+        """
+        When half open one probe is allowed per reset_timeout, so a probe that never reports back can't wedge it
+        """
+        if self.state == CLOSED:
+            return True
+
+        now = time.monotonic()
+
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+
+        if self.state == HALF_OPEN and now - self.probe_started_at >= self.reset_timeout:
+            self.probe_started_at = now
+            logger.info("letting probe through to %s", self.host)
+            return True
+
+        self.short_circuits += 1
+        return False
+
+    def record(self, success: bool, latency: float) -> None:
+        failed = not success or latency > self.slow_call_seconds
+
+        if self.state == HALF_OPEN:
+            self.probe_started_at = 0.0
+            self._set_state(OPEN if failed else CLOSED)
+            return
+
+        self.calls.append((failed, latency))
+
+        if self.state == CLOSED and len(self.calls) >= self.min_calls:
+            failures = sum(failed for failed, _ in self.calls)
+            if failures / len(self.calls) >= self.failure_rate:
+                logger.warning(
+                    "%s of the last %s calls to %s failed or took over %ss",
+                    failures,
+                    len(self.calls),
+                    self.host,
+                    self.slow_call_seconds,
+                )
+                self._set_state(OPEN)
+
+    def stats(self) -> dict[str, Any]:
+        calls = len(self.calls)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": round(sum(failed for failed, _ in self.calls) / calls, 3) if calls else 0.0,
+            "mean_latency": round(sum(latency for _, latency in self.calls) / calls, 3) if calls else 0.0,
+            "trips": self.trips,
+            "short_circuits": self.short_circuits,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_host_breaker(url: str, **kwargs) -> CircuitBreaker:
+    """
+    The first settings used for a host are used by everything else calling that host
+    """
+    host = urlsplit(url).netloc.lower()
+    breaker = _breakers.get(host)
+
+    if breaker is None:
+        breaker = _breakers[host] = CircuitBreaker(host, **kwargs)
+    return breaker
+
+
+def circuit_breaker_stats() -> dict[str, dict[str, Any]]:
+    return {host: breaker.stats() for host, breaker in _breakers.items()}
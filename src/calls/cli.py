@@ -1,8 +1,15 @@
+import json
+import os
+import pprint
 import sys
 
+import uvicorn
+
+from calls.cache import DEFAULT_CACHE_PATH, ResponseCache
 from calls.client import Client
 from calls.google_books import GoogleBooksCaller
 from calls.openlib import OpenLibCaller
+from calls.replay import create_stub_app, make_transport
 
 
 def define_call_args(call_parser):
@@ -51,6 +58,35 @@ def define_call_args(call_parser):
         type=str,
         help="Must pass work id, then will collect complete book and author data for database.",
     )
+    call_parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="Read and store responses in the persistent response cache",
+    )
+    call_parser.add_argument(
+        "--isbns-file",
+        type=str,
+        help="File with an isbn on each line, looked up in batch with google books and printed as json lines",
+    )
+    call_parser.add_argument(
+        "--rate",
+        type=float,
+        default=5.0,
+        help="Most requests per second for batch lookups",
+    )
+    fixtures_group = call_parser.add_mutually_exclusive_group()
+    fixtures_group.add_argument(
+        "--record",
+        type=str,
+        metavar="DIR",
+        help="Save responses as fixtures in DIR, for replaying later",
+    )
+    fixtures_group.add_argument(
+        "--replay",
+        type=str,
+        metavar="DIR",
+        help="Answer calls from fixtures in DIR instead of the network",
+    )
     # mutual exclusive args, generally for single purpose
     group = call_parser.add_mutually_exclusive_group()
 
@@ -81,8 +117,98 @@ def define_call_args(call_parser):
     return call_parser
 
 
+def define_cache_args(cache_parser):
+    cache_parser.add_argument(
+        "-s",
+        "--stats",
+        action="store_true",
+        help="Show cache counters and entries by endpoint kind",
+    )
+    group = cache_parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--purge",
+        action="store_true",
+        help="Delete all cached responses and reset counters",
+    )
+    group.add_argument(
+        "--purge-expired",
+        action="store_true",
+        help="Delete cached responses that have passed their ttl",
+    )
+    return cache_parser
+
+
+def define_stub_args(stub_parser):
+    stub_parser.add_argument(
+        "-f",
+        "--fixtures",
+        type=str,
+        required=True,
+        help="Directory of fixtures recorded with call --record",
+    )
+    stub_parser.add_argument("--host", type=str, default="127.0.0.1")
+    stub_parser.add_argument("-p", "--port", type=int, default=8001)
+    stub_parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds added to every response",
+    )
+    stub_parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Latency varies by up to this many seconds either way",
+    )
+    stub_parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with a 503",
+    )
+    stub_parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed for latency and errors, to repeat the same run",
+    )
+    return stub_parser
+
+
+async def run_stub_server(args):
+    app = create_stub_app(
+        args.fixtures, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed
+    )
+    print(f"serving fixtures from {args.fixtures}, set OPENLIB_ROOT_URL=http://{args.host}:{args.port}")
+    await uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.port)).serve()
+
+
+def get_transport(args):
+    if args.record:
+        return make_transport("record", args.record)
+    if args.replay:
+        return make_transport("replay", args.replay)
+    return None
+
+
+def get_response_cache(use_cache: bool = True) -> ResponseCache | None:
+    if not use_cache:
+        return None
+    return ResponseCache(os.environ.get("OPENLIB_CACHE_PATH", DEFAULT_CACHE_PATH))
+
+
+def handle_cache_args(args):
+    cache = get_response_cache()
+
+    if args.purge or args.purge_expired:
+        deleted = cache.purge(expired_only=args.purge_expired)
+        print(f"deleted {deleted} cached responses")
+
+    if args.stats or not (args.purge or args.purge_expired):
+        pprint.pp(cache.stats())
+
+
 async def call_open_lib(args, email_address):
-    client = Client(email=email_address)
+    client = Client(email=email_address, cache=get_response_cache(args.use_cache), transport=get_transport(args))
     caller = OpenLibCaller(client=client)
 
     if args.open_lib_work_id is not None:
@@ -114,8 +240,28 @@ async def call_open_lib(args, email_address):
     await client.close_session()
 
 
+async def lookup_isbns_file(args):
+    with open(args.isbns_file) as f:
+        isbns = [line.strip() for line in f if line.strip()]
+
+    client = Client(
+        cache=get_response_cache(args.use_cache), transport=get_transport(args), requests_per_second=args.rate
+    )
+    caller = GoogleBooksCaller(client=client, pprint_results=False)
+
+    results = await caller.lookup_isbns(isbns)
+    for isbn, result in results.items():
+        print(json.dumps({"isbn": isbn, "result": result}))
+
+    await client.close_session()
+
+
 async def call_google_books(args):
-    client = Client()
+    if args.isbns_file:
+        await lookup_isbns_file(args)
+        sys.exit()
+
+    client = Client(cache=get_response_cache(args.use_cache), transport=get_transport(args))
     caller = GoogleBooksCaller(client=client)
 
     await caller.search_books(
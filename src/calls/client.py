@@ -4,65 +4,511 @@ httpx client for making async api calls
 
 import asyncio
 import logging
+import random
+import time
 import httpx
 
-from typing import Optional
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Iterable, Optional
+
+from calls.cache import CachedResponse, ResponseCache, make_cache_key
+from calls.circuit_breaker import CircuitBreaker, circuit_breaker_stats, get_host_breaker
+from calls.endpoints import endpoint_kind
+from calls.metrics import endpoint_metrics, get_endpoint_metrics
+from calls.rate_limit import get_host_limiter, rate_limit_stats
+from calls.streaming import stream_json, streaming_available
 
 logger = logging.getLogger("app.calls")
 
+# any other 4xx means the request itself is wrong, so trying again won't help
+RETRYABLE_CLIENT_ERRORS = {408, 429}
+
+# idempotent lookups that are safe to send twice, and worth it as a user is waiting on them
+HEDGED_KINDS = {"search", "works"}
+
+# recent latencies kept per endpoint kind, and how many are needed before hedging
+LATENCY_WINDOW = 100
+MIN_LATENCY_SAMPLES = 20
+
 
 class Client:
     def __init__(
         self,
         max_retries=3,
-        retry_delay=5,
+        retry_delay=1,
+        max_retry_delay=10,
+        deadline=20,
         timeout=10,
         email="",
+        cache: Optional[ResponseCache] = None,
+        requests_per_second: Optional[float] = None,
+        burst: int = 1,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        stream: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        breaker_failure_rate: Optional[float] = None,
+        breaker_slow_call_seconds: float = 5.0,
+        breaker_reset_timeout: float = 30.0,
+        hedge_percentile: Optional[float] = None,
+        hedge_max_ratio: float = 0.05,
     ) -> None:
+        """
+        retry_delay is the base for exponential backoff between attempts, capped at max_retry_delay.
+
+        deadline is the most time in seconds a single call to fetch_results can take, including retries.
+
+        requests_per_second and burst set a token bucket for each host called,
+        which is shared with any other Client in the process calling the same host.
+
+        Connections are pooled and kept alive for keepalive_expiry seconds between requests.
+        http2 needs the h2 package, installed with the http2 extra, and is ignored without it.
+
+        stream decodes responses incrementally when a caller passes paths to fetch_results,
+        keeping only those parts of the json. It needs ijson, installed with the streaming extra.
+
+        transport replaces the network, like the record and replay transports in calls.replay,
+        in which case the connection pool and http2 settings are not used.
+
+        breaker_failure_rate turns on a circuit breaker for each host, shared like the rate limits.
+        It opens when that fraction of recent attempts fail or take over breaker_slow_call_seconds,
+        then calls fail straight away, or use a stale cached response, until a probe after
+        breaker_reset_timeout seconds succeeds.
+
+        hedge_percentile, like 0.95, sends a second copy of search and works requests that haven't
+        returned within that percentile of recent latency, using whichever response comes first.
+        hedge_max_ratio caps the copies as a fraction of all requests.
+        """
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.deadline = deadline
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.breaker_failure_rate = breaker_failure_rate
+        self.breaker_slow_call_seconds = breaker_slow_call_seconds
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_ratio = hedge_max_ratio
+        self.latencies: defaultdict[str, deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
         self.timeout = httpx.Timeout(timeout, connect=5.0, read=5.0, write=5.0)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and http2_available()
+        if http2 and not self.http2:
+            logger.warning("http2 requested but h2 is not installed, using http/1.1")
+        self.transport = transport
+        self.stream = stream and streaming_available()
+        if stream and not self.stream:
+            logger.warning("streaming requested but ijson is not installed, decoding full responses")
         self.session: Optional[httpx.AsyncClient] = None
         self.email = email
         self.headers = {"User-Agent": f"booksanon {self.email}"}
+        self.cache = cache
+        self.counters: Counter[str] = Counter()
+        self._in_flight: dict[str, asyncio.Task] = {}
 
     async def start_session(self) -> httpx.AsyncClient:
         if self.session is None:
-            self.session = httpx.AsyncClient(headers=self.headers, timeout=self.timeout)
+            self.session = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self.transport,
+            )
         return self.session
 
     async def close_session(self) -> None:
         if self.session:
             await self.session.aclose()
             self.session = None
+        if self.cache:
+            await asyncio.to_thread(self.cache.flush)
 
     async def __aenter__(self):
-        self.session = httpx.AsyncClient(headers=self.headers)
+        await self.start_session()
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
-        await self.session.aclose()
+        await self.close_session()
+
+    async def warm_up(self, url: str) -> bool:
+        """
+        Open a pooled connection ahead of the first real request, so that doesn't pay for tls setup.
+
+        Failure is only logged, as the api being unreachable shouldn't stop the app starting.
+        """
+        session = await self.start_session()
+        try:
+            response = await session.head(url)
+        except httpx.HTTPError as exc:
+            logger.warning("unable to warm up connection to %s: %s", url, exc)
+            return False
+
+        logger.info("warmed up connection to %s, status %s, %s", url, response.status_code, response.http_version)
+        return True
+
+    async def fetch_results(self, url: str, params: dict = {}, paths: Optional[Iterable[str]] = None):
+        """
+        Identical requests made while one is already in flight wait on that request
+        rather than making their own, so callers can receive the same parsed json.
+
+        Results should be treated as read only.
+
+        paths, like entries.item.isbn_13, limit the result to those parts of the response when streaming.
+        Without streaming they are ignored and the full response is returned, so callers must handle both.
+        """
+        paths = tuple(sorted(paths)) if paths and self.stream else None
+        key = make_cache_key(url, params, paths)
+        task = self._in_flight.get(key)
+
+        if task is not None:
+            logger.debug("coalescing request to %s, with %s", url, params)
+            self.counters["coalesced"] += 1
+            get_endpoint_metrics(url).record_coalesced()
+        else:
+            task = asyncio.create_task(self._fetch_results(url, params, paths))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # shield so a cancelled caller does not cancel the request for everyone else waiting on it
+        return await asyncio.shield(task)
 
-    async def fetch_results(self, url: str, params: dict = {}):
+    async def _fetch_results(self, url: str, params: dict, paths: Optional[tuple[str, ...]] = None) -> Any:
         self.session = await self.start_session()
 
+        # sqlite calls block, so are kept off the event loop
+        cached = await asyncio.to_thread(self.cache.get, url, params, paths) if self.cache else None
+
+        if cached and cached.is_fresh:
+            logger.debug("cache hit for %s, with %s", url, params)
+            self.cache.record("hits")
+            return cached.data
+
+        if self.cache:
+            self.cache.record("misses")
+
+        request_kwargs: dict = {}
+        if params != {}:
+            request_kwargs["params"] = params
+        revalidation_headers = cached.revalidation_headers() if cached else {}
+        if revalidation_headers:
+            request_kwargs["headers"] = revalidation_headers
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        breaker = self.get_breaker(url)
+
         logger.info("making request to %s, with %s", url, params)
+        self.counters["requests"] += 1
+
         for attempt in range(1, self.max_retries + 1):
+            if breaker and not breaker.allow_request():
+                return self._short_circuit(url, cached)
+
+            retry_after = None
             try:
-                if params != {}:
-                    response = await self.session.get(url, params=params)
-                else:
-                    response = await self.session.get(url)
+                # each attempt is only allowed whatever is left of the overall deadline
+                response, data = await asyncio.wait_for(
+                    self._hedged_get(url, paths, **request_kwargs), deadline - loop.time()
+                )
 
                 if response.status_code == 200:
-                    return response.json()
+                    if self.cache:
+                        await asyncio.to_thread(self.cache.set, url, params, data, response.headers, paths)
+                    return data
+
+                if response.status_code == 304 and cached:
+                    logger.debug("cached response for %s is still valid", url)
+                    await asyncio.to_thread(self.cache.refresh, url, params, paths)
+                    return cached.data
 
                 logger.info(f"Attempt {attempt}: Received status {response.status_code}, {response}")
+
+                if not self.is_retryable(response.status_code):
+                    logger.warning(f"Not retrying {url}, status {response.status_code} will not succeed on retry")
+                    return None
+
+                if response.status_code in (429, 503):
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
             except httpx.HTTPError as exc:
-                logger.warning(f"HTTP Exception on attempt: {attempt} for {exc.request.url} - {exc}")
+                logger.warning(f"HTTP Exception on attempt: {attempt} for {url} - {exc}")
+            except asyncio.TimeoutError:
+                logger.warning(f"Attempt {attempt} for {url} ran past the {self.deadline}s deadline")
+                break
+
+            if attempt == self.max_retries:
+                break
+
+            delay = self.get_backoff_delay(attempt)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+
+            if loop.time() + delay >= deadline:
+                logger.warning(f"Not retrying {url}, waiting {delay:.1f}s would pass the {self.deadline}s deadline")
+                break
+
+            self.counters["retries"] += 1
+            get_endpoint_metrics(url).record_retry()
+            await asyncio.sleep(delay)
+
+        logger.warning(f"Failed to fetch data from {url}, after {attempt} attempts")
+        return None
+
+    async def _hedged_get(
+        self, url: str, paths: Optional[tuple[str, ...]] = None, **kwargs
+    ) -> tuple[httpx.Response, Any]:
+        delay = self.get_hedge_delay(url)
+        if delay is None:
+            return await self._rate_limited_get(url, paths, **kwargs)
+
+        sent = asyncio.Event()
+        primary = asyncio.create_task(self._rate_limited_get(url, paths, sent=sent, **kwargs))
+        tasks = {primary}
+        try:
+            # the delay starts once the primary has its rate limit token, so our own queue never triggers a hedge
+            waiting_to_send = asyncio.create_task(sent.wait())
+            try:
+                await asyncio.wait({primary, waiting_to_send}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiting_to_send.cancel()
+
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self._hedge_allowed(url):
+                return await primary
+
+            logger.info("no response from %s after %.3fs, sending hedged request", url, delay)
+            self.counters["hedges"] += 1
+            get_endpoint_metrics(url).record_hedge()
+            hedge = asyncio.create_task(self._rate_limited_get(url, paths, **kwargs))
+            tasks.add(hedge)
+
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                # a request that failed outright shouldn't beat one that is still going
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    if hedge in succeeded and primary not in succeeded:
+                        logger.info("hedged request to %s returned first", url)
+                        self.counters["hedge_wins"] += 1
+                        get_endpoint_metrics(url).record_hedge_win()
+                    return succeeded[0].result()
+                if not tasks:
+                    return done.pop().result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def get_hedge_delay(self, url: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a request to url, or None if it shouldn't be hedged
+        """
+        kind = endpoint_kind(url)
+        if self.hedge_percentile is None or kind not in HEDGED_KINDS:
+            return None
+        return self._latency_percentile(kind, self.hedge_percentile)
+
+    def _latency_percentile(self, kind: str, percentile: float) -> Optional[float]:
+        latencies = self.latencies[kind]
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return ordered[int(percentile * (len(ordered) - 1))]
+
+    def _hedge_allowed(self, url: str) -> bool:
+        if self.counters["hedges"] + 1 > self.hedge_max_ratio * self.counters["requests"]:
+            return False
+        # a hedge that has to wait for the rate limit would only add to the queue while we're already throttled
+        if self.requests_per_second and get_host_limiter(url, self.requests_per_second, self.burst).wait_time > 0:
+            return False
+        return True
+
+    def hedge_stats(self) -> dict[str, Any]:
+        """
+        How often hedged requests were sent and beat the original, and the current delay for each kind
+        """
+        return {
+            "hedges": self.counters["hedges"],
+            "hedge_wins": self.counters["hedge_wins"],
+            "delays": {
+                kind: self._latency_percentile(kind, self.hedge_percentile or 0.0)
+                for kind in HEDGED_KINDS & self.latencies.keys()
+            },
+        }
+
+    async def _rate_limited_get(
+        self, url: str, paths: Optional[tuple[str, ...]] = None, sent: Optional[asyncio.Event] = None, **kwargs
+    ) -> tuple[httpx.Response, Any]:
+        """
+        Returns the response, and its decoded json if the request was successful.
+
+        Latency is only measured once the request is through the rate limit, for the metrics and the
+        circuit breaker, so time spent waiting on our own rate limit isn't taken as the host being slow.
+        sent is set at that point too.
+        """
+        if self.requests_per_second:
+            waited = await get_host_limiter(url, self.requests_per_second, self.burst).acquire()
+            if waited:
+                logger.debug("waited %.3fs for rate limit before calling %s", waited, url)
+        if sent is not None:
+            sent.set()
 
-            if attempt < self.max_retries:
-                await asyncio.sleep(self.retry_delay)
+        metrics = get_endpoint_metrics(url)
+        breaker = self.get_breaker(url)
+        started = time.perf_counter()
+        try:
+            if paths is None:
+                response = await self.session.get(url, **kwargs)
+                num_bytes = len(response.content)
+                decode_started = time.perf_counter()
+                data = response.json() if response.status_code == 200 else None
+                decode_seconds = time.perf_counter() - decode_started
+            else:
+                async with self.session.stream("GET", url, **kwargs) as response:
+                    chunks = CountedChunks(response.aiter_bytes())
+                    decode_started = time.perf_counter()
+                    data = await stream_json(chunks, paths) if response.status_code == 200 else None
+                    # decoding is interleaved with reading the body, so leave out the time spent waiting on it
+                    decode_seconds = time.perf_counter() - decode_started - chunks.waited
+                    num_bytes = chunks.num_bytes
+        except httpx.HTTPError:
+            elapsed = time.perf_counter() - started
+            metrics.record_error(elapsed)
+            if breaker:
+                breaker.record(False, elapsed)
+            raise
+        except asyncio.CancelledError:
+            # cut off by the deadline or a hedge returning first, which only counts against the host if already slow
+            elapsed = time.perf_counter() - started
+            if breaker and elapsed > breaker.slow_call_seconds:
+                breaker.record(False, elapsed)
+            raise
 
-        logger.warning(f"Failed to fetch data from {url}, after {self.max_retries} attempts")
+        latency = time.perf_counter() - started - decode_seconds
+        metrics.record_response(response.status_code, latency, num_bytes, decode_seconds)
+        if breaker:
+            breaker.record(not self.is_retryable(response.status_code), latency)
+        if response.status_code in (200, 304):
+            self.latencies[endpoint_kind(url)].append(latency)
+        return response, data
+
+    def get_breaker(self, url: str) -> Optional[CircuitBreaker]:
+        if self.breaker_failure_rate is None:
+            return None
+        return get_host_breaker(
+            url,
+            failure_rate=self.breaker_failure_rate,
+            slow_call_seconds=self.breaker_slow_call_seconds,
+            reset_timeout=self.breaker_reset_timeout,
+        )
+
+    def _short_circuit(self, url: str, cached: Optional[CachedResponse]) -> Any:
+        self.counters["short_circuits"] += 1
+
+        if cached:
+            age = time.time() - cached.stored_at
+            logger.warning("circuit open for %s, using cached response from %.0fs ago", url, age)
+            return cached.data
+
+        logger.warning("circuit open for %s, failing without calling", url)
         return None
+
+    @staticmethod
+    def circuit_breaker_stats() -> dict[str, dict[str, Any]]:
+        """
+        State, recent failure rate and latency for each host with a circuit breaker in this process
+        """
+        return circuit_breaker_stats()
+
+    @staticmethod
+    def endpoint_metrics() -> dict[str, dict[str, Any]]:
+        """
+        Latency, status codes, retries, bytes and decode time for each kind of endpoint called in this process
+        """
+        return endpoint_metrics()
+
+    @staticmethod
+    def rate_limit_stats() -> dict[str, dict[str, Any]]:
+        """
+        Current wait time and queue depth for each host being rate limited in this process
+        """
+        return rate_limit_stats()
+
+    @staticmethod
+    def is_retryable(status_code: int) -> bool:
+        return status_code >= 500 or status_code in RETRYABLE_CLIENT_ERRORS
+
+    def get_backoff_delay(self, attempt: int) -> float:
+        """
+        Exponential backoff with jitter, so retries from concurrent callers don't arrive in step.
+
+        Returns between half and all of retry_delay * 2^(attempt - 1), capped at max_retry_delay.
+        """
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CountedChunks:
+    """
+    Wraps a response body iterator to count the bytes read, and the time spent waiting on them
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks
+        self.num_bytes = 0
+        self.waited = 0.0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        started = time.perf_counter()
+        try:
+            chunk = await self.chunks.__anext__()
+        finally:
+            self.waited += time.perf_counter() - started
+        self.num_bytes += len(chunk)
+        return chunk
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After can either be a number of seconds or a http date:
+
+    >>> parse_retry_after("120")
+    >>> 120.0
+    >>> parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT")
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.debug("unable to parse Retry-After header: %s", value)
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,255 @@
+"""
+Cover images, fetched from openlibrary covers and kept in a size limited disk cache
+
+The web app serves covers from the cache at /covers/{cover_id}-{size}.jpg, so pages don't depend on
+covers.openlibrary.org, and the huey worker prefetches them when a book is stored.
+
+Covers for an id never change, so cached files are never revalidated, only evicted least recently used
+once the cache passes max_bytes. The web app and huey worker can share the directory.
+Ids upstream has no cover for are remembered briefly, so the public route can't be used to hammer upstream.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Protocol
+
+import httpx
+
+
+logger = logging.getLogger("app.calls")
+
+COVER_SIZES = ("S", "M", "L")
+
+DEFAULT_COVERS_URL = "https://covers.openlibrary.org/b/id"
+
+
+class CoverUpstream(Protocol):
+    async def fetch(self, cover_id: int, size: str) -> Optional[bytes]: ...
+
+    async def close(self) -> None: ...
+
+
+class HttpCoverUpstream:
+    """
+    Fetches from covers.openlibrary.org, or anything serving the same paths, like a local stand-in
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_COVERS_URL,
+        email: str = "",
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"User-Agent": f"booksanon {email}"}
+        self.timeout = timeout
+        self.transport = transport
+        self.session: Optional[httpx.AsyncClient] = None
+
+    async def fetch(self, cover_id: int, size: str) -> Optional[bytes]:
+        if self.session is None:
+            self.session = httpx.AsyncClient(
+                headers=self.headers, timeout=self.timeout, transport=self.transport, follow_redirects=True
+            )
+
+        # without default=false a missing cover comes back as a blank placeholder image
+        url = f"{self.base_url}/{cover_id}-{size}.jpg"
+        try:
+            response = await self.session.get(url, params={"default": "false"})
+        except httpx.HTTPError as exc:
+            logger.warning("could not fetch cover %s: %s", url, exc)
+            return None
+
+        if response.status_code != 200:
+            logger.info("no cover at %s, status %s", url, response.status_code)
+            return None
+        return response.content
+
+    async def close(self) -> None:
+        if self.session:
+            await self.session.aclose()
+            self.session = None
+
+
+class CoverCache:
+    """
+    Least recently used covers are tracked in memory, loaded from file mtimes on start up,
+    so puts never need to scan the directory. Once past max_bytes, covers are evicted down to
+    low_water of max_bytes, so the next few puts don't have to evict again.
+
+    Its methods block on the filesystem, so CoverStore calls them in a thread.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = 500 * 1024 * 1024, low_water: float = 0.9):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # only an estimate when shared between processes, covers another process adds are picked up when read
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self._load_entries()
+
+    def _load_entries(self) -> None:
+        found = []
+        for path in self.directory.glob("*.jpg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, path.name, stat.st_size))
+
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+        self.size = sum(self.entries.values())
+
+    def path_for(self, cover_id: int, size: str) -> Path:
+        return self.directory / f"{cover_id}-{size}.jpg"
+
+    def get(self, cover_id: int, size: str) -> Optional[Path]:
+        path = self.path_for(cover_id, size)
+        try:
+            # access time is often turned off, so mtime records when a cover was last used
+            os.utime(path)
+            file_size = path.stat().st_size
+        except FileNotFoundError:
+            with self.lock:
+                self.size -= self.entries.pop(path.name, 0)
+            return None
+
+        with self.lock:
+            self._add(path.name, file_size)
+        return path
+
+    def put(self, cover_id: int, size: str, content: bytes) -> Path:
+        path = self.path_for(cover_id, size)
+
+        # written to a temp file first so a cover is never served half written
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self._add(path.name, len(content))
+        if self.size > self.max_bytes:
+            self.evict()
+        return path
+
+    def _add(self, name: str, size: int) -> None:
+        self.size += size - self.entries.pop(name, 0)
+        self.entries[name] = size
+
+    def evict(self) -> int:
+        """
+        Delete least recently used covers until under low_water of max_bytes, returns number deleted
+        """
+        target = self.max_bytes * self.low_water
+        evicted = []
+
+        with self.lock:
+            while self.entries and self.size > target:
+                name, size = self.entries.popitem(last=False)
+                self.size -= size
+                evicted.append(name)
+
+        for name in evicted:
+            (self.directory / name).unlink(missing_ok=True)
+
+        logger.info("evicted %s covers, cache is now %s bytes", len(evicted), self.size)
+        return len(evicted)
+
+
+class CoverStore:
+    def __init__(
+        self,
+        cache: CoverCache,
+        upstream: CoverUpstream,
+        max_concurrent_requests: int = 5,
+        miss_ttl: float = 300.0,
+        max_misses: int = 10_000,
+    ):
+        """
+        Covers upstream doesn't have are remembered for miss_ttl seconds, so repeated requests
+        for a bad cover id aren't all sent on to upstream. At most max_misses are kept, oldest dropped first.
+        """
+        self.cache = cache
+        self.upstream = upstream
+        self.semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.miss_ttl = miss_ttl
+        self.max_misses = max_misses
+        self._misses: OrderedDict[tuple[int, str], float] = OrderedDict()
+        self._in_flight: dict[tuple[int, str], asyncio.Task] = {}
+
+    async def get(self, cover_id: int, size: str = "M") -> Optional[Path]:
+        """
+        Path to the cached cover, fetching it first if needed, or None if there isn't one
+        """
+        if size not in COVER_SIZES:
+            raise ValueError(f"cover size must be one of {COVER_SIZES}, not {size}")
+
+        path = await asyncio.to_thread(self.cache.get, cover_id, size)
+        if path is not None:
+            return path
+
+        key = (cover_id, size)
+        if self._is_known_miss(key):
+            return None
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(cover_id, size))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, cover_id: int, size: str) -> Optional[Path]:
+        async with self.semaphore:
+            content = await self.upstream.fetch(cover_id, size)
+        if not content:
+            self._add_miss((cover_id, size))
+            return None
+        return await asyncio.to_thread(self.cache.put, cover_id, size, content)
+
+    def _is_known_miss(self, key: tuple[int, str]) -> bool:
+        expires_at = self._misses.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._misses[key]
+            return False
+        return True
+
+    def _add_miss(self, key: tuple[int, str]) -> None:
+        self._misses.pop(key, None)
+        self._misses[key] = time.monotonic() + self.miss_ttl
+        while len(self._misses) > self.max_misses:
+            self._misses.popitem(last=False)
+
+    async def prefetch(self, cover_ids: Iterable[Optional[int | str]], sizes: Iterable[str] = ("M",)) -> int:
+        """
+        Fetch covers ahead of them being shown, returns how many are now cached
+        """
+        ids = {int(cover_id) for cover_id in cover_ids if cover_id and str(cover_id).isdigit()}
+        # a missing cover shouldn't stop the others, or whatever the caller does next
+        paths = await asyncio.gather(
+            *(self.get(cover_id, size) for cover_id in ids for size in sizes), return_exceptions=True
+        )
+        for error in (path for path in paths if isinstance(path, Exception)):
+            logger.warning("error prefetching cover: %s", error)
+
+        cached = sum(isinstance(path, Path) for path in paths)
+        logger.info("prefetched %s of %s covers", cached, len(paths))
+        return cached
+
+    async def close(self) -> None:
+        await self.upstream.close()
@@ -0,0 +1,32 @@
+"""
+Classification of upstream urls by the kind of resource they return
+"""
+
+from urllib.parse import urlsplit
+
+
+def endpoint_kind(url: str) -> str:
+    """
+    Group urls so behaviour, like cache ttls, can be set per type of call:
+
+    >>> endpoint_kind("https://openlibrary.org/search.json?q=dickens")
+    >>> "search"
+    >>> endpoint_kind("https://openlibrary.org/works/OL45804W/editions.json")
+    >>> "editions"
+    """
+    parts = urlsplit(url)
+
+    if parts.netloc.endswith("googleapis.com"):
+        return "google"
+
+    path = parts.path
+
+    if path.endswith("/search.json") or path.startswith("/search/"):
+        return "search"
+    if path.endswith("/editions.json"):
+        return "editions"
+    if path.startswith("/works/"):
+        return "works"
+    if path.startswith("/authors/"):
+        return "authors"
+    return "other"
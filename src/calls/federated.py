@@ -0,0 +1,143 @@
+"""
+Book search across OpenLibrary and Google Books, so searches don't depend on a single api
+
+Google Books results are built from their volumes with GoogleBooksCaller.parse_volume, in the same shape
+as OpenLibCaller.search_books, so they don't depend on OpenLibrary being up. They have no OpenLibrary work key,
+so they carry their isbns instead, and a review submitted for one is mapped to a work by the huey worker.
+
+Modes:
+
+- openlib, only call OpenLibrary
+- first, call both and use whichever gives results first
+- merge, call both and combine whatever has come back within the latency budget, OpenLibrary results first
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from calls.google_books import GoogleBooksCaller
+from calls.openlib import OpenLibCaller
+
+
+logger = logging.getLogger("app.calls")
+
+SEARCH_MODES = ("openlib", "first", "merge")
+
+
+class FederatedSearcher:
+    def __init__(
+        self,
+        openlib_caller: OpenLibCaller,
+        google_caller: GoogleBooksCaller,
+        mode: str = "openlib",
+        latency_budget: float = 5.0,
+    ):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"search mode must be one of {SEARCH_MODES}, not {mode}")
+        self.openlib_caller = openlib_caller
+        self.google_caller = google_caller
+        self.mode = mode
+        self.latency_budget = latency_budget
+
+    async def search_books(self, search_query: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        if self.mode == "openlib":
+            return await self.openlib_caller.search_books(search_query=search_query, limit=limit)
+
+        tasks = {
+            asyncio.create_task(self.openlib_caller.search_books(search_query=search_query, limit=limit)): "openlib",
+            asyncio.create_task(self.search_google(search_query, limit=limit)): "google",
+        }
+        start = time.perf_counter()
+
+        try:
+            if self.mode == "first":
+                results = await self._first_results(tasks)
+            else:
+                results = await self._merged_results(tasks, limit)
+        finally:
+            # the client keeps shared requests running, so anything cancelled here can still fill the cache
+            for task in tasks:
+                task.cancel()
+
+        logger.info("federated search for %s took %.3fs", search_query, time.perf_counter() - start)
+        return results or None
+
+    async def search_google(self, search_query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        items = await self.google_caller.search_books(search_query=search_query, limit=limit)
+        books = [book_from_volume(self.google_caller.parse_volume(item)) for item in items or []]
+        # without an isbn there is nothing to find the openlibrary work with, so it can't be reviewed
+        return [book for book in books if book["isbns_13"] or book["isbns_10"]]
+
+    async def _first_results(self, tasks: Dict[asyncio.Task, str]) -> Optional[List[Dict[str, Any]]]:
+        pending = set(tasks)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.latency_budget
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                logger.warning("no search results within %ss from %s", self.latency_budget, sorted(tasks.values()))
+                return None
+
+            # openlib first if both finished together
+            for task in (task for task in tasks if task in done):
+                results = self._task_results(task, tasks[task])
+                if results:
+                    logger.info("using search results from %s", tasks[task])
+                    return results
+        return None
+
+    async def _merged_results(self, tasks: Dict[asyncio.Task, str], limit: int) -> List[Dict[str, Any]]:
+        done, pending = await asyncio.wait(tasks, timeout=self.latency_budget)
+        if pending:
+            logger.warning("merging search results without %s", sorted(tasks[task] for task in pending))
+
+        merged: Dict[str, Dict[str, Any]] = {}
+        titles: set[str] = set()
+        for task, source in tasks.items():
+            if task not in done:
+                continue
+            for book in self._task_results(task, source):
+                key = book["openlib_work_key"]
+                if not key:
+                    # google books results can only be matched on title and first author
+                    key = title_key(book)
+                    if key in titles:
+                        continue
+                merged.setdefault(key, book)
+                titles.add(title_key(book))
+
+        return list(merged.values())[:limit]
+
+    @staticmethod
+    def _task_results(task: asyncio.Task, source: str) -> List[Dict[str, Any]]:
+        exc = task.exception()
+        if exc is not None:
+            logger.warning("search from %s failed: %s", source, exc)
+            return []
+        return task.result() or []
+
+
+def book_from_volume(volume: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A google books volume, as given by parse_volume, in the shape of an OpenLibrary search result
+    """
+    return {
+        "title": volume["title"],
+        "author_names": volume["author_names"],
+        "author_keys": [],
+        "first_publish_year": volume["published_year"] or "Unknown",
+        "openlib_work_key": "",
+        "cover_id": [None],
+        "isbns_13": volume["isbns_13"],
+        "isbns_10": volume["isbns_10"],
+    }
+
+
+def title_key(book: Dict[str, Any]) -> str:
+    author = next(iter(book.get("author_names") or []), "")
+    return f"{book.get('title', '').casefold()}|{author.casefold()}"
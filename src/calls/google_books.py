@@ -1,17 +1,27 @@
+import asyncio
 import logging
 import pprint
+from typing import Any, Dict, List, Optional, Tuple
 
 from calls.client import Client
 
 
 logger = logging.getLogger("app.calls")
 
+# only the parts of each volume parse_volume reads
+LOOKUP_FIELDS = "items(id,volumeInfo(title,authors,publishedDate,industryIdentifiers,imageLinks/thumbnail))"
+
 
 class GoogleBooksCaller:
-    def __init__(self, client: Client, pprint_results: bool = True):
+    def __init__(self, client: Client, pprint_results: bool = True, max_concurrent_requests: int = 10):
         self.client = client
         self.pprint: bool = pprint_results
         self.base_url = "https://www.googleapis.com/books/v1/volumes"
+        self.semaphore = asyncio.Semaphore(max_concurrent_requests)
+
+    async def fetch_with_semaphore(self, url: str, params: dict):
+        async with self.semaphore:
+            return await self.client.fetch_results(url, params=params)
 
     async def search_books(self, search_query=None, title=None, author=None, isbn=None, limit=5):
         params = {
@@ -38,7 +48,10 @@ class GoogleBooksCaller:
         params["q"] = "+".join(query_terms)
         search_url = self.base_url
 
-        response = await self.client.fetch_results(search_url, params=params)
+        response = await self.fetch_with_semaphore(search_url, params)
+        if not response:
+            logger.warning("no response from google books for %s", params["q"])
+            return []
 
         results = response.get("items", [])
         logger.info("Google Books Search Results:")
@@ -63,5 +76,74 @@ class GoogleBooksCaller:
             logger.info(f"Cover Link: {image_links.get('thumbnail')}")
             logger.info(f"API ID: {item.get('id')}")
 
-        pprint.pp(results)
+        if self.pprint:
+            pprint.pp(results)
         return results
+
+    """ Batch lookups """
+
+    async def lookup_isbns(self, isbns: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Look up many isbns concurrently, up to max_concurrent_requests at once and within the client's rate limit.
+
+        Returns the best match for each isbn as given by parse_volume, or None if nothing was found.
+        """
+        unique = list(dict.fromkeys(isbn.replace("-", "").strip() for isbn in isbns if isbn.strip()))
+        results = await asyncio.gather(*(self._lookup(f"isbn:{isbn}") for isbn in unique))
+        logger.info("looked up %s isbns, found %s", len(unique), sum(result is not None for result in results))
+        return dict(zip(unique, results))
+
+    async def lookup_titles(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[Dict[str, Any]]]:
+        """
+        Same as lookup_isbns, for (title, author) pairs
+        """
+        unique = list(dict.fromkeys(pairs))
+        results = await asyncio.gather(
+            *(
+                self._lookup(f"intitle:{title}+inauthor:{author}" if author else f"intitle:{title}")
+                for title, author in unique
+            )
+        )
+        logger.info("looked up %s titles, found %s", len(unique), sum(result is not None for result in results))
+        return dict(zip(unique, results))
+
+    async def _lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        params = {"q": query, "maxResults": 1, "printType": "books", "fields": LOOKUP_FIELDS}
+        response = await self.fetch_with_semaphore(self.base_url, params)
+        items = (response or {}).get("items", [])
+
+        if not items:
+            logger.debug("no google books result for %s", query)
+            return None
+        return self.parse_volume(items[0])
+
+    @staticmethod
+    def parse_volume(item: Dict[str, Any]) -> Dict[str, Any]:
+        volume_info = item.get("volumeInfo", {})
+        identifiers = volume_info.get("industryIdentifiers", [])
+
+        return {
+            "google_id": item.get("id"),
+            "title": volume_info.get("title", ""),
+            "author_names": volume_info.get("authors", []),
+            "published_year": volume_info.get("publishedDate", "").split("-")[0] or None,
+            "isbns_13": [id_data["identifier"] for id_data in identifiers if id_data.get("type") == "ISBN_13"],
+            "isbns_10": [id_data["identifier"] for id_data in identifiers if id_data.get("type") == "ISBN_10"],
+            "cover_url": volume_info.get("imageLinks", {}).get("thumbnail"),
+        }
+
+    @staticmethod
+    def get_isbns(items: list[dict]) -> list[str]:
+        """
+        ISBNs from search result items in result order, preferring ISBN_13 for each volume
+        """
+        isbns = []
+        for item in items:
+            identifiers = {
+                id_data.get("type"): id_data.get("identifier")
+                for id_data in item.get("volumeInfo", {}).get("industryIdentifiers", [])
+            }
+            isbn = identifiers.get("ISBN_13") or identifiers.get("ISBN_10")
+            if isbn:
+                isbns.append(isbn)
+        return isbns
@@ -0,0 +1,236 @@
+"""
+Per endpoint instrumentation for outgoing api calls
+
+Like the rate limits and circuit breakers, metrics are kept at module level so every Client in a process
+adds to the same numbers. Requests are grouped with calls.endpoints.endpoint_kind, so the numbers
+answer questions like the p95 latency of works pages, or how many bytes editions calls downloaded.
+
+export_metrics gives these, along with the circuit breakers and rate limits for each host, in the prometheus
+text format, which the web app serves at /api/metrics to scrapers with the CALL_METRICS_TOKEN, and the huey
+worker writes to a file for a textfile collector to pick up.
+"""
+
+import bisect
+import json
+import os
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Any, Optional
+
+from calls import circuit_breaker, rate_limit
+from calls.endpoints import endpoint_kind
+
+
+# upper bounds in seconds, anything slower is counted in a final +Inf bucket
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class EndpointMetrics:
+    """
+    Counts for a single endpoint kind. Latency is from sending the request to having the whole body,
+    decode time is only the time spent parsing json, so the two can be compared.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.decode_seconds = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.statuses: Counter[int] = Counter()
+
+    def record_response(self, status_code: int, latency: float, num_bytes: int = 0, decode_seconds: float = 0.0):
+        self._record_latency(latency)
+        self.statuses[status_code] += 1
+        self.bytes += num_bytes
+        self.decode_seconds += decode_seconds
+
+    def record_error(self, latency: float) -> None:
+        """
+        A request that got no response at all, like a timeout or dropped connection
+        """
+        self._record_latency(latency)
+        self.errors += 1
+
+    def record_retry(self) -> None:
+        self.retries += 1
+
+    def record_coalesced(self) -> None:
+        """
+        A request that waited on an identical one already in flight, rather than being sent
+        """
+        self.coalesced += 1
+
+    def record_hedge(self) -> None:
+        self.hedges += 1
+
+    def record_hedge_win(self) -> None:
+        """
+        A hedged request that returned before the request it was hedging
+        """
+        self.hedge_wins += 1
+
+    def _record_latency(self, latency: float) -> None:
+        self.requests += 1
+        self.latency_sum += latency
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        Upper bound of the bucket the percentile falls in, None if it's in the +Inf bucket or there are no requests
+        """
+        if not self.requests:
+            return None
+
+        target = percentile * self.requests
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "statuses": dict(sorted(self.statuses.items())),
+            "bytes": self.bytes,
+            "mean_latency": round(self.latency_sum / self.requests, 3) if self.requests else 0.0,
+            "p50_latency": self.latency_percentile(0.5),
+            "p95_latency": self.latency_percentile(0.95),
+            "decode_seconds": round(self.decode_seconds, 3),
+            "latency_buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.latency_buckets)),
+        }
+
+
+_endpoints: dict[str, EndpointMetrics] = {}
+
+
+def get_endpoint_metrics(url: str) -> EndpointMetrics:
+    kind = endpoint_kind(url)
+    metrics = _endpoints.get(kind)
+
+    if metrics is None:
+        metrics = _endpoints[kind] = EndpointMetrics(kind)
+    return metrics
+
+
+def endpoint_metrics() -> dict[str, dict[str, Any]]:
+    return {kind: metrics.stats() for kind, metrics in sorted(_endpoints.items())}
+
+
+def export_metrics() -> str:
+    """
+    All endpoint metrics in the prometheus text exposition format
+    """
+    lines = [
+        "# HELP booksanon_api_request_seconds Latency of outgoing api requests.",
+        "# TYPE booksanon_api_request_seconds histogram",
+    ]
+    for kind, metrics in sorted(_endpoints.items()):
+        cumulative = 0
+        for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], metrics.latency_buckets):
+            cumulative += count
+            lines.append(f'booksanon_api_request_seconds_bucket{{endpoint="{kind}",le="{bound}"}} {cumulative}')
+        lines.append(f'booksanon_api_request_seconds_sum{{endpoint="{kind}"}} {metrics.latency_sum:.6f}')
+        lines.append(f'booksanon_api_request_seconds_count{{endpoint="{kind}"}} {metrics.requests}')
+
+    lines += [
+        "# HELP booksanon_api_responses_total Responses from outgoing api requests by status code.",
+        "# TYPE booksanon_api_responses_total counter",
+    ]
+    for kind, metrics in sorted(_endpoints.items()):
+        for status_code, count in sorted(metrics.statuses.items()):
+            lines.append(f'booksanon_api_responses_total{{endpoint="{kind}",status="{status_code}"}} {count}')
+
+    counters = (
+        ("errors", "Outgoing api requests that got no response.", "errors"),
+        ("retries", "Outgoing api requests that were retried.", "retries"),
+        ("coalesced", "Outgoing api requests that waited on an identical request already in flight.", "coalesced"),
+        ("hedges", "Hedged requests sent because the first was slow.", "hedges"),
+        ("hedge_wins", "Hedged requests that returned before the first.", "hedge_wins"),
+        ("response_bytes", "Bytes downloaded from outgoing api requests.", "bytes"),
+        ("decode_seconds", "Time spent decoding json from outgoing api requests.", "decode_seconds"),
+    )
+    for name, help_text, attr in counters:
+        lines += [f"# HELP booksanon_api_{name}_total {help_text}", f"# TYPE booksanon_api_{name}_total counter"]
+        for kind, metrics in sorted(_endpoints.items()):
+            lines.append(f'booksanon_api_{name}_total{{endpoint="{kind}"}} {getattr(metrics, attr)}')
+
+    lines += export_circuit_breakers()
+    lines += export_rate_limits()
+    return "\n".join(lines) + "\n"
+
+
+def export_circuit_breakers() -> list[str]:
+    """
+    Circuit breaker state for each host, as one gauge per state with the current one set to 1
+    """
+    breakers = sorted(circuit_breaker.circuit_breaker_stats().items())
+    lines = [
+        "# HELP booksanon_api_circuit_state Circuit breaker state for outgoing api calls by host.",
+        "# TYPE booksanon_api_circuit_state gauge",
+    ]
+    for host, stats in breakers:
+        for state in (circuit_breaker.CLOSED, circuit_breaker.OPEN, circuit_breaker.HALF_OPEN):
+            lines.append(f'booksanon_api_circuit_state{{host="{host}",state="{state}"}} {int(stats["state"] == state)}')
+
+    counters = (
+        ("circuit_trips", "Times a circuit breaker opened.", "trips"),
+        ("circuit_short_circuits", "Outgoing api requests refused by an open circuit breaker.", "short_circuits"),
+    )
+    for name, help_text, key in counters:
+        lines += [f"# HELP booksanon_api_{name}_total {help_text}", f"# TYPE booksanon_api_{name}_total counter"]
+        for host, stats in breakers:
+            lines.append(f'booksanon_api_{name}_total{{host="{host}"}} {stats[key]}')
+
+    return lines
+
+
+def write_metrics(path: str | Path) -> Path:
+    """
+    Write the metrics to path, as prometheus text for a .prom file and json for anything else
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    content = export_metrics() if path.suffix == ".prom" else json.dumps(endpoint_metrics(), indent=2)
+
+    # replaced in one go so a collector never reads a half written file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_rate_limits() -> list[str]:
+    """
+    How long a request to each host would wait now and how many are waiting, and the waits so far
+    """
+    buckets = sorted(rate_limit.rate_limit_stats().items())
+    lines = []
+
+    metrics = (
+        ("rate_limit_current_wait_seconds", "gauge", "Seconds a request to the host would wait now.", "wait_time"),
+        ("rate_limit_queue_depth", "gauge", "Outgoing api requests waiting on the rate limit.", "queue_depth"),
+        ("rate_limit_waits_total", "counter", "Outgoing api requests that waited on the rate limit.", "waits"),
+        ("rate_limit_wait_seconds_total", "counter", "Time spent waiting on the rate limit.", "wait_seconds"),
+    )
+    for name, metric_type, help_text, key in metrics:
+        lines += [f"# HELP booksanon_api_{name} {help_text}", f"# TYPE booksanon_api_{name} {metric_type}"]
+        for host, stats in buckets:
+            lines.append(f'booksanon_api_{name}{{host="{host}"}} {stats[key]}')
+
+    return lines
@@ -21,29 +21,87 @@ import asyncio
 import logging
 import pprint
 import re
-from datetime import datetime
+import time
+from functools import lru_cache
 from statistics import median
-from typing import Any, Dict, List, Optional, Set
+from urllib.parse import quote
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 from calls.client import Client
 
 
 logger = logging.getLogger(__name__)
 
+# stays well within the url lengths servers and proxies accept
+MAX_SEARCH_URL_LENGTH = 2000
+
+# the only search doc fields parse_books_search_results reads, also sent as fields= on search urls
+# so openlibrary doesn't send the large arrays like ia, edition_key and publish_date
+SEARCH_FIELDS = (
+    "key",
+    "title",
+    "author_name",
+    "author_key",
+    "first_publish_year",
+    "number_of_pages_median",
+    "cover_i",
+)
+
+# parts of responses kept when the client streams, everything else is skipped as it is decoded
+SEARCH_PATHS = ("num_found", *(f"docs.item.{field}" for field in SEARCH_FIELDS))
+
+EDITIONS_PATHS = (
+    "size",
+    "links.next",
+    "entries.item.isbn_13",
+    "entries.item.isbn_10",
+    "entries.item.publishers",
+    "entries.item.publish_date",
+    "entries.item.number_of_pages",
+)
+
+# author search docs carry these, but not remote_ids, which only the author pages have
+AUTHOR_SEARCH_FIELDS = ("key", "name", "birth_date", "death_date")
+
 
 class OpenLibCaller:
-    def __init__(self, client: Client, pprint_results: bool = True, max_concurrent_requests: int = 10):
+    def __init__(
+        self,
+        client: Client,
+        pprint_results: bool = True,
+        max_concurrent_requests: int = 10,
+        editions_max_pages: int = 10,
+        editions_concurrency: int = 3,
+        editions_min_isbns: int = 20,
+        root_url: str = "https://openlibrary.org",
+    ):
+        """
+        Editions are fetched a page at a time, up to editions_max_pages, editions_concurrency pages at once.
+        Fetching stops once an edition year no later than the known first publish year is found,
+        and at least editions_min_isbns isbns have been collected.
+
+        root_url can be pointed at the fixture stub server from calls.replay for load testing.
+        """
         self.client = client
         self.pprint: bool = pprint_results
-        self.root_url = "https://openlibrary.org"
+        self.root_url = root_url.rstrip("/")
         self.search_url = f"{self.root_url}/search.json"
+        self.search_fields = ",".join(SEARCH_FIELDS)
+        self.search_authors_url = f"{self.root_url}/search/authors.json"
+        self.author_search_fields = ",".join(AUTHOR_SEARCH_FIELDS)
+        self.max_concurrent_requests = max_concurrent_requests
         self.semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.editions_max_pages = editions_max_pages
+        self.editions_concurrency = editions_concurrency
+        self.editions_min_isbns = editions_min_isbns
 
-    async def fetch_with_semaphore(self, url: str, params: dict = {}):
+    async def fetch_with_semaphore(self, url: str, params: dict = {}, paths: Optional[Tuple[str, ...]] = None):
         """
         Used to rate limit Caller obj usage of client
         """
         async with self.semaphore:
+            if paths:
+                return await self.client.fetch_results(url, params or {}, paths=paths)
             return await self.client.fetch_results(url, params or {})
 
     """ Calls to API """
@@ -90,6 +148,85 @@ class OpenLibCaller:
             pprint.pp(author)
         return author
 
+    async def get_authors_results(
+        self, author_ids: List[str], remote_ids_for: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any] | None]:
+        """
+        Fetch many authors at once, each distinct id is only requested once.
+
+        remote_ids are only on the author pages, so authors in remote_ids_for, all of them by default,
+        are fetched from their author pages. The rest are looked up with batched author search calls,
+        then fetched from their author pages if not found or missing a name, and have empty remote_ids.
+
+        Results are returned in the same order as author_ids, including any repeats.
+        """
+        unique_ids = list(dict.fromkeys(author_ids))
+
+        if remote_ids_for is None:
+            need_pages = set(unique_ids)
+        else:
+            wanted = {normalise_author_key(author_id) for author_id in remote_ids_for}
+            need_pages = {author_id for author_id in unique_ids if normalise_author_key(author_id) in wanted}
+
+        search_ids = [author_id for author_id in unique_ids if author_id not in need_pages]
+        found: Dict[str, Dict[str, Any]] = {}
+        if search_ids:
+            found = await self.search_authors([normalise_author_key(author_id) for author_id in search_ids])
+
+        authors_by_id: Dict[str, Dict[str, Any] | None] = {}
+        missing = []
+
+        for author_id in unique_ids:
+            author = found.get(normalise_author_key(author_id))
+            if author_id not in need_pages and author and author.get("name"):
+                authors_by_id[author_id] = author
+            else:
+                missing.append(author_id)
+
+        if missing:
+            logger.info("fetching %s of %s authors from their author pages", len(missing), len(unique_ids))
+            authors = await asyncio.gather(*(self.get_author_results(author_id) for author_id in missing))
+            authors_by_id.update(zip(missing, authors))
+
+        return [authors_by_id[author_id] for author_id in author_ids]
+
+    async def search_authors(self, author_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up authors with as few author search calls as the url length allows.
+
+        Returns authors in the same shape as parse_author_id_page, keyed by /authors/ key.
+        """
+        author_keys = list(dict.fromkeys(key for key in author_keys if key))
+        if not author_keys:
+            return {}
+
+        chunks = self._chunk_keys(author_keys, self.search_authors_url, self.author_search_fields)
+
+        responses = await asyncio.gather(
+            *(
+                self.fetch_with_semaphore(
+                    self.search_authors_url,
+                    {"q": key_query(chunk), "limit": len(chunk), "fields": self.author_search_fields},
+                )
+                for chunk in chunks
+            )
+        )
+        logger.info("looked up %s authors in %s search calls", len(author_keys), len(chunks))
+
+        results = {}
+        for response in responses:
+            if not response:
+                continue
+
+            for doc in response.get("docs", []):
+                author = self.parse_author_id_page(doc)
+                # search docs give the key without the /authors/ prefix the author pages use
+                author["key"] = normalise_author_key(author["key"])
+                if author["key"]:
+                    results[author["key"]] = author
+
+        return results
+
     async def search_books(
         self,
         title: Optional[str] = None,
@@ -116,7 +253,7 @@ class OpenLibCaller:
         else:
             raise ValueError("Must provide either title/author or general search_query")
 
-        response = await self.fetch_with_semaphore(url)
+        response = await self.fetch_with_semaphore(url, paths=SEARCH_PATHS)
 
         if not response:
             return None
@@ -128,15 +265,53 @@ class OpenLibCaller:
             pprint.pp(clean_results)
         return clean_results
 
-    async def get_complete_books_data(self, clean_results: list[dict]):
-        complete_books = []
-        complete_authors = []
+    async def search_by_isbns(self, isbns: List[str], limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find the works for isbns from other sources, like google books, in one search call
+        """
+        isbns = list(dict.fromkeys(isbn for isbn in isbns if ISBN_REGEX.fullmatch(isbn)))
+        if not isbns:
+            return []
+
+        response = await self.fetch_with_semaphore(
+            self.search_url,
+            {"q": isbn_query(isbns), "limit": limit, "fields": self.search_fields},
+            paths=SEARCH_PATHS,
+        )
+        if not response:
+            return []
+        return self.parse_books_search_results(response, limit=limit)
+
+    async def get_complete_books_data(
+        self,
+        clean_results: list[dict],
+        stored_authors: Optional[Callable[[List[str]], Awaitable[Set[str]]]] = None,
+        with_remote_ids: bool = True,
+    ):
+        """
+        Search results for all the books are refreshed with batched search calls,
+        then work and editions pages are fetched concurrently, once per distinct work.
+
+        Authors are looked up with batched author search calls. Author pages are only fetched
+        for remote_ids, so not at all without with_remote_ids, and only for authors that
+        stored_authors does not return when it is given, as in get_book_data_for_db.
+        """
+        books_by_key: dict[str, dict] = {}
 
         for book in clean_results:
-            complete_book = await self._get_complete_book_data(book)
+            work_key = normalise_work_key(book.get("openlib_work_key", ""))
+            if work_key:
+                books_by_key.setdefault(work_key, book)
 
-            if complete_book:
-                complete_books.append(complete_book)
+        search_results = await self.enrich_books_from_search(list(books_by_key))
+
+        results = await asyncio.gather(
+            *(
+                self._get_complete_book_data(search_results.get(work_key, book), work_id=work_key, searched=True)
+                for work_key, book in books_by_key.items()
+            )
+        )
+        complete_books = [book for book in results if book]
 
         if not complete_books:
             logger.debug("error getting book data")
@@ -150,9 +325,17 @@ class OpenLibCaller:
             for author_key in authors_key_list:
                 authors_response_keys.append(author_key)
 
-        for author_key in authors_response_keys:
-            author = await self.get_author_results(author_key)
-            complete_authors.append(author)
+        if not with_remote_ids:
+            remote_ids_for: list[str] = []
+        elif stored_authors:
+            # search results give bare OL keys, stored authors use their author page key
+            author_keys = list(dict.fromkeys(filter(None, map(normalise_author_key, authors_response_keys))))
+            stored = await stored_authors(author_keys)
+            remote_ids_for = [author_key for author_key in author_keys if author_key not in stored]
+        else:
+            remote_ids_for = authors_response_keys
+
+        complete_authors = await self.get_authors_results(authors_response_keys, remote_ids_for=remote_ids_for)
 
         logger.debug(complete_books)
         if self.pprint:
@@ -163,11 +346,12 @@ class OpenLibCaller:
             pprint.pp(complete_authors)
         return complete_books, complete_authors
 
-    async def _get_complete_book_data(self, book: dict = {}, work_id: str = "") -> dict | None:
+    async def _get_complete_book_data(self, book: dict = {}, work_id: str = "", searched: bool = False) -> dict | None:
         """
         Enrichment of a book record using search results, work details, and editions data.
 
         Search page is called as editions doesn't always seem to have first edition for older books.
+        Pass searched if book is already a search result, to skip the search call.
         """
         if not book and not work_id:
             logger.warning("either book or work id must be passed")
@@ -178,28 +362,172 @@ class OpenLibCaller:
             logger.warning("missing work_id")
             return None
 
-        book = await self._enrich_book_from_search(work_id, book)
+        work_url = self.get_work_id_url(work_id)
+        if not work_url:
+            return None
+
+        # the calls are independent, so issue them together and merge in a fixed order after
+        phases = {
+            "work": timed(self.fetch_with_semaphore(work_url)),
+            "editions": timed(self.fetch_with_semaphore(self.get_editions_url(work_id), paths=EDITIONS_PATHS)),
+        }
+        if not searched:
+            phases["search"] = timed(self._enrich_book_from_search(work_id, book))
+
+        start = time.perf_counter()
+        results = dict(zip(phases, await asyncio.gather(*phases.values())))
+        logger.info(
+            "book data for %s fetched in %.3fs (%s)",
+            work_id,
+            time.perf_counter() - start,
+            ", ".join(f"{phase}: {elapsed:.3f}s" for phase, (_, elapsed) in results.items()),
+        )
 
-        book = await self.get_work_id_results(work_id, book=book)
+        if "search" in results:
+            book = results["search"][0]
+        work_response = results["work"][0]
+        editions_response = results["editions"][0]
 
-        if not book:
+        if not work_response:
             logger.warning(f"Could not retrieve work details for {work_id}")
             return None
 
-        editions_response = await self.fetch_with_semaphore(self.get_editions_url(work_id))
+        book = self.parse_work_id_page(work_response, book=book)
+
         if editions_response:
-            book = self.parse_editions_response(editions_response, book)
+            book = await self._add_editions_data(work_id, book, editions_response)
 
         return book
 
+    async def _add_editions_data(self, work_id: str, book: dict, first_page: dict) -> dict:
+        """
+        Stream edition entries into an aggregator until the data goals are met or the pages run out
+        """
+        known_year = book.get("first_publish_year")
+        target_year = known_year if isinstance(known_year, int) else None
+        aggregator = EditionsAggregator()
+
+        async for entry in self.iter_editions(work_id, first_page=first_page):
+            aggregator.add(entry)
+            if aggregator.goals_met(target_year=target_year, min_isbns=self.editions_min_isbns):
+                logger.info("editions data goals met for %s after %s entries", work_id, aggregator.entries_seen)
+                break
+
+        return aggregator.update_book(book)
+
+    async def iter_editions(
+        self, work_id: str, first_page: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields edition entries for a work, following pages of results up to editions_max_pages.
+
+        When the first page gives the total size, the remaining pages are fetched editions_concurrency at a time,
+        otherwise links.next is followed one page at a time.
+
+        Pages are not kept once their entries are yielded, so stop iterating once enough has been collected.
+        """
+        url = self.get_editions_url(work_id)
+        page = first_page if first_page is not None else await self.fetch_with_semaphore(url, paths=EDITIONS_PATHS)
+        if not page:
+            return
+
+        entries = page.get("entries", [])
+        for entry in entries:
+            yield entry
+
+        page_size = len(entries)
+        total = page.get("size")
+
+        if isinstance(total, int) and page_size:
+            offsets = list(range(page_size, total, page_size))[: self.editions_max_pages - 1]
+
+            for i in range(0, len(offsets), self.editions_concurrency):
+                wave = offsets[i : i + self.editions_concurrency]
+                logger.debug("fetching editions for %s at offsets %s", work_id, wave)
+                pages = await asyncio.gather(
+                    *(
+                        self.fetch_with_semaphore(url, {"limit": page_size, "offset": offset}, paths=EDITIONS_PATHS)
+                        for offset in wave
+                    )
+                )
+                for page in pages:
+                    for entry in (page or {}).get("entries", []):
+                        yield entry
+            return
+
+        pages_fetched = 1
+        next_link = page.get("links", {}).get("next")
+
+        while next_link and pages_fetched < self.editions_max_pages:
+            page = await self.fetch_with_semaphore(f"{self.root_url}{next_link}", paths=EDITIONS_PATHS)
+            if not page:
+                return
+            pages_fetched += 1
+
+            for entry in page.get("entries", []):
+                yield entry
+            next_link = page.get("links", {}).get("next")
+
+    async def enrich_books_from_search(self, work_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up many works with q=key:("/works/A" OR "/works/B" ...) search calls,
+        split so each url stays under MAX_SEARCH_URL_LENGTH.
+
+        Returns parsed search results keyed by /works/ key, works not found are left out.
+        """
+        work_keys = list(dict.fromkeys(key for key in map(normalise_work_key, work_ids) if key))
+        chunks = self._chunk_keys(work_keys, self.search_url, self.search_fields)
+
+        responses = await asyncio.gather(
+            *(
+                self.fetch_with_semaphore(
+                    self.search_url,
+                    {"q": key_query(chunk), "limit": len(chunk), "fields": self.search_fields},
+                    paths=SEARCH_PATHS,
+                )
+                for chunk in chunks
+            )
+        )
+        logger.info("looked up %s works in %s search calls", len(work_keys), len(chunks))
+
+        results = {}
+        for chunk, response in zip(chunks, responses):
+            if not response:
+                logger.warning("no search response for works: %s", chunk)
+                continue
+
+            for book in self.parse_books_search_results(response, limit=len(chunk)):
+                results[book["openlib_work_key"]] = book
+
+        return results
+
+    @staticmethod
+    def _chunk_keys(keys: List[str], url: str, fields: str) -> List[List[str]]:
+        base_length = len(f"{url}?q=&limit=000&fields={quote(fields)}")
+        chunks: List[List[str]] = []
+        chunk: List[str] = []
+
+        for key in keys:
+            if chunk and base_length + len(quote(key_query(chunk + [key]), safe="")) > MAX_SEARCH_URL_LENGTH:
+                chunks.append(chunk)
+                chunk = []
+            chunk.append(key)
+
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
     async def _enrich_book_from_search(self, work_id: str, book: dict) -> dict:
         """
         Query the search endpoint using work_id and update the book if a single result is found.
         """
-        search_url = f"{self.search_url}?q=key:{work_id}"
+        search_url = f"{self.search_url}?q=key:{work_id}&fields={self.search_fields}"
         logger.info("Fetching search result using key: %s", search_url)
 
-        response = await self.fetch_with_semaphore(search_url)
+        response = await self.fetch_with_semaphore(search_url, paths=SEARCH_PATHS)
+        if not response:
+            return book
+
         results = self.parse_books_search_results(response)
 
         if len(results) == 1:
@@ -210,11 +538,17 @@ class OpenLibCaller:
 
         return book
 
-    async def get_book_data_for_db(self, work_id: str) -> tuple[dict, list] | None:
+    async def get_book_data_for_db(
+        self, work_id: str, stored_authors: Optional[Callable[[List[str]], Awaitable[Set[str]]]] = None
+    ) -> tuple[dict, list] | None:
         """
         This parses work id and edition pages, and updates book to match the usual search result response.
 
         Full author data is also collected to match book and author in models.
+
+        stored_authors is given the book's author keys and returns those already stored. Those only need
+        their names, so come from a batched author search, while the rest are fetched from their author
+        pages to get remote_ids. Without it every author page is fetched.
         """
         if not validate_openlib_work_id(work_id):
             logger.warning(f"invalid work id passed: {work_id}")
@@ -232,18 +566,12 @@ class OpenLibCaller:
             logger.warning(f"unable to get author data for {work_id}")
             return None
 
-        author_keys = []
-        author_names = []
-        complete_authors = []
-
-        for author_data in authors_data:
-            author_key = author_data["author"]["key"]
-            author_keys.append(author_key)
-
-            author = await self.get_author_results(author_key)
-            complete_authors.append(author)
-
-            author_names.append(author["name"])
+        author_keys = [author_data["author"]["key"] for author_data in authors_data]
+        stored = await stored_authors(author_keys) if stored_authors else set()
+        complete_authors = await self.get_authors_results(
+            author_keys, remote_ids_for=[author_key for author_key in author_keys if author_key not in stored]
+        )
+        author_names = [author["name"] for author in complete_authors]
 
         book.update({"author_names": author_names, "author_keys": author_keys})
 
@@ -273,7 +601,7 @@ class OpenLibCaller:
         Limit has to be a digit but should be passed as str,
         this does not limit actual results but limits pages of results so default is 1
         """
-        url = f"{self.search_url}?q={search_query}&limit={limit}&lang={lang}"
+        url = f"{self.search_url}?q={search_query}&limit={limit}&lang={lang}&fields={self.search_fields}"
         logger.warning(f"created search url as {url}")
         return url
 
@@ -285,7 +613,7 @@ class OpenLibCaller:
         https://openlibrary.org/search/howto
 
         >>> get_complex_query_url(title="Oliver Twist", author="Charles Dickens")
-        >>> "https://openlibrary.org/search.json?title=Oliver Twist&author=Charles Dickens&limit=20"
+        >>> "https://openlibrary.org/search.json?title=Oliver Twist&author=Charles Dickens&fields=key,title,..."
         """
         allowed_params = [
             "title",
@@ -306,8 +634,7 @@ class OpenLibCaller:
             if value:
                 url += f"{key}={value}&"
 
-        # Remove trailing "&" if it exists
-        url = url.rstrip("&")
+        url += f"fields={self.search_fields}"
 
         logger.warning(f"Search URL created as: {url}")
         return url
@@ -366,63 +693,18 @@ class OpenLibCaller:
         Returns:
             Updated book dictionary with known ISBNs and publishers
         """
-        book = book or {}
-
-        isbns_13: Set[str] = set()
-        isbns_10: Set[str] = set()
-        publishers: Set[str] = set()
-        edition_dates: list = []
-        edition_pages: list[int] = []
+        aggregator = EditionsAggregator()
 
         for entry in response.get("entries", []):
-            isbns_13.update(entry.get("isbn_13", []))
-            isbns_10.update(entry.get("isbn_10", []))
-            edition_date = entry.get("publish_date")
-            page_numbers = entry.get("number_of_pages")
-
-            if edition_date:
-                edition_dates.append(edition_date)
-
-            if page_numbers:
-                edition_pages.append(page_numbers)
-
-            publishers.update(entry.get("publishers", []))
-
-        if edition_dates:
-            clean_dates = []
-            for edition_date in edition_dates:
-                d = extract_year(edition_date)
-                if d:
-                    clean_dates.append(d)
+            aggregator.add(entry)
 
-            first_edition_date = sorted(clean_dates)[0]
-            logger.debug("edition dates found as: %s", edition_dates)
-            year = extract_year(str(first_edition_date))
-            logger.debug("setting first edition date as: %s", year)
-
-            current_date = book.get("first_publish_year")
-
-            if year is not None and (current_date is None or year < current_date):
-                book["first_publish_year"] = year
-
-        pages = book.get("number_of_pages_median")
-
-        if (not pages or pages == 0) and edition_pages:
-            num_pages = median(edition_pages)
-            logger.debug("num of pages: %s", num_pages)
-            book.update({"number_of_pages_median": num_pages})
-
-        logger.debug("isbns_13: %s", isbns_13)
-        logger.debug("isbns_10: %s", isbns_10)
-
-        book.update({"isbns_13": isbns_13, "isbns_10": isbns_10, "publishers": publishers})
-        return book
+        return aggregator.update_book(book or {})
 
     @staticmethod
     def parse_books_search_results(response: dict, limit: int | None = None) -> List[Dict[str, Any]]:
         books: list = []
 
-        logger.debug(f"response: {response}")
+        logger.debug("response: %s", response)
         num_of_results: int | None = response.get("num_found")
         logger.debug(f"number of results: {num_of_results}")
 
@@ -434,11 +716,16 @@ class OpenLibCaller:
         else:
             counter = num_of_results
 
+        # num_found counts every match, not just the docs on this page
+        counter = min(counter, len(response["docs"]))
+
         logger.debug(f"len of response: {str(len(response['docs']))}")
         logger.debug(f"counter: {str(counter)}")
 
         for num in range(counter):
-            book: dict = response["docs"][num]
+            # only read fields requested in search urls, so the parser and projection can't drift apart
+            doc: dict = response["docs"][num]
+            book = {field: doc[field] for field in SEARCH_FIELDS if field in doc}
 
             title = book.get("title", "Unknown")
             first_publish_year = book.get("first_publish_year", "Unknown")
@@ -506,26 +793,146 @@ class OpenLibCaller:
         return book
 
 
+class EditionsAggregator:
+    """
+    Collects ISBNs, publishers, earliest year and page counts from edition entries.
+
+    Entries are added one at a time, so pages of editions don't need to be held in memory.
+    """
+
+    def __init__(self):
+        self.isbns_13: Set[str] = set()
+        self.isbns_10: Set[str] = set()
+        self.publishers: Set[str] = set()
+        self.earliest_year: Optional[int] = None
+        self.edition_pages: list[int] = []
+        self.entries_seen = 0
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        self.entries_seen += 1
+        self.isbns_13.update(entry.get("isbn_13", []))
+        self.isbns_10.update(entry.get("isbn_10", []))
+        self.publishers.update(entry.get("publishers", []))
+
+        edition_date = entry.get("publish_date")
+        if edition_date:
+            year = extract_year(edition_date)
+            if year and (self.earliest_year is None or year < self.earliest_year):
+                self.earliest_year = year
+
+        page_numbers = entry.get("number_of_pages")
+        if page_numbers:
+            self.edition_pages.append(page_numbers)
+
+    def goals_met(self, target_year: Optional[int] = None, min_isbns: int = 0) -> bool:
+        """
+        True once an edition year has been found, no later than target_year if given,
+        and there are at least min_isbns isbns
+        """
+        if self.earliest_year is None:
+            return False
+        if target_year is not None and self.earliest_year > target_year:
+            return False
+        return len(self.isbns_13) + len(self.isbns_10) >= min_isbns
+
+    def update_book(self, book: Dict[str, Any]) -> Dict[str, Any]:
+        if self.earliest_year is not None:
+            logger.debug("setting first edition date as: %s", self.earliest_year)
+            current_date = book.get("first_publish_year")
+
+            if current_date is None or self.earliest_year < current_date:
+                book["first_publish_year"] = self.earliest_year
+
+        pages = book.get("number_of_pages_median")
+
+        if (not pages or pages == 0) and self.edition_pages:
+            num_pages = median(self.edition_pages)
+            logger.debug("num of pages: %s", num_pages)
+            book.update({"number_of_pages_median": num_pages})
+
+        logger.debug("isbns_13: %s", self.isbns_13)
+        logger.debug("isbns_10: %s", self.isbns_10)
+
+        book.update({"isbns_13": self.isbns_13, "isbns_10": self.isbns_10, "publishers": self.publishers})
+        return book
+
+
+ISBN_REGEX = re.compile(r"\d{13}|\d{9}[\dX]")
+
+# a standalone four digit year, so 1999 is found in "c1999", "[1999]" and "1999?" but not in "12345"
+YEAR_REGEX = re.compile(r"(?<!\d)([12]\d{3})(?!\d)")
+
+
+@lru_cache(maxsize=4096)
 def extract_year(date_str: str) -> Optional[int]:
-    date_formats = [
-        "%Y",  # 1999
-        "%Y-%m-%d",  # 1999-12-19
-        "%Y/%m/%d",  # 1999/12/19
-        "%B %d, %Y",  # December 19, 1999
-        "%b %d, %Y",  # Dec 19, 1999
-        "%d %B %Y",  # 19 December 1999
-        "%d %b %Y",  # 19 Dec 1999
-    ]
-
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(date_str.strip(), fmt).year
-        except ValueError:
-            continue
-    logging.warning("Could not parse: %s", date_str)
+    """
+    Returns the first year found in the date string, covering the formats seen in openlibrary data:
+
+    >>> extract_year("December 19, 1999")
+    >>> 1999
+    >>> extract_year("[c1999?]")
+    >>> 1999
+
+    Edition dates repeat a lot across works so results are memoised.
+    """
+    match = YEAR_REGEX.search(date_str)
+    if match:
+        return int(match.group(1))
+
+    logger.debug("Could not parse: %s", date_str)
     return None
 
 
+def normalise_work_key(work_id: str) -> str:
+    """
+    Work ids can be passed as OL45804W or /works/OL45804W, search results always use the latter
+    """
+    work_id = work_id.strip()
+    if work_id.startswith("/works/"):
+        return work_id
+    if work_id.startswith("OL"):
+        return f"/works/{work_id}"
+    return ""
+
+
+def normalise_author_key(author_id: str) -> str:
+    """
+    Author ids can be passed as OL23919A or /authors/OL23919A, author pages use the latter
+    """
+    author_id = author_id.strip()
+    if author_id.startswith("/authors/"):
+        return author_id
+    if author_id.startswith("OL"):
+        return f"/authors/{author_id}"
+    return ""
+
+
+def isbn_query(isbns: List[str]) -> str:
+    """
+    >>> isbn_query(["9780141439563", "0141439564"])
+    >>> "isbn:(9780141439563 OR 0141439564)"
+    """
+    return f"isbn:({' OR '.join(isbns)})"
+
+
+def key_query(work_keys: List[str]) -> str:
+    """
+    >>> key_query(["/works/OL1W", "/works/OL2W"])
+    >>> 'key:("/works/OL1W" OR "/works/OL2W")'
+    """
+    keys = " OR ".join(f'"{key}"' for key in work_keys)
+    return f"key:({keys})"
+
+
+async def timed(awaitable: Awaitable[Any]) -> Tuple[Any, float]:
+    """
+    Await and return the result along with the elapsed time in seconds
+    """
+    start = time.perf_counter()
+    result = await awaitable
+    return result, time.perf_counter() - start
+
+
 def validate_openlib_work_id(openlib_work_id: str):
     work_id = openlib_work_id.replace("/works/", "")
     id_regex = re.compile(r"OL[0-9]+W", re.IGNORECASE)
@@ -0,0 +1,105 @@
+"""
+Token bucket rate limiting for outgoing api calls
+
+Buckets are kept per host at module level, so every Client in a process
+calling the same host shares one limit.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+
+logger = logging.getLogger("app.calls")
+
+
+class TokenBucket:
+    """
+    Allows bursts of up to burst requests, then rate requests per second.
+
+    Tokens can go negative, each caller reserves the next slot as it arrives,
+    so waiters are served in order without needing a lock.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens: float = self.burst
+        self.updated_at = time.monotonic()
+        self.queue_depth = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    @property
+    def wait_time(self) -> float:
+        """
+        Seconds a request made now would have to wait
+        """
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    async def acquire(self) -> float:
+        """
+        Waits until a request can be made, returns time spent waiting
+        """
+        wait = self.wait_time
+        self.tokens -= 1
+
+        if wait <= 0:
+            return 0.0
+
+        self.queue_depth += 1
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # give back the reserved slot so the requests behind aren't held up for nothing
+            self.tokens += 1
+            raise
+        finally:
+            self.queue_depth -= 1
+
+        self.waits += 1
+        self.wait_seconds += wait
+        return wait
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "wait_time": round(self.wait_time, 3),
+            "queue_depth": self.queue_depth,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def get_host_limiter(url: str, rate: float, burst: int = 1) -> TokenBucket:
+    """
+    The first limit set for a host is used by everything else calling that host
+    """
+    host = urlsplit(url).netloc.lower()
+    bucket = _buckets.get(host)
+
+    if bucket is None:
+        logger.info("rate limiting %s to %s requests per second, burst %s", host, rate, burst)
+        bucket = _buckets[host] = TokenBucket(rate=rate, burst=burst)
+    elif (bucket.rate, bucket.burst) != (rate, max(1, burst)):
+        logger.debug("using existing limit for %s of %s per second", host, bucket.rate)
+
+    return bucket
+
+
+def rate_limit_stats() -> dict[str, dict[str, Any]]:
+    return {host: bucket.stats() for host, bucket in _buckets.items()}
@@ -0,0 +1,208 @@
+"""
+Record and replay api responses, so callers can be exercised without a network
+
+Fixtures are json files under a directory, one per request, grouped by endpoint kind:
+
+    fixtures/works/3f2a....json
+    fixtures/editions/9c1d....json
+
+Record by passing RecordingTransport to Client, then replay the same directory with ReplayTransport,
+or serve it over http with the stub server for load testing the app itself:
+
+>>> client = Client(transport=RecordingTransport("fixtures"))
+>>> client = Client(transport=ReplayTransport("fixtures", latency=0.2, error_rate=0.05))
+>>> books stub --fixtures fixtures --port 8001
+
+Fixtures are keyed on the path and sorted query only, so responses recorded from openlibrary.org
+are served by the stub server on any host.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from calls.cache import make_cache_key
+from calls.endpoints import endpoint_kind
+
+
+logger = logging.getLogger("app.calls")
+
+TRANSPORT_MODES = ("live", "record", "replay")
+
+# only headers that describe the body are kept, encoding and length no longer apply once it is decoded
+RECORDED_HEADERS = ("content-type", "etag", "last-modified")
+
+
+def fixture_key(url: str) -> str:
+    parts = urlsplit(make_cache_key(url))
+    return urlunsplit(("", "", parts.path, parts.query, ""))
+
+
+class FixtureStore:
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+
+    def path_for(self, url: str) -> Path:
+        key = fixture_key(url)
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return self.directory / endpoint_kind(url) / f"{digest}.json"
+
+    def load(self, url: str) -> Optional[dict[str, Any]]:
+        path = self.path_for(url)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def save(self, url: str, status_code: int, headers: httpx.Headers, content: bytes) -> Path:
+        path = self.path_for(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fixture = {
+            "key": fixture_key(url),
+            "status_code": status_code,
+            "headers": {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+            "content": content.decode("utf-8"),
+        }
+        path.write_text(json.dumps(fixture, indent=2))
+        return path
+
+
+class SyntheticFaults:
+    """
+    Latency of latency ± jitter seconds on every request, and error_rate of requests failing with a 503.
+
+    Pass a seed to get the same sequence of delays and errors on every run.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    async def apply(self) -> bool:
+        """
+        Waits for the synthetic latency, returns True if the request should fail
+        """
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        return self.random.random() < self.error_rate
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Passes requests to the real transport, saving successful and not found responses as fixtures
+    """
+
+    def __init__(self, directory: str | Path, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.store = FixtureStore(directory)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        await response.aclose()
+
+        if response.status_code == 200 or response.status_code == 404:
+            path = self.store.save(str(request.url), response.status_code, response.headers, content)
+            logger.debug("recorded %s to %s", request.url, path)
+
+        headers = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serves recorded fixtures, requests without one get a 404 as if the resource didn't exist
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.store = FixtureStore(directory)
+        self.faults = SyntheticFaults(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if await self.faults.apply():
+            return httpx.Response(503, request=request)
+
+        fixture = self.store.load(str(request.url))
+        if fixture is None:
+            logger.warning("no fixture recorded for %s", request.url)
+            return httpx.Response(404, request=request)
+
+        return httpx.Response(
+            fixture["status_code"],
+            headers=fixture["headers"],
+            content=fixture["content"].encode("utf-8"),
+            request=request,
+        )
+
+
+def make_transport(
+    mode: str,
+    directory: str | Path,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+) -> Optional[httpx.AsyncBaseTransport]:
+    """
+    Returns None for live, so Client uses its own pooled transport
+    """
+    if mode not in TRANSPORT_MODES:
+        raise ValueError(f"transport mode must be one of {TRANSPORT_MODES}, not {mode}")
+
+    if mode == "record":
+        logger.info("recording api responses to %s", directory)
+        return RecordingTransport(directory)
+    if mode == "replay":
+        logger.info("replaying api responses from %s", directory)
+        return ReplayTransport(directory, latency=latency, jitter=jitter, error_rate=error_rate)
+    return None
+
+
+def create_stub_app(
+    directory: str | Path,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    seed: Optional[int] = None,
+) -> Starlette:
+    """
+    App serving fixtures over http, point OPENLIB_ROOT_URL at it to load test without openlibrary.org
+    """
+    store = FixtureStore(directory)
+    faults = SyntheticFaults(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed)
+
+    async def serve_fixture(request: Request) -> Response:
+        if await faults.apply():
+            return Response(status_code=503)
+
+        fixture = store.load(str(request.url))
+        if fixture is None:
+            logger.warning("no fixture recorded for %s", request.url)
+            return Response(status_code=404)
+
+        return Response(fixture["content"], status_code=fixture["status_code"], headers=fixture["headers"])
+
+    return Starlette(routes=[Route("/{path:path}", serve_fixture)])
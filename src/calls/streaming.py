@@ -0,0 +1,110 @@
+"""
+Incremental json decoding that only keeps the parts of a response asked for
+
+Paths use ijson prefix syntax, where item stands for each element of an array:
+
+>>> paths = ["num_found", "docs.item.key", "docs.item.title"]
+>>> {"num_found": 2, "docs": [{"key": "/works/OL1W", "title": "..."}, {"key": "/works/OL2W", "title": "..."}]}
+
+Everything else in the response is skipped as it is read, rather than being built into objects,
+so the result has the same shape callers expect from the full response, with fewer keys.
+
+Needs ijson, installed with the streaming extra.
+"""
+
+import logging
+from typing import Any, AsyncIterator, Iterable
+
+
+logger = logging.getLogger("app.calls")
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:  # pragma: no cover - depends on installed extras
+    ijson = None
+
+
+def streaming_available() -> bool:
+    return ijson is not None
+
+
+class JsonProjector:
+    """
+    Builds the projected result from ijson parse events
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths = set(paths)
+        # containers on the way to a requested path have to be created, even if nothing else in them is kept
+        self.containers = {path.rsplit(".", i)[0] for path in self.paths for i in range(1, path.count(".") + 1)}
+        self.result: dict[str, Any] = {}
+        self.stack: list[Any] = [self.result]
+        self.builder: Any = None
+        self.builder_prefix = ""
+        self.depth = 0
+
+    def _attach(self, prefix: str, value: Any) -> None:
+        parent = self.stack[-1]
+        if isinstance(parent, list):
+            parent.append(value)
+        else:
+            parent[prefix.rsplit(".", 1)[-1]] = value
+
+    def feed(self, prefix: str, event: str, value: Any) -> None:
+        if self.builder is not None:
+            self.builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                self.depth += 1
+            elif event in ("end_map", "end_array"):
+                self.depth -= 1
+
+            if self.depth == 0:
+                self._attach(self.builder_prefix, self.builder.value)
+                self.builder = None
+            return
+
+        if event == "map_key":
+            return
+
+        if prefix in self.paths:
+            if event in ("start_map", "start_array"):
+                self.builder = ObjectBuilder()
+                self.builder.event(event, value)
+                self.builder_prefix = prefix
+                self.depth = 1
+            else:
+                self._attach(prefix, value)
+            return
+
+        if prefix in self.containers:
+            if event in ("start_map", "start_array"):
+                container: Any = {} if event == "start_map" else []
+                self._attach(prefix, container)
+                self.stack.append(container)
+            elif event in ("end_map", "end_array"):
+                self.stack.pop()
+
+
+async def stream_json(chunks: AsyncIterator[bytes], paths: Iterable[str]) -> dict[str, Any]:
+    """
+    Decode a json object from chunks of bytes as they arrive, keeping only the given paths
+    """
+    if ijson is None:
+        raise RuntimeError("ijson is needed for streaming, install with the streaming extra")
+
+    projector = JsonProjector(paths)
+    events = ijson.sendable_list()
+    parser = ijson.parse_coro(events, use_float=True)
+
+    async for chunk in chunks:
+        parser.send(chunk)
+        for prefix, event, value in events:
+            projector.feed(prefix, event, value)
+        del events[:]
+
+    parser.close()
+    for prefix, event, value in events:
+        projector.feed(prefix, event, value)
+
+    return projector.result
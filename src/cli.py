@@ -6,7 +6,15 @@ import sys
 
 from dotenv import load_dotenv
 
-from calls.cli import define_call_args, call_open_lib, call_google_books
+from calls.cli import (
+    define_cache_args,
+    define_call_args,
+    define_stub_args,
+    call_open_lib,
+    call_google_books,
+    handle_cache_args,
+    run_stub_server,
+)
 from db.cli import define_db_args, handle_db_args
 from utils import run_command
 
@@ -19,6 +27,12 @@ def set_arg_parser():
     call_parser = subparsers.add_parser("call", help="Call the book search APIs")
     define_call_args(call_parser)
 
+    cache_parser = subparsers.add_parser("cache", help="Inspect or purge the api response cache")
+    define_cache_args(cache_parser)
+
+    stub_parser = subparsers.add_parser("stub", help="Serve recorded api fixtures over http")
+    define_stub_args(stub_parser)
+
     db_parser = subparsers.add_parser("db", help="db queries")
     define_db_args(db_parser)
 
@@ -75,6 +89,12 @@ async def async_main():
         elif args.api == "googlebooks" or args.api == "gb":
             await call_google_books(args)
 
+    if args.command == "cache":
+        handle_cache_args(args)
+
+    if args.command == "stub":
+        await run_stub_server(args)
+
     if args.command == "db":
         await handle_db_args(args)
     if args.command == "lint":
@@ -17,3 +17,56 @@ POSTGRES_PASSWORD = config("POSTGRES_PASSWORD", cast=Secret)
 POSTGRES_URL = config("POSTGRES_URL")
 
 SECRET_KEY = config("SECRET_KEY", cast=Secret)
+
+# apply pending schema migrations when the app or huey worker starts, otherwise use books db --migrate
+DB_MIGRATE_ON_STARTUP = config("DB_MIGRATE_ON_STARTUP", cast=bool, default=True)
+
+OPENLIB_CACHE_ENABLED = config("OPENLIB_CACHE_ENABLED", cast=bool, default=False)
+OPENLIB_CACHE_PATH = config("OPENLIB_CACHE_PATH", default=str(PROJECT_ROOT / "data" / "http_cache.db"))
+
+# most time in seconds a web request will wait on the book apis, including retries
+OPENLIB_REQUEST_DEADLINE = config("OPENLIB_REQUEST_DEADLINE", cast=float, default=10.0)
+
+# shared by every call to the same host from a process
+OPENLIB_REQUESTS_PER_SECOND = config("OPENLIB_REQUESTS_PER_SECOND", cast=float, default=3.0)
+OPENLIB_REQUEST_BURST = config("OPENLIB_REQUEST_BURST", cast=int, default=5)
+
+# connection pool for calls to the book apis
+OPENLIB_MAX_CONNECTIONS = config("OPENLIB_MAX_CONNECTIONS", cast=int, default=10)
+OPENLIB_MAX_KEEPALIVE_CONNECTIONS = config("OPENLIB_MAX_KEEPALIVE_CONNECTIONS", cast=int, default=10)
+OPENLIB_KEEPALIVE_EXPIRY = config("OPENLIB_KEEPALIVE_EXPIRY", cast=float, default=30.0)
+OPENLIB_HTTP2 = config("OPENLIB_HTTP2", cast=bool, default=False)
+
+# decode editions and search responses as they arrive, keeping only the fields used
+OPENLIB_STREAM_RESPONSES = config("OPENLIB_STREAM_RESPONSES", cast=bool, default=False)
+
+# cover images served from /covers, the upstream can point at a local stand-in
+COVERS_CACHE_PATH = config("COVERS_CACHE_PATH", default=str(PROJECT_ROOT / "data" / "covers"))
+COVERS_CACHE_MAX_BYTES = config("COVERS_CACHE_MAX_BYTES", cast=int, default=500 * 1024 * 1024)
+COVERS_UPSTREAM_URL = config("COVERS_UPSTREAM_URL", default="https://covers.openlibrary.org/b/id")
+
+# openlib, first or merge, see calls.federated. Budget is the most time in seconds to wait on search results
+BOOK_SEARCH_MODE = config("BOOK_SEARCH_MODE", default="openlib")
+BOOK_SEARCH_LATENCY_BUDGET = config("BOOK_SEARCH_LATENCY_BUDGET", cast=float, default=5.0)
+
+# trips when this fraction of recent calls to a host fail or are slow, 0 turns the breaker off
+OPENLIB_BREAKER_FAILURE_RATE = config("OPENLIB_BREAKER_FAILURE_RATE", cast=float, default=0.5)
+OPENLIB_BREAKER_SLOW_CALL_SECONDS = config("OPENLIB_BREAKER_SLOW_CALL_SECONDS", cast=float, default=5.0)
+OPENLIB_BREAKER_RESET_TIMEOUT = config("OPENLIB_BREAKER_RESET_TIMEOUT", cast=float, default=30.0)
+
+# web searches and work lookups slower than this percentile of recent ones are sent again, 0 turns it off
+OPENLIB_HEDGE_PERCENTILE = config("OPENLIB_HEDGE_PERCENTILE", cast=float, default=0.95)
+OPENLIB_HEDGE_MAX_RATIO = config("OPENLIB_HEDGE_MAX_RATIO", cast=float, default=0.05)
+
+# live, record or replay, see calls.replay. Point the root url at the stub server to load test offline
+OPENLIB_ROOT_URL = config("OPENLIB_ROOT_URL", default="https://openlibrary.org")
+OPENLIB_TRANSPORT = config("OPENLIB_TRANSPORT", default="live")
+OPENLIB_FIXTURES_PATH = config("OPENLIB_FIXTURES_PATH", default=str(PROJECT_ROOT / "data" / "fixtures"))
+OPENLIB_REPLAY_LATENCY = config("OPENLIB_REPLAY_LATENCY", cast=float, default=0.0)
+OPENLIB_REPLAY_ERROR_RATE = config("OPENLIB_REPLAY_ERROR_RATE", cast=float, default=0.0)
+
+# /api/metrics needs "Authorization: Bearer <token>" with this token, and is turned off while it's empty
+CALL_METRICS_TOKEN = config("CALL_METRICS_TOKEN", cast=Secret, default="")
+
+# the huey worker writes its api call metrics here every minute, as prometheus text for a textfile collector
+CALL_METRICS_PATH = config("CALL_METRICS_PATH", default=str(PROJECT_ROOT / "data" / "metrics" / "huey.prom"))
@@ -2,7 +2,7 @@ import os
 import pprint
 import sys
 
-from repositories import BookRepository
+from repositories import AuthorRepository, BookRepository, ReviewRepository
 from calls.client import Client
 from calls.openlib import OpenLibCaller
 from db import Database
@@ -12,10 +12,22 @@ from utils import run_command
 
 def define_db_args(db_parser):
     db_parser.add_argument(
-        "-cs",
-        "--create-schema",
+        "-m",
+        "--migrate",
         action="store_true",
-        help="Create db schema",
+        help="Apply any pending schema migrations",
+    )
+    db_parser.add_argument(
+        "-sv",
+        "--schema-version",
+        action="store_true",
+        help="Print the latest schema migration applied",
+    )
+    db_parser.add_argument(
+        "-rf",
+        "--rebuild-feed",
+        action="store_true",
+        help="Rebuild the home page review feed from the reviews table",
     )
     db_parser.add_argument(
         "-a",
@@ -41,17 +53,28 @@ async def handle_db_args(args):
         run_command(["docker", "exec", "-it", "booksanon-db", "psql", "-U", POSTGRES_USER])
         sys.exit(0)
 
-    async with Database(user=POSTGRES_USER, password=POSTGRES_PASSWORD, url=POSTGRES_URL) as db:
+    async with Database(
+        user=POSTGRES_USER, password=POSTGRES_PASSWORD, url=POSTGRES_URL, migrate_on_startup=False
+    ) as db:
         book_repo = BookRepository(db=db)
 
-        if args.create_schema:
-            await db.create_schema()
+        if args.migrate:
+            applied = await db.migrate()
+            print(f"applied migrations: {', '.join(applied)}" if applied else "no migrations to apply")
+
+        if args.schema_version:
+            print(f"schema version: {await db.schema_version()}")
+
+        if args.rebuild_feed:
+            await ReviewRepository(db=db).rebuild_feed()
 
         if args.add_book:
             client = Client(email=os.environ.get("EMAIL_ADDRESS"))
             caller = OpenLibCaller(client=client)
 
-            book_data, complete_authors = await caller.get_book_data_for_db(work_id=args.add_book)
+            book_data, complete_authors = await caller.get_book_data_for_db(
+                work_id=args.add_book, stored_authors=AuthorRepository(db=db).get_stored_openlib_ids
+            )
 
             book = Book.from_dict(book_data)
 
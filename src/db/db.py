@@ -4,15 +4,22 @@ import logging
 from pathlib import Path
 from typing import Any, Optional
 
+from .migrate import get_schema_version, load_migrations, migrate
+
 
 logger = logging.getLogger(__name__)
 
 
 class Database:
-    def __init__(self, user: str, password: str, url: str):
+    def __init__(self, user: str, password: str, url: str, migrate_on_startup: bool = True):
+        """
+        Without migrate_on_startup, start up only warns if the schema is behind,
+        and migrations have to be applied with books db --migrate
+        """
         self.dsn = f"postgresql://{user}:{password}@{url}"
         self.pool: asyncpg.Pool = None
         self.queries: Optional[Any] = None
+        self.migrate_on_startup = migrate_on_startup
 
     async def __aenter__(self):
         await self.start_up()
@@ -24,7 +31,7 @@ class Database:
     async def start_up(self):
         self.pool = await asyncpg.create_pool(dsn=self.dsn)
         self.queries = await self.set_queries()
-        await self.create_schema()
+        await self.check_schema()
 
     async def set_queries(self):
         if self.queries is None:
@@ -36,19 +43,59 @@ class Database:
         if self.pool:
             await self.pool.close()
 
-    async def run_query(self, query_name, **kwargs):
+    async def run_query(self, query_name, local_settings: Optional[dict[str, Any]] = None, **kwargs):
         """
         Can be used for most straight forward queries,
         will have to have matching sql file set.
 
+        local_settings are postgres settings changed for just this query, like SET LOCAL in a transaction.
+
         Expectation is to be called from repositories modules
         """
         self.queries = await self.set_queries()
 
         async with self.pool.acquire() as conn:
             query_method = getattr(self.queries, query_name)
-            return await query_method(conn, **kwargs)
+            if not local_settings:
+                return await query_method(conn, **kwargs)
+
+            async with conn.transaction():
+                for name, value in local_settings.items():
+                    # set_config with is_local set is SET LOCAL, but can take the value as a parameter
+                    await conn.execute("SELECT set_config($1, $2, true)", name, str(value))
+                return await query_method(conn, **kwargs)
+
+    async def check_schema(self) -> int:
+        """
+        Returns how many migrations are pending, after applying them if migrate_on_startup is set
+        """
+        async with self.pool.acquire() as conn:
+            version = await get_schema_version(conn)
 
-    async def create_schema(self):
-        logger.info("setting up db schema")
-        await self.run_query("create_schema")
+        pending = [migration for migration in load_migrations() if migration.version > version]
+        if not pending:
+            logger.debug("db schema is at version %s", version)
+            return 0
+
+        if not self.migrate_on_startup:
+            logger.warning(
+                "db schema is at version %s with %s migrations pending, run books db --migrate", version, len(pending)
+            )
+            return len(pending)
+
+        await self.migrate()
+        return 0
+
+    async def migrate(self) -> list[str]:
+        """
+        Apply any pending migrations, returns the names of those applied
+        """
+        async with self.pool.acquire() as conn:
+            applied = await migrate(conn)
+
+        logger.info("applied %s migrations", len(applied))
+        return [f"{migration.version:04}_{migration.name}" for migration in applied]
+
+    async def schema_version(self) -> int:
+        async with self.pool.acquire() as conn:
+            return await get_schema_version(conn)
@@ -0,0 +1,156 @@
+"""
+Versioned schema migrations
+
+Migrations are numbered sql files in db/migrations, like 0002_book_search_vector.sql, applied in order
+and recorded in the schema_migrations table. Each one runs in a transaction along with its record,
+so a failed migration leaves nothing behind.
+
+Migrations using CREATE INDEX CONCURRENTLY can't run in a transaction, so those run a statement
+at a time instead. Keep them to simple statements ending in a semicolon, and use IF NOT EXISTS.
+A failed concurrent build leaves an invalid index behind, which is dropped before the build is retried.
+
+An advisory lock is held while migrating, so web workers and the huey worker starting together
+apply each migration once. Waiting workers poll for the lock rather than blocking in pg_advisory_lock,
+as a blocked statement holds a snapshot, and a concurrent index build waits for every older snapshot
+to finish, so would deadlock with the workers waiting on it.
+"""
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import asyncpg
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+# any fixed number works, as long as nothing else takes an advisory lock with it
+MIGRATION_LOCK_ID = 7_212_202_501
+
+# seconds between attempts to take the lock while another process is migrating
+MIGRATION_LOCK_POLL_SECONDS = 0.5
+
+MIGRATION_FILE_REGEX = re.compile(r"(\d+)_(\w+)\.sql")
+
+CONCURRENTLY_REGEX = re.compile(r"\bCONCURRENTLY\b", re.IGNORECASE)
+
+CONCURRENT_INDEX_REGEX = re.compile(
+    r"\bCREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def transactional(self) -> bool:
+        return not CONCURRENTLY_REGEX.search(self.sql)
+
+    def statements(self) -> list[str]:
+        return [
+            statement.strip() for statement in re.split(r";\s*$", self.sql, flags=re.MULTILINE) if statement.strip()
+        ]
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    migrations = []
+
+    for path in sorted(directory.glob("*.sql")):
+        match = MIGRATION_FILE_REGEX.fullmatch(path.name)
+        if not match:
+            raise ValueError(f"migration file names must look like 0001_name.sql, not {path.name}")
+        migrations.append(Migration(version=int(match[1]), name=match[2], sql=path.read_text()))
+
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"migration versions must be unique, found {versions}")
+    return migrations
+
+
+async def get_schema_version(conn: asyncpg.Connection) -> int:
+    """
+    Latest applied migration, 0 if none have been
+    """
+    try:
+        return await conn.fetchval("SELECT coalesce(max(version), 0) FROM schema_migrations")
+    except asyncpg.UndefinedTableError:
+        return 0
+
+
+async def migrate(conn: asyncpg.Connection, migrations: list[Migration] | None = None) -> list[Migration]:
+    """
+    Apply any migrations not yet recorded, returns those applied
+    """
+    if migrations is None:
+        migrations = load_migrations()
+
+    await acquire_migration_lock(conn)
+    try:
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        # read after taking the lock, so anything another process applied while we waited is skipped
+        applied = {record["version"] for record in await conn.fetch("SELECT version FROM schema_migrations")}
+        pending = [migration for migration in migrations if migration.version not in applied]
+
+        for migration in pending:
+            logger.info("applying migration %s_%s", migration.version, migration.name)
+            await apply_migration(conn, migration)
+
+        return pending
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+
+async def acquire_migration_lock(conn: asyncpg.Connection) -> None:
+    """
+    Take the migration lock, sleeping between attempts so nothing is left running while waiting
+    """
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_ID):
+        logger.debug("waiting for another process to finish migrating")
+        await asyncio.sleep(MIGRATION_LOCK_POLL_SECONDS)
+
+
+async def drop_invalid_index(conn: asyncpg.Connection, statement: str) -> None:
+    """
+    Drop the index a concurrent build creates if an earlier attempt left it invalid,
+    as IF NOT EXISTS would otherwise skip the build and keep the invalid index
+    """
+    match = CONCURRENT_INDEX_REGEX.search(statement)
+    if not match:
+        return
+
+    index_name = match[1]
+    valid = await conn.fetchval("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)", index_name)
+    if valid is False:
+        logger.warning("dropping invalid index %s left by a failed build", index_name)
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+async def apply_migration(conn: asyncpg.Connection, migration: Migration) -> None:
+    record_query = "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)"
+
+    if migration.transactional:
+        async with conn.transaction():
+            await conn.execute(migration.sql)
+            await conn.execute(record_query, migration.version, migration.name)
+        return
+
+    for statement in migration.statements():
+        await drop_invalid_index(conn, statement)
+        await conn.execute(statement)
+    await conn.execute(record_query, migration.version, migration.name)
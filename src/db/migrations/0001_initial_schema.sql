@@ -1,4 +1,5 @@
--- name: create_schema!
+-- tables as they were set up by create_schema, so existing databases can adopt migrations
+
 CREATE TABLE IF NOT EXISTS authors (
     id SERIAL PRIMARY KEY,
     openlib_id TEXT UNIQUE NOT NULL,
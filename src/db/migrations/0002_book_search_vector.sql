@@ -0,0 +1,30 @@
+-- full text search over title, authors, tags and description, weighted in that order
+ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION books_search_vector(
+    title TEXT, author_names TEXT[], openlib_tags TEXT[], openlib_description TEXT
+) RETURNS TSVECTOR AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(array_to_string(author_names, ' '), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(array_to_string(openlib_tags, ' '), '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(openlib_description, '')), 'D')
+$$ LANGUAGE SQL STABLE;
+
+CREATE OR REPLACE FUNCTION books_search_vector_update() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := books_search_vector(NEW.title, NEW.author_names, NEW.openlib_tags, NEW.openlib_description);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_search_vector_trigger ON books;
+CREATE TRIGGER books_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, author_names, openlib_tags, openlib_description ON books
+    FOR EACH ROW EXECUTE FUNCTION books_search_vector_update();
+
+UPDATE books
+SET search_vector = books_search_vector(title, author_names, openlib_tags, openlib_description)
+WHERE search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS books_search_vector_idx ON books USING GIN (search_vector);
@@ -0,0 +1,6 @@
+-- trigram indexes for fuzzy search, built concurrently so books and authors stay writable
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS books_title_trgm_idx ON books USING GIN (title gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS authors_name_trgm_idx ON authors USING GIN (name gin_trgm_ops);
@@ -0,0 +1,2 @@
+-- keyset pagination of the review feed, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS reviews_created_at_id_idx ON reviews (created_at DESC, id DESC);
@@ -0,0 +1,60 @@
+-- the home page feed, each review with the book and author columns it shows, so reading it needs no joins
+CREATE TABLE IF NOT EXISTS review_feed (
+    review_id INTEGER PRIMARY KEY REFERENCES reviews(id) ON DELETE CASCADE,
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    user_id INTEGER,
+    content TEXT,
+    created_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ,
+    title TEXT NOT NULL,
+    openlib_work_key TEXT,
+    cover_id TEXT,
+    openlib_cover_ids TEXT[],
+    author_names TEXT[],
+    author_keys TEXT[],
+    publishers TEXT[],
+    number_of_pages_median INT,
+    openlib_tags TEXT[],
+    remote_links JSONB,
+    first_publish_year INT,
+    authors JSONB NOT NULL DEFAULT '[]'
+);
+
+-- authors as the feed and book pages show them
+CREATE OR REPLACE FUNCTION book_authors_json(book_id INTEGER) RETURNS JSONB AS $$
+    SELECT coalesce(
+        jsonb_agg(jsonb_build_object('id', a.id, 'name', a.name, 'openlib_id', a.openlib_id) ORDER BY a.id),
+        '[]'
+    )
+    FROM book_authors ba
+    JOIN authors a ON a.id = ba.author_id
+    WHERE ba.book_id = $1
+$$ LANGUAGE SQL STABLE;
+
+CREATE INDEX IF NOT EXISTS review_feed_created_at_review_id_idx ON review_feed (created_at DESC, review_id DESC);
+
+CREATE INDEX IF NOT EXISTS review_feed_book_id_idx ON review_feed (book_id);
+
+INSERT INTO review_feed
+SELECT
+    r.id,
+    r.book_id,
+    r.user_id,
+    r.content,
+    r.created_at,
+    r.updated_at,
+    b.title,
+    b.openlib_work_key,
+    b.cover_id,
+    b.openlib_cover_ids,
+    b.author_names,
+    b.author_keys,
+    b.publishers,
+    b.number_of_pages_median,
+    b.openlib_tags,
+    b.remote_links,
+    b.first_publish_year,
+    book_authors_json(b.id)
+FROM reviews r
+JOIN books b ON b.id = r.book_id
+ON CONFLICT (review_id) DO NOTHING;
@@ -0,0 +1,2 @@
+-- the feed pages from review_feed now, nothing reads reviews in created_at order without a book_id
+DROP INDEX CONCURRENTLY IF EXISTS reviews_created_at_id_idx;
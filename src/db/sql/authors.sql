@@ -24,3 +24,6 @@ VALUES (
 )
 ON CONFLICT (openlib_id) DO UPDATE SET openlib_id = EXCLUDED.openlib_id
 RETURNING id;
+
+-- name: get_openlib_ids_of_stored_authors
+SELECT openlib_id FROM authors WHERE openlib_id = ANY(:openlib_ids);
@@ -24,6 +24,18 @@ ORDER BY book.updated_at DESC
 LIMIT 10;
 
 -- name: search_books
+-- Ranked full text search, :ts_query is built from what was typed by BookRepository.
+-- Books are ranked and limited on the search index before their authors are joined,
+-- books without any linked authors are still found.
+WITH matches AS (
+    SELECT
+        b.id,
+        ts_rank_cd(b.search_vector, query) AS rank
+    FROM books b, to_tsquery('english', :ts_query) query
+    WHERE b.search_vector @@ query
+    ORDER BY rank DESC, b.id
+    LIMIT :limit OFFSET :offset
+)
 SELECT 
     b.id AS book_id,
     b.title,
@@ -38,19 +50,44 @@ SELECT
     b.openlib_tags,
     b.remote_links,
     b.first_publish_year,
-    json_agg(json_build_object(
+    m.rank,
+    COALESCE(json_agg(json_build_object(
         'id', a.id,
         'name', a.name,
         'openlib_id', a.openlib_id
-    ) ORDER BY a.name) AS authors
-FROM books b
-JOIN book_authors ba ON ba.book_id = b.id
-JOIN authors a ON a.id = ba.author_id
-WHERE
-    b.title ILIKE '%' || :search_query || '%'
-    OR a.name ILIKE '%' || :search_query || '%'
-GROUP BY 
-    b.id,
+    ) ORDER BY a.name) FILTER (WHERE a.id IS NOT NULL), '[]') AS authors
+FROM matches m
+JOIN books b ON b.id = m.id
+LEFT JOIN book_authors ba ON ba.book_id = b.id
+LEFT JOIN authors a ON a.id = ba.author_id
+GROUP BY b.id, m.rank
+ORDER BY m.rank DESC, b.id;
+
+-- name: fuzzy_search_books
+-- Books with a title or author name similar to :search_query, for when full text search finds nothing.
+-- The <% operator uses the trigram indexes and only matches above pg_trgm.word_similarity_threshold,
+-- so BookRepository sets that to :threshold for the query.
+WITH matches AS (
+    SELECT
+        scored.book_id,
+        max(scored.score) AS score
+    FROM (
+        SELECT b.id AS book_id, word_similarity(:search_query, b.title) AS score
+        FROM books b
+        WHERE :search_query <% b.title
+        UNION ALL
+        SELECT ba.book_id, word_similarity(:search_query, a.name) AS score
+        FROM authors a
+        JOIN book_authors ba ON ba.author_id = a.id
+        WHERE :search_query <% a.name
+    ) scored
+    WHERE scored.score >= :threshold
+    GROUP BY scored.book_id
+    ORDER BY score DESC, scored.book_id
+    LIMIT :limit
+)
+SELECT 
+    b.id AS book_id,
     b.title,
     b.openlib_work_key,
     b.cover_id,
@@ -62,9 +99,19 @@ GROUP BY
     b.number_of_pages_median,
     b.openlib_tags,
     b.remote_links,
-    b.first_publish_year
-ORDER BY b.title
-LIMIT 100;
+    b.first_publish_year,
+    m.score,
+    COALESCE(json_agg(json_build_object(
+        'id', a.id,
+        'name', a.name,
+        'openlib_id', a.openlib_id
+    ) ORDER BY a.name) FILTER (WHERE a.id IS NOT NULL), '[]') AS authors
+FROM matches m
+JOIN books b ON b.id = m.book_id
+LEFT JOIN book_authors ba ON ba.book_id = b.id
+LEFT JOIN authors a ON a.id = ba.author_id
+GROUP BY b.id, m.score
+ORDER BY m.score DESC, b.id;
 
 -- name: get_books_by_author
 SELECT 
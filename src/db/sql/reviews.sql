@@ -1,46 +1,85 @@
 -- name: get_most_recent_book_reviews(limit)
+-- The newest page of the home feed, read from review_feed so no joins are needed
 SELECT
-    r.id AS review_id,
-    r.book_id,
-    r.user_id,
-    r.content,
-    r.created_at,
-    r.updated_at,
-    b.id AS book_id,
-    b.title,
-    b.openlib_work_key,
-    b.cover_id,
-    b.openlib_cover_ids,
-    b.author_names,
-    b.author_keys,
-    b.publishers,
-    b.number_of_pages_median,
-    b.openlib_tags,
-    b.remote_links,
-    b.first_publish_year,
-
-    json_agg(json_build_object(
-        'id', a.id,
-        'name', a.name,
-        'openlib_id', a.openlib_id
-    ) ORDER BY a.id) AS authors
-FROM reviews r
-JOIN books b ON b.id = r.book_id
-LEFT JOIN book_authors ba ON ba.book_id = b.id
-LEFT JOIN authors a ON a.id = ba.author_id
-GROUP BY r.id, b.id
-ORDER BY r.created_at DESC
+    review_id,
+    book_id,
+    user_id,
+    content,
+    created_at,
+    updated_at,
+    title,
+    openlib_work_key,
+    cover_id,
+    openlib_cover_ids,
+    author_names,
+    author_keys,
+    publishers,
+    number_of_pages_median,
+    openlib_tags,
+    remote_links,
+    first_publish_year,
+    authors
+FROM review_feed
+ORDER BY created_at DESC, review_id DESC
 LIMIT :limit;
 
 -- name: get_recent_reviews_by_cursor(limit, cursor, previous_review_id)
+-- Reviews older than the last one shown, ordered by (created_at, review_id) so reviews with the same timestamp
+-- are neither skipped nor repeated. Every page is a single range scan of review_feed_created_at_review_id_idx,
+-- so costs the same however far back it is.
 SELECT
-    r.id AS review_id,
+    review_id,
+    book_id,
+    user_id,
+    content,
+    created_at,
+    updated_at,
+    title,
+    openlib_work_key,
+    cover_id,
+    openlib_cover_ids,
+    author_names,
+    author_keys,
+    publishers,
+    number_of_pages_median,
+    openlib_tags,
+    remote_links,
+    first_publish_year,
+    authors
+FROM review_feed
+WHERE (created_at, review_id) < (:cursor, :previous_review_id)
+ORDER BY created_at DESC, review_id DESC
+LIMIT :limit;
+
+-- name: refresh_book_in_review_feed!
+-- Copy a book's current details and authors to its reviews in the feed, after the book is stored again
+UPDATE review_feed f
+SET
+    title = b.title,
+    openlib_work_key = b.openlib_work_key,
+    cover_id = b.cover_id,
+    openlib_cover_ids = b.openlib_cover_ids,
+    author_names = b.author_names,
+    author_keys = b.author_keys,
+    publishers = b.publishers,
+    number_of_pages_median = b.number_of_pages_median,
+    openlib_tags = b.openlib_tags,
+    remote_links = b.remote_links,
+    first_publish_year = b.first_publish_year,
+    authors = book_authors_json(b.id)
+FROM books b
+WHERE f.book_id = b.id AND b.id = :book_id;
+
+-- name: rebuild_review_feed!
+-- Add any reviews missing from the feed and refresh the rest, for after reviews were written some other way
+INSERT INTO review_feed
+SELECT
+    r.id,
     r.book_id,
     r.user_id,
     r.content,
     r.created_at,
     r.updated_at,
-    b.id AS book_id,
     b.title,
     b.openlib_work_key,
     b.cover_id,
@@ -52,21 +91,24 @@ SELECT
     b.openlib_tags,
     b.remote_links,
     b.first_publish_year,
-    json_agg(
-        json_build_object(
-            'id', a.id,
-            'name', a.name,
-            'openlib_id', a.openlib_id
-        ) ORDER BY a.id
-    ) AS authors
+    book_authors_json(b.id)
 FROM reviews r
 JOIN books b ON b.id = r.book_id
-LEFT JOIN book_authors ba ON ba.book_id = b.id
-LEFT JOIN authors a ON a.id = ba.author_id
-WHERE r.created_at <= :cursor AND (r.id != :previous_review_id OR :previous_review_id IS NULL)
-GROUP BY r.id, b.id
-ORDER BY r.created_at DESC, r.id DESC
-LIMIT :limit;
+ON CONFLICT (review_id) DO UPDATE SET
+    content = EXCLUDED.content,
+    updated_at = EXCLUDED.updated_at,
+    title = EXCLUDED.title,
+    openlib_work_key = EXCLUDED.openlib_work_key,
+    cover_id = EXCLUDED.cover_id,
+    openlib_cover_ids = EXCLUDED.openlib_cover_ids,
+    author_names = EXCLUDED.author_names,
+    author_keys = EXCLUDED.author_keys,
+    publishers = EXCLUDED.publishers,
+    number_of_pages_median = EXCLUDED.number_of_pages_median,
+    openlib_tags = EXCLUDED.openlib_tags,
+    remote_links = EXCLUDED.remote_links,
+    first_publish_year = EXCLUDED.first_publish_year,
+    authors = EXCLUDED.authors;
 
 -- name: get_reviews_by_book_id
 SELECT * FROM reviews JOIN books ON books.id = reviews.book_id WHERE reviews.book_id = :book_id;
@@ -108,7 +150,7 @@ SELECT
     updated_at
 FROM reviews
 WHERE book_id = :book_id
-ORDER BY created_at DESC;
+ORDER BY created_at DESC, id DESC;
 
 -- name: get_reviews_for_books
 SELECT 
@@ -120,7 +162,7 @@ SELECT
     r.updated_at
 FROM reviews r
 WHERE r.book_id = ANY(:book_ids) 
-ORDER BY r.created_at DESC;
+ORDER BY r.created_at DESC, r.id DESC;
 
 -- name: get_review_and_book_by_review_id^
 SELECT
@@ -156,12 +198,38 @@ WHERE r.id = :review_id
 GROUP BY r.id, b.id;
 
 -- name: insert_review!
-INSERT INTO reviews (
-        user_id,
-        book_id,
-        content
-) VALUES (
-        :user_id,
-        :book_id,
-        :content
-        );
+-- The review is added to the home feed in the same statement, with its book as it is now
+WITH review AS (
+    INSERT INTO reviews (
+            user_id,
+            book_id,
+            content
+    ) VALUES (
+            :user_id,
+            :book_id,
+            :content
+            )
+    RETURNING *
+)
+INSERT INTO review_feed
+SELECT
+    r.id,
+    r.book_id,
+    r.user_id,
+    r.content,
+    r.created_at,
+    r.updated_at,
+    b.title,
+    b.openlib_work_key,
+    b.cover_id,
+    b.openlib_cover_ids,
+    b.author_names,
+    b.author_keys,
+    b.publishers,
+    b.number_of_pages_median,
+    b.openlib_tags,
+    b.remote_links,
+    b.first_publish_year,
+    book_authors_json(b.id)
+FROM review r
+JOIN books b ON b.id = r.book_id;
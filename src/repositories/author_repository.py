@@ -32,6 +32,13 @@ class AuthorRepository:
             return result["id"]
         return None
 
+    async def get_stored_openlib_ids(self, author_openlib_ids: list[str]) -> set[str]:
+        """
+        Which of author_openlib_ids are already stored, in one query
+        """
+        records = await self.db.run_query("get_openlib_ids_of_stored_authors", openlib_ids=author_openlib_ids)
+        return {record["openlib_id"] for record in records}
+
     """ Check values """
 
     async def check_if_author_exists(self, author_openlib_id: str) -> bool:
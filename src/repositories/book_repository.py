@@ -1,4 +1,5 @@
 import logging
+import re
 from collections import defaultdict
 
 
@@ -9,6 +10,13 @@ from .review_repository import ReviewRepository
 
 logger = logging.getLogger("app")
 
+# the lowest word similarity kept by fuzzy search, set as pg_trgm.word_similarity_threshold for the query
+# so the trigram indexes return matches down to it
+FUZZY_SEARCH_THRESHOLD = 0.6
+
+# a quoted phrase, or a single word
+SEARCH_TERM_REGEX = re.compile(r'"([^"]*)"|(\S+)')
+
 
 class BookRepository:
     def __init__(self, db: Database, review_repo: ReviewRepository):
@@ -68,8 +76,40 @@ class BookRepository:
 
     """ search values """
 
-    async def search_books(self, search_query: str):
-        records = await self.db.run_query("search_books", search_query=search_query)
+    async def search_books(self, search_query: str, limit: int = 100, offset: int = 0) -> list[Book | None]:
+        """
+        Books matching every term in search_query, best matches first.
+        Words match anything starting with them, quoted words must appear together as a phrase.
+
+        If nothing matches, the first page falls back to fuzzy search, so misspelt searches still find books.
+        """
+        ts_query = build_ts_query(search_query)
+        if not ts_query:
+            return []
+
+        records = await self.db.run_query("search_books", ts_query=ts_query, limit=limit, offset=offset)
+        if not records and not offset:
+            logger.info("no full text matches for %s, trying fuzzy search", search_query)
+            return await self.fuzzy_search_books(search_query, limit=limit)
+        return Book.from_db_records(records)
+
+    async def fuzzy_search_books(
+        self, search_query: str, limit: int = 10, threshold: float = FUZZY_SEARCH_THRESHOLD
+    ) -> list[Book | None]:
+        """
+        Books with a title or author name similar to search_query, most similar first
+        """
+        search_query = search_query.replace('"', "").strip()
+        if not search_query:
+            return []
+
+        records = await self.db.run_query(
+            "fuzzy_search_books",
+            local_settings={"pg_trgm.word_similarity_threshold": threshold},
+            search_query=search_query,
+            limit=limit,
+            threshold=threshold,
+        )
         return Book.from_db_records(records)
 
     async def get_book_and_reviews_by_book_id(self, book_id: int) -> tuple[Book | None, list[Review]]:
@@ -83,3 +123,24 @@ class BookRepository:
         reviews = [Review.from_db_record(r) for r in review_records]
 
         return book, reviews
+
+
+def build_ts_query(search_query: str) -> str:
+    """
+    Turn a search typed by a user into to_tsquery syntax, anything but letters and numbers is dropped
+    so the query can't be malformed:
+
+    >>> build_ts_query('"great expectations" dick')
+    '(great <-> expectations) & dick:*'
+    """
+    terms = []
+
+    for phrase, word in SEARCH_TERM_REGEX.findall(search_query):
+        if phrase:
+            lexemes = re.findall(r"\w+", phrase)
+            if lexemes:
+                terms.append(f"({' <-> '.join(lexemes)})" if len(lexemes) > 1 else lexemes[0])
+        else:
+            terms.extend(f"{lexeme}:*" for lexeme in re.findall(r"\w+", word))
+
+    return " & ".join(terms)
@@ -7,16 +7,34 @@ from db.models import Book, Review
 
 logger = logging.getLogger("app")
 
+# above any review id, so without a review id every review at the cursor time is included
+MAX_REVIEW_ID = 2**31 - 1
+
 
 class ReviewRepository:
     def __init__(self, db: Database):
         self.db = db
 
     async def insert_review(self, user_id, book_id, review):
+        """
+        Also adds the review to the home feed, so the book and its authors should be stored first
+        """
         if not user_id or not book_id or not review:
             logger.critical("invalid parameters: user_id: %s, book_id: %s, review: %s", user_id, book_id, review)
         return await self.db.run_query("insert_review", book_id=book_id, user_id=user_id, content=review)
 
+    """ Home feed """
+
+    async def refresh_book_in_feed(self, book_id: int) -> None:
+        """
+        Update the feed after a book or its authors are stored again
+        """
+        await self.db.run_query("refresh_book_in_review_feed", book_id=book_id)
+
+    async def rebuild_feed(self) -> None:
+        logger.info("rebuilding review feed")
+        await self.db.run_query("rebuild_review_feed")
+
     """ Get or read values """
 
     async def get_reviews_for_books(self, book_ids: list[int]) -> list[Review]:
@@ -37,8 +55,17 @@ class ReviewRepository:
     async def get_recent_reviews_by_cursor(
         self, limit: int = 20, cursor: datetime | None = None, review_id: int | None = None
     ):
+        """
+        Reviews after the one with created_at cursor and id review_id, in the order of the home page feed
+        """
+        if cursor is None:
+            return []
+
         records = await self.db.run_query(
-            "get_recent_reviews_by_cursor", limit=limit, cursor=cursor, previous_review_id=review_id
+            "get_recent_reviews_by_cursor",
+            limit=limit,
+            cursor=cursor,
+            previous_review_id=MAX_REVIEW_ID if review_id is None else review_id,
         )
         logger.debug(records)
         return Review.from_db_records(records)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any
 
-from calls.openlib import validate_openlib_work_id
+from calls.openlib import ISBN_REGEX, validate_openlib_work_id
 
 
 def validate_form(data: dict, session_token: str, form_fields: dict) -> dict:
@@ -55,6 +55,15 @@ def is_openlib_work_id(value: str) -> dict:
     return {"success": False, "error": "Invalid openlibrary work ID"}
 
 
+def is_openlib_work_id_or_isbn(value: str) -> dict:
+    """
+    Google books search results are submitted with an isbn, which is mapped to a work when the review is processed
+    """
+    if ISBN_REGEX.fullmatch(value.strip()):
+        return {"success": True, "value": value.strip()}
+    return is_openlib_work_id(value)
+
+
 def is_valid_date(date_str: str) -> dict:
     try:
         # Parse ISO 8601 datetime string
@@ -89,7 +98,7 @@ def validate_csrf_token(session_token: str, form_token: str) -> dict:
 
 
 book_submit_fields = {
-    "openlib_id_hidden": [is_required, is_openlib_work_id],
+    "openlib_id_hidden": [is_required, is_openlib_work_id_or_isbn],
     "review": [is_required, is_under_max_length],
     "csrf_token": [validate_csrf_token],
 }
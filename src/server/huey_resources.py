@@ -1,8 +1,11 @@
 import asyncio
 import logging
 
+from calls.cache import ResponseCache
 from calls.client import Client
+from calls.covers import CoverCache, CoverStore, HttpCoverUpstream
 from calls.openlib import OpenLibCaller
+from calls.replay import make_transport
 from db import Database
 from logging.config import dictConfig
 from repositories import QueueRepository, AuthorRepository, BookRepository, ReviewRepository, UserRepository
@@ -16,10 +19,40 @@ logger = logging.getLogger("app.tasks")
 
 class HueyResourceContainer:
     def __init__(self):
-        self.db = Database(user=settings.POSTGRES_USER, password=settings.POSTGRES_PASSWORD, url=settings.POSTGRES_URL)
+        self.db = Database(
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            url=settings.POSTGRES_URL,
+            migrate_on_startup=settings.DB_MIGRATE_ON_STARTUP,
+        )
 
-        self.client = Client(email=settings.EMAIL_ADDRESS)
-        self.openlib_caller = OpenLibCaller(client=self.client, max_concurrent_requests=1)
+        cache = ResponseCache(settings.OPENLIB_CACHE_PATH) if settings.OPENLIB_CACHE_ENABLED else None
+        self.client = Client(
+            email=settings.EMAIL_ADDRESS,
+            cache=cache,
+            requests_per_second=settings.OPENLIB_REQUESTS_PER_SECOND,
+            burst=settings.OPENLIB_REQUEST_BURST,
+            max_connections=settings.OPENLIB_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENLIB_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENLIB_KEEPALIVE_EXPIRY,
+            http2=settings.OPENLIB_HTTP2,
+            stream=settings.OPENLIB_STREAM_RESPONSES,
+            breaker_failure_rate=settings.OPENLIB_BREAKER_FAILURE_RATE or None,
+            breaker_slow_call_seconds=settings.OPENLIB_BREAKER_SLOW_CALL_SECONDS,
+            breaker_reset_timeout=settings.OPENLIB_BREAKER_RESET_TIMEOUT,
+            transport=make_transport(
+                settings.OPENLIB_TRANSPORT,
+                settings.OPENLIB_FIXTURES_PATH,
+                latency=settings.OPENLIB_REPLAY_LATENCY,
+                error_rate=settings.OPENLIB_REPLAY_ERROR_RATE,
+            ),
+        )
+        # the client's per host rate limit sets the pace, so lookups within a task can run concurrently
+        self.openlib_caller = OpenLibCaller(client=self.client, root_url=settings.OPENLIB_ROOT_URL)
+        self.cover_store = CoverStore(
+            cache=CoverCache(settings.COVERS_CACHE_PATH, max_bytes=settings.COVERS_CACHE_MAX_BYTES),
+            upstream=HttpCoverUpstream(settings.COVERS_UPSTREAM_URL, email=settings.EMAIL_ADDRESS),
+        )
 
         self.queue_repo = QueueRepository(db=self.db)
         self.author_repo = AuthorRepository(db=self.db)
@@ -35,6 +68,7 @@ class HueyResourceContainer:
 
     async def _async_shutdown(self):
         await self.client.close_session()
+        await self.cover_store.close()
         logger.info("closing down huey resources")
 
     def startup(self):
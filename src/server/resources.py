@@ -1,6 +1,11 @@
 import logging
+from calls.cache import ResponseCache
 from calls.client import Client
+from calls.covers import CoverCache, CoverStore, HttpCoverUpstream
+from calls.federated import FederatedSearcher
+from calls.google_books import GoogleBooksCaller
 from calls.openlib import OpenLibCaller
+from calls.replay import make_transport
 from db import Database
 from repositories import AuthorRepository, BookRepository, QueueRepository, ReviewRepository, UserRepository
 from config import settings
@@ -11,9 +16,48 @@ logger = logging.getLogger("app")
 
 class AppResourceContainer:
     def __init__(self):
-        self.client = Client(email=settings.EMAIL_ADDRESS)
-        self.openlib_caller = OpenLibCaller(client=self.client)
-        self.db = Database(user=settings.POSTGRES_USER, password=settings.POSTGRES_PASSWORD, url=settings.POSTGRES_URL)
+        cache = ResponseCache(settings.OPENLIB_CACHE_PATH) if settings.OPENLIB_CACHE_ENABLED else None
+        self.client = Client(
+            email=settings.EMAIL_ADDRESS,
+            cache=cache,
+            deadline=settings.OPENLIB_REQUEST_DEADLINE,
+            requests_per_second=settings.OPENLIB_REQUESTS_PER_SECOND,
+            burst=settings.OPENLIB_REQUEST_BURST,
+            max_connections=settings.OPENLIB_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENLIB_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENLIB_KEEPALIVE_EXPIRY,
+            http2=settings.OPENLIB_HTTP2,
+            stream=settings.OPENLIB_STREAM_RESPONSES,
+            breaker_failure_rate=settings.OPENLIB_BREAKER_FAILURE_RATE or None,
+            breaker_slow_call_seconds=settings.OPENLIB_BREAKER_SLOW_CALL_SECONDS,
+            breaker_reset_timeout=settings.OPENLIB_BREAKER_RESET_TIMEOUT,
+            hedge_percentile=settings.OPENLIB_HEDGE_PERCENTILE or None,
+            hedge_max_ratio=settings.OPENLIB_HEDGE_MAX_RATIO,
+            transport=make_transport(
+                settings.OPENLIB_TRANSPORT,
+                settings.OPENLIB_FIXTURES_PATH,
+                latency=settings.OPENLIB_REPLAY_LATENCY,
+                error_rate=settings.OPENLIB_REPLAY_ERROR_RATE,
+            ),
+        )
+        self.openlib_caller = OpenLibCaller(client=self.client, root_url=settings.OPENLIB_ROOT_URL)
+        self.google_caller = GoogleBooksCaller(client=self.client, pprint_results=False)
+        self.book_searcher = FederatedSearcher(
+            openlib_caller=self.openlib_caller,
+            google_caller=self.google_caller,
+            mode=settings.BOOK_SEARCH_MODE,
+            latency_budget=settings.BOOK_SEARCH_LATENCY_BUDGET,
+        )
+        self.cover_store = CoverStore(
+            cache=CoverCache(settings.COVERS_CACHE_PATH, max_bytes=settings.COVERS_CACHE_MAX_BYTES),
+            upstream=HttpCoverUpstream(settings.COVERS_UPSTREAM_URL, email=settings.EMAIL_ADDRESS),
+        )
+        self.db = Database(
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            url=settings.POSTGRES_URL,
+            migrate_on_startup=settings.DB_MIGRATE_ON_STARTUP,
+        )
 
         self.review_repo = ReviewRepository(db=self.db)
         self.author_repo = AuthorRepository(db=self.db)
@@ -24,11 +68,13 @@ class AppResourceContainer:
     async def startup(self):
         await self.db.start_up()
         await self.user_repo.create_anon()
+        await self.client.warm_up(self.openlib_caller.root_url)
         logger.info("application resources started")
 
     async def shutdown(self):
         await self.db.close_down()
         await self.client.close_session()
+        await self.cover_store.close()
         logger.info("application resources shutdown")
 
 
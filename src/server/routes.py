@@ -17,8 +17,10 @@ routes = [
     Route("/book/{book_id:int}", views.book_page, name="book"),
     Route("/author/{author_id:int}", views.author_page, name="author"),
     Route("/review/{review_id:int}", views.review_page, name="review"),
+    Route("/covers/{cover_id:int}-{size}.jpg", views.cover, name="cover"),
     # api routes
     Route("/api/csrf-token", views.set_csrf_token, name="csrf-token"),
+    Route("/api/metrics", views.call_metrics, name="metrics"),
     Route("/api/fetch-more-reviews", views.fetch_more_reviews, name="fetch-more-reviews", methods=["POST"]),
     Route("/api/search", views.local_search_api, name="search-api", methods=["POST"]),
     Route("/api/search-openlib", views.search_openlib, name="search-openlib", methods=["POST"]),
@@ -2,8 +2,10 @@ import logging
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-from huey import SqliteHuey
+from huey import SqliteHuey, crontab
 
+from calls.metrics import write_metrics
+from calls.openlib import validate_openlib_work_id
 from db.models import Author, Book
 from config import settings
 from .huey_resources import resources
@@ -25,6 +27,11 @@ def on_shutdown():
     resources.shutdown()
 
 
+@huey.periodic_task(crontab(minute="*"))
+def publish_call_metrics():
+    write_metrics(settings.CALL_METRICS_PATH)
+
+
 @huey.task()
 def process_review_submission(submission_id):
     if not resources.loop:
@@ -45,7 +52,10 @@ async def _async_process_review_submission(submission_id):
     username = submission.get("username", "anon")
 
     try:
-        result = await _fetch_and_store_book_data(openlib_id, review, username)
+        if not validate_openlib_work_id(openlib_id):
+            openlib_id = await _get_work_id_for_isbn(openlib_id)
+
+        result = openlib_id and await _fetch_and_store_book_data(openlib_id, review, username)
 
         if not result:
             logger.warning(f"error adding in openlib_id: {openlib_id}, id: {submission_id}")
@@ -56,6 +66,17 @@ async def _async_process_review_submission(submission_id):
         logger.warning(f"there was an error processing submission id: {submission_id}: {exc}")
 
 
+async def _get_work_id_for_isbn(isbn: str) -> str | None:
+    """
+    Google books search results have no work key, so reviews of them are submitted with an isbn instead
+    """
+    results = await resources.openlib_caller.search_by_isbns([isbn], limit=1)
+    if not results:
+        logger.warning(f"no openlibrary work found for isbn: {isbn}")
+        return None
+    return results[0]["openlib_work_key"]
+
+
 async def _fetch_and_store_book_data(openlib_id: str, review: str, username="anon") -> bool:
     logger.info(f"fetching book data for {openlib_id}")
     book = await resources.book_repo.get_book_by_openlib_id(openlib_id)
@@ -66,7 +87,10 @@ async def _fetch_and_store_book_data(openlib_id: str, review: str, username="ano
 
     if not book or not book.updated_at or (book.updated_at < one_year_ago):
         logger.info("getting data from openlibrary")
-        book_data, complete_authors = await resources.openlib_caller.get_book_data_for_db(work_id=openlib_id)
+        # authors already stored only need their names, so skip fetching their author pages
+        book_data, complete_authors = await resources.openlib_caller.get_book_data_for_db(
+            work_id=openlib_id, stored_authors=resources.author_repo.get_stored_openlib_ids
+        )
 
         book = Book.from_dict(book_data)
 
@@ -91,8 +115,13 @@ async def _fetch_and_store_book_data(openlib_id: str, review: str, username="ano
 
             logger.info("linking book to author: book_id: %s, author_id: %s", book_id, author_id)
             await resources.book_repo.link_book_author(book_id, author_id)
+
+        # reviews of a refreshed book are already in the feed with its old details
+        await resources.review_repo.refresh_book_in_feed(book_id)
+        fetched_cover_id = book.cover_id
     else:
         book_id = book.id
+        fetched_cover_id = None
 
     user_id = await resources.user_repo.get_user_id_by_username(username)
 
@@ -100,4 +129,8 @@ async def _fetch_and_store_book_data(openlib_id: str, review: str, username="ano
 
     logger.info(f"inserting review: {review}")
     await resources.review_repo.insert_review(user_id, book_id, review)
+
+    # only once the review is stored, so a slow covers api can't hold it up
+    if fetched_cover_id:
+        await resources.cover_store.prefetch([fetched_cover_id])
     return True
@@ -5,9 +5,11 @@ from collections.abc import Callable
 from typing import Any
 
 from starlette.requests import Request
-from starlette.responses import JSONResponse, RedirectResponse
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response
 from starlette.templating import Jinja2Templates
 
+from calls.covers import COVER_SIZES
+from calls.metrics import export_metrics
 from db.models import Book
 from .form_validators import (
     book_submit_fields,
@@ -105,6 +107,22 @@ async def author_page(request: Request):
     return templates.TemplateResponse(request, "author.html", context=context)
 
 
+async def cover(request: Request):
+    """
+    Use /covers/cover_id-size.jpg to return a cover from the local cache, size is S, M or L
+    """
+    cover_id = request.path_params["cover_id"]
+    size = request.path_params["size"]
+
+    path = await resources.cover_store.get(cover_id, size) if size in COVER_SIZES else None
+    if path is None:
+        # the cover may turn up later, so only cache a miss briefly
+        return Response(status_code=404, headers={"Cache-Control": "public, max-age=300"})
+
+    # a cover id always refers to the same image
+    return FileResponse(path, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
 async def search(request):
     async def on_success(clean_form):
         q = clean_form["search_query"].replace(" ", "+")
@@ -267,7 +285,7 @@ async def local_search_api(request):
 async def search_openlib(request: Request):
     async def on_success(clean_form):
         logging.info("calling openlibrary with: %s", clean_form["search_query"])
-        results = await resources.openlib_caller.search_books(search_query=clean_form["search_query"], limit=10)
+        results = await resources.book_searcher.search_books(search_query=clean_form["search_query"], limit=10)
         if results:
             logging.debug(results)
             books = [Book.from_dict(res).to_json_dict() for res in results]
@@ -283,6 +301,24 @@ async def search_openlib(request: Request):
     return await handle_form(request, search_form_fields, on_success)
 
 
+async def call_metrics(request: Request):
+    """
+    Metrics for this process's calls to openlibrary and google books, in the prometheus text format
+
+    Only served with the CALL_METRICS_TOKEN as a bearer token, and not at all without one set,
+    as they show the site's traffic and errors
+    """
+    token = str(settings.CALL_METRICS_TOKEN)
+    if not token:
+        return Response(status_code=404)
+
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(credentials.encode(), token.encode()):
+        return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+
+    return PlainTextResponse(export_metrics(), media_type="text/plain; version=0.0.4")
+
+
 async def submit_book(request: Request):
     async def on_success(clean):
         logger.info(f"inserting form data into queue: {clean}")
@@ -17,10 +17,12 @@ export function createBookCardEl(book) {
   const pageNumEl = createPageNumEl(book.number_of_pages_median);
   if (pageNumEl) bookMetaEl.appendChild(pageNumEl);
 
-  const openLibLink = getOpenLibLink(book.openlib_work_key);
+  // google books results have no work key, so they are found by isbn
+  const isbn = [...(book.isbns_13 || []), ...(book.isbns_10 || [])][0];
+  const openLibLink = getOpenLibLink(book.openlib_work_key || `/isbn/${isbn}`);
   bookMetaEl.appendChild(createOpenLibLinkEl(openLibLink));
 
-  const hiddenIdEl = createHiddenIdEl(book.openlib_work_key);
+  const hiddenIdEl = createHiddenIdEl(book.openlib_work_key || isbn);
   bookMetaEl.appendChild(hiddenIdEl);
 
   const selectBtnEl = createSelectBtnEl();
@@ -64,7 +66,7 @@ export function createLocalBookCard(book) {
 }
 
 export function getImgUrl(coverId) {
-  return `https://covers.openlibrary.org/b/id/${coverId}-M.jpg`;
+  return `/covers/${coverId}-M.jpg`;
 }
 
 export function createImgWrapperEl(imgUrl) {
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from calls.cache import ResponseCache, make_cache_key
+from calls.endpoints import endpoint_kind
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(tmp_path / "cache.db")
+
+
+def test_make_cache_key_normalises_params():
+    key = make_cache_key("https://OpenLibrary.org/search.json?q=dickens&limit=5")
+    assert key == make_cache_key("https://openlibrary.org/search.json", {"limit": 5, "q": "dickens"})
+    assert key != make_cache_key("https://openlibrary.org/search.json", {"limit": 6, "q": "dickens"})
+
+
+def test_endpoint_kind():
+    assert endpoint_kind("https://openlibrary.org/search.json?q=key:/works/OL1W") == "search"
+    assert endpoint_kind("https://openlibrary.org/search/authors.json?q=dickens") == "search"
+    assert endpoint_kind("https://openlibrary.org/works/OL1W.json") == "works"
+    assert endpoint_kind("https://openlibrary.org/works/OL1W/editions.json") == "editions"
+    assert endpoint_kind("https://openlibrary.org/authors/OL1A.json") == "authors"
+    assert endpoint_kind("https://www.googleapis.com/books/v1/volumes") == "google"
+
+
+def test_set_and_get(cache):
+    url = "https://openlibrary.org/works/OL1W.json"
+    cache.set(url, {}, {"title": "Test"}, {"etag": '"abc"', "last-modified": "Wed, 01 Jan 2025 00:00:00 GMT"})
+
+    cached = cache.get(url)
+
+    assert cached.data == {"title": "Test"}
+    assert cached.kind == "works"
+    assert cached.is_fresh
+    assert cached.revalidation_headers() == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT",
+    }
+    assert cache.get("https://openlibrary.org/works/OL2W.json") is None
+
+
+def test_ttl_by_endpoint(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db", ttls={"search": 0})
+    cache.set("https://openlibrary.org/search.json?q=test", {}, {"docs": []})
+    cache.set("https://openlibrary.org/authors/OL1A.json", {}, {"name": "Test"})
+
+    assert not cache.get("https://openlibrary.org/search.json?q=test").is_fresh
+    assert cache.get("https://openlibrary.org/authors/OL1A.json").is_fresh
+
+
+def test_refresh_extends_expiry(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db", ttls={"works": 0})
+    url = "https://openlibrary.org/works/OL1W.json"
+    cache.set(url, {}, {"title": "Test"})
+    assert not cache.get(url).is_fresh
+
+    cache.ttls["works"] = 60
+    cache.refresh(url)
+
+    assert cache.get(url).expires_at > time.time()
+    assert cache.stats()["counters"]["revalidated"] == 1
+
+
+def test_stats_and_purge(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db", ttls={"search": 0})
+    cache.set("https://openlibrary.org/search.json?q=test", {}, {"docs": []})
+    cache.set("https://openlibrary.org/works/OL1W.json", {}, {"title": "Test"})
+    cache.record("hits")
+
+    stats = cache.stats()
+    assert stats["counters"]["hits"] == 1
+    assert stats["counters"]["stored"] == 2
+    assert stats["entries"]["search"]["expired"] == 1
+    assert stats["entries"]["works"]["entries"] == 1
+
+    assert cache.purge(expired_only=True) == 1
+    assert cache.get("https://openlibrary.org/works/OL1W.json") is not None
+
+    assert cache.purge() == 1
+    assert cache.stats() == {"path": str(cache.path), "counters": dict.fromkeys(stats["counters"], 0), "entries": {}}
+
+
+def test_counters_flushed_periodically(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.db", flush_interval=60)
+    other = ResponseCache(tmp_path / "cache.db")
+    cache.record("hits")
+    cache.record("misses")
+    cache.get("https://openlibrary.org/works/OL1W.json")
+
+    # another process reading the file doesn't see them until they are flushed
+    assert other.stats()["counters"]["hits"] == 0
+
+    cache.flush_interval = 0
+    cache.get("https://openlibrary.org/works/OL1W.json")
+
+    assert other.stats()["counters"]["hits"] == 1
+    assert other.stats()["counters"]["misses"] == 1
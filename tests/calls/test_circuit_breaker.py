@@ -0,0 +1,82 @@
+import pytest
+
+from calls.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, circuit_breaker_stats, get_host_breaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("calls.circuit_breaker.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_on_failure_rate(clock):
+    breaker = CircuitBreaker("example.com", failure_rate=0.5, window=4, min_calls=4)
+
+    for success in (True, False, True):
+        breaker.record(success, 0.1)
+    assert breaker.state == CLOSED
+
+    breaker.record(False, 0.1)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()["short_circuits"] == 1
+    assert breaker.stats()["trips"] == 1
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker("example.com", slow_call_seconds=1.0, window=2, min_calls=2)
+
+    breaker.record(True, 2.0)
+    breaker.record(True, 3.0)
+
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_on_success(clock):
+    breaker = CircuitBreaker("example.com", window=1, min_calls=1, reset_timeout=30)
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    clock[0] += 30
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    # only one probe at a time
+    assert not breaker.allow_request()
+
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+def test_half_open_probe_reopens_on_failure(clock):
+    breaker = CircuitBreaker("example.com", window=1, min_calls=1, reset_timeout=30)
+    breaker.record(False, 0.1)
+
+    clock[0] += 30
+    assert breaker.allow_request()
+    breaker.record(False, 0.1)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["trips"] == 2
+    assert not breaker.allow_request()
+
+
+def test_lost_probe_is_replaced(clock):
+    breaker = CircuitBreaker("example.com", window=1, min_calls=1, reset_timeout=30)
+    breaker.record(False, 0.1)
+
+    clock[0] += 30
+    assert breaker.allow_request()
+    clock[0] += 30
+    assert breaker.allow_request()
+
+
+def test_get_host_breaker_shared_by_host():
+    first = get_host_breaker("https://breaker.example.com/works/OL1W.json", failure_rate=0.2)
+    second = get_host_breaker("https://Breaker.example.com/search.json", failure_rate=0.9)
+
+    assert first is second
+    assert first.failure_rate == 0.2
+    assert circuit_breaker_stats()["breaker.example.com"]["state"] == CLOSED
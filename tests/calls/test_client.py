@@ -1,7 +1,10 @@
+import asyncio
+import httpx
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
-from calls.client import Client
+from calls.cache import ResponseCache
+from calls.client import Client, parse_retry_after
 
 
 TEST_URL = "https://example.com"
@@ -62,3 +65,372 @@ async def test_session_context_manager():
         assert client.session is not None
         assert hasattr(client.session, "get")
         assert client.session.headers["User-Agent"] == "booksanon test@example.com"
+
+
+async def test_fetch_uses_fresh_cache(tmp_path, mocker):
+    cache = ResponseCache(tmp_path / "cache.db")
+    client = Client(max_retries=1, retry_delay=0, cache=cache)
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"data": "ok"}
+    mock_response.headers = httpx.Headers({"ETag": '"v1"'})
+
+    mock_get = mocker.patch("httpx.AsyncClient.get", return_value=mock_response)
+
+    assert await client.fetch_results(TEST_URL, {"q": "test"}) == {"data": "ok"}
+    assert await client.fetch_results(TEST_URL, {"q": "test"}) == {"data": "ok"}
+
+    mock_get.assert_called_once_with(TEST_URL, params={"q": "test"})
+    counters = cache.stats()["counters"]
+    assert counters["hits"] == 1
+    assert counters["misses"] == 1
+    await client.close_session()
+
+
+async def test_fetch_revalidates_stale_cache(tmp_path, mocker):
+    cache = ResponseCache(tmp_path / "cache.db", ttls={"other": 0})
+    cache.set(TEST_URL, {}, {"data": "cached"}, {"etag": '"v1"'})
+    client = Client(max_retries=1, retry_delay=0, cache=cache)
+
+    not_modified = MagicMock()
+    not_modified.status_code = 304
+
+    mock_get = mocker.patch("httpx.AsyncClient.get", return_value=not_modified)
+
+    result = await client.fetch_results(TEST_URL)
+
+    assert result == {"data": "cached"}
+    mock_get.assert_called_once_with(TEST_URL, headers={"If-None-Match": '"v1"'})
+    assert cache.stats()["counters"]["revalidated"] == 1
+    await client.close_session()
+
+
+async def test_fetch_coalesces_identical_requests(client, mocker, monkeypatch):
+    monkeypatch.setattr("calls.metrics._endpoints", {})
+
+    async def slow_get(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"data": "ok"}
+        return response
+
+    mock_get = mocker.patch("httpx.AsyncClient.get", side_effect=slow_get)
+
+    results = await asyncio.gather(
+        client.fetch_results(TEST_URL, {"q": "test"}),
+        client.fetch_results(TEST_URL, {"q": "test"}),
+        client.fetch_results(TEST_URL + "?q=test"),
+        client.fetch_results(TEST_URL, {"q": "other"}),
+    )
+
+    assert results == [{"data": "ok"}] * 4
+    assert mock_get.call_count == 2
+    assert client.counters["coalesced"] == 2
+    assert client._in_flight == {}
+    assert sum(stats["coalesced"] for stats in client.endpoint_metrics().values()) == 2
+
+
+async def test_cancelled_caller_does_not_cancel_shared_request(client, mocker):
+    async def slow_get(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"data": "ok"}
+        return response
+
+    mocker.patch("httpx.AsyncClient.get", side_effect=slow_get)
+
+    first = asyncio.create_task(client.fetch_results(TEST_URL))
+    second = asyncio.create_task(client.fetch_results(TEST_URL))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == {"data": "ok"}
+
+
+async def test_fetch_does_not_retry_client_errors(client, mocker):
+    not_found = MagicMock()
+    not_found.status_code = 404
+
+    mock_get = mocker.patch("httpx.AsyncClient.get", return_value=not_found)
+
+    assert await client.fetch_results(TEST_URL) is None
+    assert mock_get.call_count == 1
+
+
+async def test_fetch_honours_retry_after(client, mocker):
+    rate_limited = MagicMock()
+    rate_limited.status_code = 429
+    rate_limited.headers = httpx.Headers({"Retry-After": "2"})
+
+    success_response = MagicMock()
+    success_response.status_code = 200
+    success_response.json.return_value = {"success": True}
+
+    mocker.patch("httpx.AsyncClient.get", side_effect=[rate_limited, success_response])
+    mock_sleep = mocker.patch("calls.client.asyncio.sleep", new=AsyncMock())
+
+    assert await client.fetch_results(TEST_URL) == {"success": True}
+    mock_sleep.assert_awaited_once_with(2.0)
+
+
+async def test_fetch_stops_retrying_at_deadline(mocker):
+    client = Client(max_retries=5, retry_delay=0.1, deadline=0.2)
+
+    async def slow_get(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    mock_get = mocker.patch("httpx.AsyncClient.get", side_effect=slow_get)
+
+    start = asyncio.get_running_loop().time()
+    assert await client.fetch_results(TEST_URL) is None
+    assert asyncio.get_running_loop().time() - start < 0.5
+    assert mock_get.call_count == 1
+    await client.close_session()
+
+
+def test_get_backoff_delay():
+    client = Client(retry_delay=1, max_retry_delay=5)
+
+    assert 0.5 <= client.get_backoff_delay(1) <= 1
+    assert 2 <= client.get_backoff_delay(3) <= 4
+    assert 2.5 <= client.get_backoff_delay(10) <= 5
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+async def test_fetch_waits_for_rate_limit(mocker):
+    client = Client(requests_per_second=20, burst=1)
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"data": "ok"}
+    mocker.patch("httpx.AsyncClient.get", return_value=mock_response)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(*(client.fetch_results(f"https://limited.example.com/{i}") for i in range(3)))
+
+    assert loop.time() - start >= 0.09
+    assert "limited.example.com" in client.rate_limit_stats()
+    await client.close_session()
+
+
+async def test_session_reused_across_context_manager_and_start_session():
+    async with Client(timeout=7, max_connections=4, keepalive_expiry=15) as client:
+        session = client.session
+        assert await client.start_session() is session
+        assert session.timeout.connect == 5.0
+        assert session.timeout.pool == 7
+        assert client.limits.max_connections == 4
+        assert client.limits.keepalive_expiry == 15
+
+    assert client.session is None
+
+
+def test_http2_needs_h2(mocker):
+    mocker.patch("calls.client.http2_available", return_value=False)
+    assert Client(http2=True).http2 is False
+
+    mocker.patch("calls.client.http2_available", return_value=True)
+    assert Client(http2=True).http2 is True
+
+
+async def test_warm_up(client, mocker):
+    head_response = MagicMock()
+    head_response.status_code = 200
+    mock_head = mocker.patch("httpx.AsyncClient.head", return_value=head_response)
+
+    assert await client.warm_up(TEST_URL) is True
+    mock_head.assert_called_once_with(TEST_URL)
+
+    mocker.patch("httpx.AsyncClient.head", side_effect=httpx.ConnectError("unreachable"))
+    assert await client.warm_up(TEST_URL) is False
+
+
+async def test_open_circuit_fails_fast(mocker):
+    client = Client(max_retries=3, retry_delay=0, breaker_failure_rate=0.5, breaker_reset_timeout=60)
+    breaker = client.get_breaker("https://down.example.com")
+    breaker.min_calls = 2
+
+    failing = MagicMock()
+    failing.status_code = 503
+    failing.headers = httpx.Headers()
+    mock_get = mocker.patch("httpx.AsyncClient.get", return_value=failing)
+
+    assert await client.fetch_results("https://down.example.com/1") is None
+    assert mock_get.call_count == 2
+    assert breaker.state == "open"
+
+    assert await client.fetch_results("https://down.example.com/2") is None
+    assert mock_get.call_count == 2
+    assert client.counters["short_circuits"] == 2
+    assert client.circuit_breaker_stats()["down.example.com"]["state"] == "open"
+    await client.close_session()
+
+
+async def test_open_circuit_uses_stale_cache(tmp_path, mocker):
+    cache = ResponseCache(tmp_path / "cache.db", ttls={"other": 0})
+    cache.set("https://stale.example.com/1", {}, {"data": "cached"})
+    client = Client(breaker_failure_rate=0.5, cache=cache)
+    breaker = client.get_breaker("https://stale.example.com")
+    breaker.min_calls = 1
+    breaker.record(False, 0.1)
+
+    mock_get = mocker.patch("httpx.AsyncClient.get")
+
+    assert await client.fetch_results("https://stale.example.com/1") == {"data": "cached"}
+    mock_get.assert_not_called()
+    await client.close_session()
+
+
+async def test_rate_limit_waits_do_not_open_circuit(mocker):
+    client = Client(
+        requests_per_second=20, burst=1, breaker_failure_rate=0.5, breaker_slow_call_seconds=0.02, deadline=0.12
+    )
+    breaker = client.get_breaker("https://queued.example.com")
+    breaker.min_calls = 2
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"data": "ok"}
+    mocker.patch("httpx.AsyncClient.get", return_value=mock_response)
+
+    # each request waits longer than slow_call_seconds for the rate limit, the last past the deadline
+    results = await asyncio.gather(*(client.fetch_results(f"https://queued.example.com/{i}") for i in range(4)))
+
+    assert results[:2] == [{"data": "ok"}] * 2
+    assert breaker.state == "closed"
+    assert breaker.stats()["failure_rate"] == 0.0
+    await client.close_session()
+
+
+def make_slow_first_get(mocker, delay: float = 1.0):
+    calls = []
+
+    async def get(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            await asyncio.sleep(delay)
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"call": len(calls)}
+        return response
+
+    return mocker.patch("httpx.AsyncClient.get", side_effect=get)
+
+
+async def test_hedged_request_wins_when_first_is_slow(mocker, monkeypatch):
+    monkeypatch.setattr("calls.metrics._endpoints", {})
+    client = Client(hedge_percentile=0.9, hedge_max_ratio=1.0)
+    client.latencies["search"].extend([0.01] * 20)
+    mock_get = make_slow_first_get(mocker)
+
+    result = await client.fetch_results("https://openlibrary.org/search.json?q=test")
+
+    assert result == {"call": 2}
+    assert mock_get.call_count == 2
+    assert client.hedge_stats()["hedges"] == 1
+    assert client.hedge_stats()["hedge_wins"] == 1
+    assert client.endpoint_metrics()["search"]["hedges"] == 1
+    assert client.endpoint_metrics()["search"]["hedge_wins"] == 1
+    await client.close_session()
+
+
+async def test_hedging_capped_and_limited_to_lookups(mocker):
+    client = Client(hedge_percentile=0.9, hedge_max_ratio=0.05)
+    client.latencies["search"].extend([0.01] * 20)
+    client.latencies["editions"].extend([0.01] * 20)
+    mock_get = make_slow_first_get(mocker, delay=0.05)
+
+    # one request is under the 5% budget
+    assert await client.fetch_results("https://openlibrary.org/search.json?q=test") == {"call": 1}
+    assert client.get_hedge_delay("https://openlibrary.org/works/OL1W/editions.json") is None
+    assert client.get_hedge_delay("https://openlibrary.org/works/OL1W.json") is None
+    assert mock_get.call_count == 1
+    assert client.hedge_stats()["hedges"] == 0
+    await client.close_session()
+
+
+async def test_rate_limit_waits_do_not_trigger_hedges(mocker, monkeypatch):
+    monkeypatch.setattr("calls.rate_limit._buckets", {})
+    client = Client(hedge_percentile=0.9, hedge_max_ratio=1.0, requests_per_second=20, burst=1)
+    client.latencies["search"].extend([0.01] * 20)
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"data": "ok"}
+    mock_get = mocker.patch("httpx.AsyncClient.get", return_value=mock_response)
+
+    # all but the first wait longer than the hedge delay for the rate limit, then return straight away
+    urls = [f"https://openlibrary.org/search.json?q={i}" for i in range(3)]
+    assert await asyncio.gather(*map(client.fetch_results, urls)) == [{"data": "ok"}] * 3
+
+    assert mock_get.call_count == 3
+    assert client.hedge_stats()["hedges"] == 0
+    await client.close_session()
+
+
+async def test_no_hedge_while_rate_limit_backlogged(mocker, monkeypatch):
+    monkeypatch.setattr("calls.rate_limit._buckets", {})
+    client = Client(hedge_percentile=0.9, hedge_max_ratio=1.0, requests_per_second=5, burst=1)
+    client.latencies["search"].extend([0.01] * 20)
+    mock_get = make_slow_first_get(mocker, delay=0.05)
+
+    assert await client.fetch_results("https://openlibrary.org/search.json?q=slow") == {"call": 1}
+
+    assert mock_get.call_count == 1
+    assert client.hedge_stats()["hedges"] == 0
+    await client.close_session()
+
+
+async def test_fetch_records_endpoint_metrics(monkeypatch):
+    monkeypatch.setattr("calls.metrics._endpoints", {})
+    responses = iter([httpx.Response(503), httpx.Response(200, json={"title": "Oliver Twist"})])
+    transport = httpx.MockTransport(lambda request: next(responses))
+
+    async with Client(max_retries=2, retry_delay=0.01, transport=transport) as client:
+        result = await client.fetch_results("https://openlibrary.org/works/OL1W.json")
+
+    assert result == {"title": "Oliver Twist"}
+    works = client.endpoint_metrics()["works"]
+    assert works["requests"] == 2
+    assert works["retries"] == 1
+    assert works["statuses"] == {200: 1, 503: 1}
+    assert works["bytes"] == len(b'{"title":"Oliver Twist"}')
+
+
+async def test_streamed_fetch_records_bytes(monkeypatch):
+    pytest.importorskip("ijson")
+    monkeypatch.setattr("calls.metrics._endpoints", {})
+    body = b'{"size": 1, "entries": [{"isbn_13": ["9780141439563"], "title": "skipped"}]}'
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+
+    async with Client(transport=transport, stream=True) as client:
+        result = await client.fetch_results(
+            "https://openlibrary.org/works/OL1W/editions.json", paths=["size", "entries.item.isbn_13"]
+        )
+
+    assert result == {"size": 1, "entries": [{"isbn_13": ["9780141439563"]}]}
+    editions = client.endpoint_metrics()["editions"]
+    assert editions["bytes"] == len(body)
+    assert editions["statuses"] == {200: 1}
+
+
+async def test_fetch_records_connection_errors(monkeypatch):
+    monkeypatch.setattr("calls.metrics._endpoints", {})
+
+    def refuse(request):
+        raise httpx.ConnectError("refused")
+
+    async with Client(max_retries=1, transport=httpx.MockTransport(refuse)) as client:
+        assert await client.fetch_results("https://openlibrary.org/search.json") is None
+
+    assert client.endpoint_metrics()["search"]["errors"] == 1
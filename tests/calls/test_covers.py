@@ -0,0 +1,126 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from calls.covers import CoverCache, CoverStore, HttpCoverUpstream
+
+
+class FakeUpstream:
+    def __init__(self, covers: dict[tuple[int, str], bytes], delay: float = 0.0):
+        self.covers = covers
+        self.delay = delay
+        self.calls: list[tuple[int, str]] = []
+
+    async def fetch(self, cover_id, size):
+        self.calls.append((cover_id, size))
+        await asyncio.sleep(self.delay)
+        return self.covers.get((cover_id, size))
+
+    async def close(self):
+        pass
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = CoverCache(tmp_path, max_bytes=25)
+    cache.put(1, "M", b"1" * 10)
+    cache.put(2, "M", b"2" * 10)
+    os.utime(cache.path_for(1, "M"), (1, 1))
+    os.utime(cache.path_for(2, "M"), (2, 2))
+
+    # reading 1 makes 2 the least recently used
+    assert cache.get(1, "M") is not None
+    cache.put(3, "M", b"3" * 10)
+
+    assert cache.get(2, "M") is None
+    assert cache.get(1, "M").read_bytes() == b"1" * 10
+    assert cache.get(3, "M") is not None
+    assert cache.size == 20
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_cache_evicts_to_low_water_without_scanning(tmp_path, monkeypatch):
+    cache = CoverCache(tmp_path, max_bytes=100, low_water=0.5)
+    for cover_id in range(10):
+        cache.put(cover_id, "M", b"x" * 10)
+
+    def no_scanning(*args):
+        raise AssertionError("put scanned the cache directory")
+
+    monkeypatch.setattr(type(tmp_path), "glob", no_scanning)
+    cache.put(10, "M", b"x" * 10)
+
+    # 110 bytes is past max_bytes, so the oldest go until it is down to 50
+    assert cache.size == 50
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{cover_id}-M.jpg" for cover_id in (10, 6, 7, 8, 9)]
+
+
+def test_cache_loads_recency_from_mtimes(tmp_path):
+    for cover_id, mtime in ((1, 3), (2, 1), (3, 2)):
+        path = tmp_path / f"{cover_id}-M.jpg"
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (mtime, mtime))
+
+    cache = CoverCache(tmp_path, max_bytes=25, low_water=1.0)
+
+    assert cache.size == 30
+    assert list(cache.entries) == ["2-M.jpg", "3-M.jpg", "1-M.jpg"]
+    assert cache.evict() == 1
+    assert cache.get(2, "M") is None
+
+
+async def test_store_fetches_once_then_serves_from_cache(tmp_path):
+    upstream = FakeUpstream({(1, "M"): b"cover"}, delay=0.01)
+    store = CoverStore(CoverCache(tmp_path), upstream)
+
+    paths = await asyncio.gather(store.get(1, "M"), store.get(1, "M"))
+    assert paths[0] == paths[1] == tmp_path / "1-M.jpg"
+    assert await store.get(1, "M") == tmp_path / "1-M.jpg"
+    assert upstream.calls == [(1, "M")]
+
+    assert await store.get(2, "M") is None
+    with pytest.raises(ValueError):
+        await store.get(1, "XL")
+
+
+async def test_store_remembers_misses(tmp_path):
+    upstream = FakeUpstream({})
+    store = CoverStore(CoverCache(tmp_path), upstream, miss_ttl=60, max_misses=2)
+
+    assert await store.get(1, "M") is None
+    assert await store.get(1, "M") is None
+    assert upstream.calls == [(1, "M")]
+
+    # the oldest miss is forgotten once there are more than max_misses
+    assert await store.get(2, "M") is None
+    assert await store.get(3, "M") is None
+    assert await store.get(1, "M") is None
+    assert upstream.calls == [(1, "M"), (2, "M"), (3, "M"), (1, "M")]
+
+    store.miss_ttl = 0
+    assert await store.get(4, "M") is None
+    assert await store.get(4, "M") is None
+    assert upstream.calls[-2:] == [(4, "M"), (4, "M")]
+
+
+async def test_prefetch(tmp_path):
+    upstream = FakeUpstream({(1, "M"): b"one", (2, "M"): b"two"})
+    store = CoverStore(CoverCache(tmp_path), upstream)
+
+    assert await store.prefetch(["1", 2, None, "", "3"]) == 2
+    assert sorted(upstream.calls) == [(1, "M"), (2, "M"), (3, "M")]
+
+
+async def test_http_upstream():
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["default"] == "false"
+        if request.url.path == "/b/id/1-M.jpg":
+            return httpx.Response(200, content=b"jpeg")
+        return httpx.Response(404)
+
+    upstream = HttpCoverUpstream("http://covers.test/b/id/", transport=httpx.MockTransport(handler))
+
+    assert await upstream.fetch(1, "M") == b"jpeg"
+    assert await upstream.fetch(2, "M") is None
+    await upstream.close()
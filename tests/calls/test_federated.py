@@ -0,0 +1,187 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from calls.client import Client
+from calls.federated import FederatedSearcher, book_from_volume
+from calls.google_books import GoogleBooksCaller
+from calls.openlib import OpenLibCaller
+from db.models import Book
+
+
+def make_book(work_key: str, title: str = "Test") -> dict:
+    return {"title": title, "openlib_work_key": work_key, "author_names": [], "author_keys": []}
+
+
+GOOGLE_ITEMS = [
+    {
+        "volumeInfo": {
+            "industryIdentifiers": [
+                {"type": "ISBN_10", "identifier": "0141439564"},
+                {"type": "ISBN_13", "identifier": "9780141439563"},
+            ]
+        }
+    },
+    {"volumeInfo": {"industryIdentifiers": [{"type": "OTHER", "identifier": "UOM:39015"}]}},
+    {"volumeInfo": {"industryIdentifiers": [{"type": "ISBN_10", "identifier": "014143960X"}]}},
+]
+
+
+@pytest.fixture
+def searcher():
+    client = Client()
+    openlib_caller = OpenLibCaller(client=client, pprint_results=False)
+    google_caller = GoogleBooksCaller(client=client, pprint_results=False)
+    return FederatedSearcher(openlib_caller, google_caller, mode="first", latency_budget=1.0)
+
+
+def delayed(result, delay: float):
+    async def search(*args, **kwargs):
+        await asyncio.sleep(delay)
+        return result
+
+    return AsyncMock(side_effect=search)
+
+
+def test_get_isbns_prefers_isbn_13():
+    assert GoogleBooksCaller.get_isbns(GOOGLE_ITEMS) == ["9780141439563", "014143960X"]
+
+
+async def test_search_by_isbns(searcher):
+    openlib_caller = searcher.openlib_caller
+    openlib_caller.fetch_with_semaphore = AsyncMock(return_value={"num_found": 1, "docs": [{"key": "/works/OL1W"}]})
+
+    results = await openlib_caller.search_by_isbns(["9780141439563", "not-an-isbn", "014143960X", "9780141439563"])
+
+    assert [book["openlib_work_key"] for book in results] == ["/works/OL1W"]
+    assert openlib_caller.fetch_with_semaphore.call_args.args[1]["q"] == "isbn:(9780141439563 OR 014143960X)"
+    assert await openlib_caller.search_by_isbns([]) == []
+
+
+async def test_first_mode_uses_fastest_results(searcher):
+    searcher.openlib_caller.search_books = delayed([make_book("/works/OL1W")], 0.5)
+    searcher.search_google = delayed([make_book("/works/OL2W")], 0.01)
+
+    results = await searcher.search_books("test")
+
+    assert [book["openlib_work_key"] for book in results] == ["/works/OL2W"]
+
+
+async def test_first_mode_waits_past_empty_results(searcher):
+    searcher.openlib_caller.search_books = delayed([make_book("/works/OL1W")], 0.05)
+    searcher.search_google = delayed([], 0.01)
+
+    results = await searcher.search_books("test")
+
+    assert [book["openlib_work_key"] for book in results] == ["/works/OL1W"]
+
+
+async def test_first_mode_ignores_failures(searcher):
+    searcher.openlib_caller.search_books = AsyncMock(side_effect=ValueError("broken"))
+    searcher.search_google = delayed([make_book("/works/OL2W")], 0.01)
+
+    results = await searcher.search_books("test")
+
+    assert [book["openlib_work_key"] for book in results] == ["/works/OL2W"]
+
+
+async def test_first_mode_gives_up_at_budget(searcher):
+    searcher.latency_budget = 0.05
+    searcher.openlib_caller.search_books = delayed([make_book("/works/OL1W")], 1)
+    searcher.search_google = delayed([make_book("/works/OL2W")], 1)
+
+    assert await searcher.search_books("test") is None
+
+
+async def test_merge_mode_combines_results_within_budget(searcher):
+    searcher.mode = "merge"
+    searcher.latency_budget = 0.2
+    searcher.openlib_caller.search_books = delayed([make_book("/works/OL1W"), make_book("/works/OL2W")], 0.01)
+    searcher.search_google = delayed([make_book("/works/OL2W", "Google"), make_book("/works/OL3W")], 0.05)
+
+    results = await searcher.search_books("test", limit=10)
+
+    assert [book["openlib_work_key"] for book in results] == ["/works/OL1W", "/works/OL2W", "/works/OL3W"]
+    assert results[1]["title"] == "Test"
+
+
+async def test_merge_mode_leaves_out_slow_source(searcher):
+    searcher.mode = "merge"
+    searcher.latency_budget = 0.05
+    searcher.openlib_caller.search_books = delayed([make_book("/works/OL1W")], 1)
+    searcher.search_google = delayed([make_book("/works/OL2W")], 0.01)
+
+    results = await searcher.search_books("test")
+
+    assert [book["openlib_work_key"] for book in results] == ["/works/OL2W"]
+
+
+async def test_search_google_builds_books_from_volumes(searcher):
+    searcher.google_caller.search_books = AsyncMock(return_value=GOOGLE_ITEMS)
+    searcher.openlib_caller.fetch_with_semaphore = AsyncMock()
+
+    results = await searcher.search_google("dickens", limit=5)
+
+    searcher.google_caller.search_books.assert_called_once_with(search_query="dickens", limit=5)
+    searcher.openlib_caller.fetch_with_semaphore.assert_not_called()
+    # the volume without an isbn is left out
+    assert [(book["isbns_13"], book["isbns_10"]) for book in results] == [
+        (["9780141439563"], ["0141439564"]),
+        ([], ["014143960X"]),
+    ]
+    assert results[0]["openlib_work_key"] == ""
+    assert Book.from_dict(results[0]).first_publish_year == "Unknown"
+
+
+def test_book_from_volume():
+    volume = {
+        "google_id": "abc",
+        "title": "Oliver Twist",
+        "author_names": ["Charles Dickens"],
+        "published_year": "2003",
+        "isbns_13": ["9780141439563"],
+        "isbns_10": [],
+        "cover_url": None,
+    }
+
+    book = book_from_volume(volume)
+
+    assert book["title"] == "Oliver Twist"
+    assert book["author_names"] == ["Charles Dickens"]
+    assert book["first_publish_year"] == "2003"
+    assert book["isbns_13"] == ["9780141439563"]
+
+
+async def test_merge_mode_skips_google_books_already_found(searcher):
+    searcher.mode = "merge"
+    searcher.latency_budget = 0.2
+    oliver = {**make_book("/works/OL1W", "Oliver Twist"), "author_names": ["Charles Dickens"]}
+    searcher.openlib_caller.search_books = delayed([oliver], 0.01)
+    searcher.search_google = delayed(
+        [
+            {**make_book("", "oliver twist"), "author_names": ["Charles Dickens"]},
+            {**make_book("", "Great Expectations"), "author_names": ["Charles Dickens"]},
+        ],
+        0.05,
+    )
+
+    results = await searcher.search_books("dickens", limit=10)
+
+    assert [book["title"] for book in results] == ["Oliver Twist", "Great Expectations"]
+
+
+async def test_openlib_mode_only_calls_openlib(searcher):
+    searcher.mode = "openlib"
+    searcher.openlib_caller.search_books = AsyncMock(return_value=[make_book("/works/OL1W")])
+    searcher.search_google = AsyncMock()
+
+    await searcher.search_books("test", limit=5)
+
+    searcher.openlib_caller.search_books.assert_called_once_with(search_query="test", limit=5)
+    searcher.search_google.assert_not_called()
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        FederatedSearcher(OpenLibCaller(client=Client()), GoogleBooksCaller(client=Client()), mode="fastest")
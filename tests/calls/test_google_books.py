@@ -0,0 +1,78 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from calls.client import Client
+from calls.google_books import GoogleBooksCaller
+
+
+VOLUME = {
+    "id": "abc123",
+    "volumeInfo": {
+        "title": "Oliver Twist",
+        "authors": ["Charles Dickens"],
+        "publishedDate": "2003-02-27",
+        "industryIdentifiers": [
+            {"type": "ISBN_10", "identifier": "0141439742"},
+            {"type": "ISBN_13", "identifier": "9780141439747"},
+        ],
+        "imageLinks": {"thumbnail": "http://books.google.com/cover.jpg"},
+    },
+}
+
+
+@pytest.fixture
+def google_caller():
+    return GoogleBooksCaller(client=Client(), pprint_results=False, max_concurrent_requests=2)
+
+
+def test_parse_volume():
+    assert GoogleBooksCaller.parse_volume(VOLUME) == {
+        "google_id": "abc123",
+        "title": "Oliver Twist",
+        "author_names": ["Charles Dickens"],
+        "published_year": "2003",
+        "isbns_13": ["9780141439747"],
+        "isbns_10": ["0141439742"],
+        "cover_url": "http://books.google.com/cover.jpg",
+    }
+    assert GoogleBooksCaller.parse_volume({})["published_year"] is None
+
+
+async def test_lookup_isbns_concurrently_within_limit(google_caller):
+    in_flight, max_in_flight = [0], [0]
+
+    async def fetch(url, params=None):
+        in_flight[0] += 1
+        max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return {"items": [VOLUME]} if params["q"] == "isbn:9780141439747" else {}
+
+    google_caller.client.fetch_results = AsyncMock(side_effect=fetch)
+
+    results = await google_caller.lookup_isbns(["978-0141439747", "9780141439747", "0000000000", "1111111111", " "])
+
+    assert list(results) == ["9780141439747", "0000000000", "1111111111"]
+    assert results["9780141439747"]["google_id"] == "abc123"
+    assert results["0000000000"] is None
+    assert google_caller.client.fetch_results.call_count == 3
+    assert max_in_flight[0] == 2
+
+
+async def test_lookup_titles(google_caller):
+    google_caller.client.fetch_results = AsyncMock(return_value={"items": [VOLUME]})
+
+    results = await google_caller.lookup_titles([("Oliver Twist", "Charles Dickens"), ("Bleak House", "")])
+
+    assert results[("Oliver Twist", "Charles Dickens")]["title"] == "Oliver Twist"
+    queries = [call.kwargs["params"]["q"] for call in google_caller.client.fetch_results.call_args_list]
+    assert queries == ["intitle:Oliver Twist+inauthor:Charles Dickens", "intitle:Bleak House"]
+
+
+async def test_search_books_only_prints_when_asked(google_caller, capsys):
+    google_caller.client.fetch_results = AsyncMock(return_value={"items": [VOLUME]})
+
+    assert await google_caller.search_books(search_query="dickens") == [VOLUME]
+    assert capsys.readouterr().out == ""
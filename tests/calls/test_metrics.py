@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from calls import circuit_breaker, metrics, rate_limit
+from calls.circuit_breaker import get_host_breaker
+from calls.rate_limit import get_host_limiter
+from calls.metrics import EndpointMetrics, endpoint_metrics, export_metrics, get_endpoint_metrics, write_metrics
+
+
+@pytest.fixture(autouse=True)
+def endpoints(monkeypatch):
+    endpoints = {}
+    monkeypatch.setattr(metrics, "_endpoints", endpoints)
+    return endpoints
+
+
+def test_record_response():
+    works = EndpointMetrics("works")
+
+    for latency in (0.01, 0.2, 0.3, 0.4, 12.0):
+        works.record_response(200, latency, num_bytes=100, decode_seconds=0.01)
+    works.record_response(503, 0.04)
+    works.record_error(0.5)
+    works.record_retry()
+    works.record_coalesced()
+
+    stats = works.stats()
+    assert stats["requests"] == 7
+    assert stats["errors"] == 1
+    assert stats["retries"] == 1
+    assert stats["coalesced"] == 1
+    assert stats["statuses"] == {200: 5, 503: 1}
+    assert stats["bytes"] == 500
+    assert stats["decode_seconds"] == 0.05
+    assert stats["latency_buckets"]["0.05"] == 2
+    assert stats["latency_buckets"]["+Inf"] == 1
+    assert stats["p50_latency"] == 0.5
+    # only known to be over the largest bucket
+    assert stats["p95_latency"] is None
+
+
+def test_latency_percentile_without_requests():
+    assert EndpointMetrics("search").latency_percentile(0.95) is None
+
+
+def test_get_endpoint_metrics_grouped_by_kind(endpoints):
+    first = get_endpoint_metrics("https://openlibrary.org/works/OL1W.json")
+    second = get_endpoint_metrics("https://openlibrary.org/works/OL2W.json")
+    editions = get_endpoint_metrics("https://openlibrary.org/works/OL1W/editions.json")
+
+    assert first is second
+    assert editions is not first
+    assert sorted(endpoints) == ["editions", "works"]
+
+
+def test_export_metrics():
+    get_endpoint_metrics("https://openlibrary.org/search.json").record_response(200, 0.3, num_bytes=2048)
+    get_endpoint_metrics("https://openlibrary.org/search.json").record_retry()
+    get_endpoint_metrics("https://openlibrary.org/search.json").record_coalesced()
+    get_endpoint_metrics("https://openlibrary.org/search.json").record_hedge()
+
+    exported = export_metrics()
+
+    assert 'booksanon_api_request_seconds_bucket{endpoint="search",le="0.25"} 0' in exported
+    assert 'booksanon_api_request_seconds_bucket{endpoint="search",le="0.5"} 1' in exported
+    assert 'booksanon_api_request_seconds_bucket{endpoint="search",le="+Inf"} 1' in exported
+    assert 'booksanon_api_request_seconds_count{endpoint="search"} 1' in exported
+    assert 'booksanon_api_responses_total{endpoint="search",status="200"} 1' in exported
+    assert 'booksanon_api_retries_total{endpoint="search"} 1' in exported
+    assert 'booksanon_api_coalesced_total{endpoint="search"} 1' in exported
+    assert 'booksanon_api_hedges_total{endpoint="search"} 1' in exported
+    assert 'booksanon_api_hedge_wins_total{endpoint="search"} 0' in exported
+    assert 'booksanon_api_response_bytes_total{endpoint="search"} 2048' in exported
+
+
+def test_export_metrics_circuit_breakers(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    breaker = get_host_breaker("https://openlibrary.org/search.json", min_calls=2, window=2)
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    assert not breaker.allow_request()
+    get_host_breaker("https://www.googleapis.com/books/v1/volumes")
+
+    exported = export_metrics()
+
+    assert 'booksanon_api_circuit_state{host="openlibrary.org",state="open"} 1' in exported
+    assert 'booksanon_api_circuit_state{host="openlibrary.org",state="closed"} 0' in exported
+    assert 'booksanon_api_circuit_state{host="www.googleapis.com",state="closed"} 1' in exported
+    assert 'booksanon_api_circuit_state{host="www.googleapis.com",state="half_open"} 0' in exported
+    assert 'booksanon_api_circuit_trips_total{host="openlibrary.org"} 1' in exported
+    assert 'booksanon_api_circuit_short_circuits_total{host="openlibrary.org"} 1' in exported
+    assert 'booksanon_api_circuit_short_circuits_total{host="www.googleapis.com"} 0' in exported
+
+
+async def test_export_metrics_rate_limits(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_buckets", {})
+    limiter = get_host_limiter("https://openlibrary.org/search.json", rate=10, burst=1)
+    await limiter.acquire()
+    await limiter.acquire()
+
+    exported = export_metrics()
+
+    assert "# TYPE booksanon_api_rate_limit_queue_depth gauge" in exported
+    assert 'booksanon_api_rate_limit_queue_depth{host="openlibrary.org"} 0' in exported
+    assert 'booksanon_api_rate_limit_current_wait_seconds{host="openlibrary.org"} ' in exported
+    assert 'booksanon_api_rate_limit_waits_total{host="openlibrary.org"} 1' in exported
+    assert 'booksanon_api_rate_limit_wait_seconds_total{host="openlibrary.org"} 0.' in exported
+
+
+def test_write_metrics(tmp_path):
+    get_endpoint_metrics("https://openlibrary.org/authors/OL1A.json").record_response(404, 0.1)
+
+    prom_path = write_metrics(tmp_path / "metrics" / "huey.prom")
+    json_path = write_metrics(tmp_path / "metrics" / "huey.json")
+
+    assert "booksanon_api_responses_total" in prom_path.read_text()
+    assert json.loads(json_path.read_text()) == json.loads(json.dumps(endpoint_metrics()))
+    assert sorted(path.name for path in prom_path.parent.iterdir()) == ["huey.json", "huey.prom"]
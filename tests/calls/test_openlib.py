@@ -1,10 +1,24 @@
 import asyncio
+import re
+
+import httpx
 import pytest
 
 from unittest.mock import AsyncMock, patch, MagicMock
 
 from calls.client import Client
-from calls.openlib import OpenLibCaller, extract_year, validate_openlib_work_id
+from calls.openlib import (
+    MAX_SEARCH_URL_LENGTH,
+    SEARCH_FIELDS,
+    SEARCH_PATHS,
+    EDITIONS_PATHS,
+    EditionsAggregator,
+    OpenLibCaller,
+    extract_year,
+    normalise_author_key,
+    normalise_work_key,
+    validate_openlib_work_id,
+)
 
 
 @pytest.fixture
@@ -45,11 +59,13 @@ async def test_semaphore_limits_concurrency(openlib_caller: OpenLibCaller):
 
 
 def test_get_general_query_url(openlib_caller):
+    fields = "key,title,author_name,author_key,first_publish_year,number_of_pages_median,cover_i"
+
     url = openlib_caller.get_general_query_url("test query", limit="2", lang="fr")
-    assert url == "https://openlibrary.org/search.json?q=test query&limit=2&lang=fr"
+    assert url == f"https://openlibrary.org/search.json?q=test query&limit=2&lang=fr&fields={fields}"
 
     url = openlib_caller.get_general_query_url("another query")
-    assert url == "https://openlibrary.org/search.json?q=another query&limit=1&lang=en"
+    assert url == f"https://openlibrary.org/search.json?q=another query&limit=1&lang=en&fields={fields}"
 
 
 def test_get_complex_query_url(openlib_caller):
@@ -57,6 +73,7 @@ def test_get_complex_query_url(openlib_caller):
     assert "title=Oliver Twist" in url
     assert "author=Charles Dickens" in url
     assert url.startswith("https://openlibrary.org/search.json?")
+    assert url.endswith(f"&fields={openlib_caller.search_fields}")
 
     with pytest.raises(ValueError):
         openlib_caller.get_complex_query_url(invalid_param="some value")
@@ -140,6 +157,26 @@ def test_parse_books_search_results():
     assert parsed[0]["number_of_pages"] == 0
 
 
+def test_parse_books_search_results_only_reads_search_fields():
+    doc = {
+        "key": "/works/OL1W",
+        "title": "Book 1",
+        "author_name": ["Author 1"],
+        "author_key": ["OL1A"],
+        "first_publish_year": 2001,
+        "number_of_pages_median": 100,
+        "cover_i": 1,
+    }
+    assert set(doc) == set(SEARCH_FIELDS)
+
+    projected = OpenLibCaller.parse_books_search_results({"num_found": 1, "docs": [doc]})
+    full = OpenLibCaller.parse_books_search_results(
+        {"num_found": 1, "docs": [{**doc, "ia": ["id"] * 100, "edition_key": ["OL1M"] * 100}]}
+    )
+    assert projected == full
+    assert projected[0]["cover_id"] == [1]
+
+
 def test_parse_editions_response():
     response = {
         "entries": [
@@ -166,6 +203,91 @@ def test_parse_editions_response():
     assert parsed["number_of_pages_median"] == 110
 
 
+def test_editions_aggregator_goals():
+    aggregator = EditionsAggregator()
+    assert not aggregator.goals_met()
+
+    aggregator.add({"publish_date": "2001", "isbn_13": ["9780000000001"]})
+    assert aggregator.goals_met(min_isbns=1)
+    assert not aggregator.goals_met(target_year=1999, min_isbns=1)
+    assert not aggregator.goals_met(min_isbns=2)
+
+    aggregator.add({"publish_date": "1999", "isbn_10": ["0000000001"]})
+    assert aggregator.goals_met(target_year=1999, min_isbns=2)
+    assert aggregator.earliest_year == 1999
+    assert aggregator.entries_seen == 2
+
+
+def make_editions_page(offset, count, size=None, next_link=None):
+    page = {
+        "entries": [
+            {"publish_date": str(2000 + offset + i), "isbn_13": [f"978{offset + i:010d}"]} for i in range(count)
+        ],
+        "links": {"self": "/works/OL1W/editions.json"},
+    }
+    if size is not None:
+        page["size"] = size
+    if next_link:
+        page["links"]["next"] = next_link
+    return page
+
+
+async def test_iter_editions_fetches_pages_by_offset(openlib_caller):
+    openlib_caller.editions_concurrency = 2
+
+    async def fetch_page(url, params=None, paths=None):
+        return make_editions_page(params["offset"], min(2, 7 - params["offset"]), size=7)
+
+    openlib_caller.fetch_with_semaphore = AsyncMock(side_effect=fetch_page)
+    first_page = make_editions_page(0, 2, size=7)
+
+    entries = [entry async for entry in openlib_caller.iter_editions("OL1W", first_page=first_page)]
+
+    assert len(entries) == 7
+    assert [entry["publish_date"] for entry in entries] == [str(year) for year in range(2000, 2007)]
+    assert openlib_caller.fetch_with_semaphore.call_count == 3
+    openlib_caller.fetch_with_semaphore.assert_any_call(
+        "https://openlibrary.org/works/OL1W/editions.json", {"limit": 2, "offset": 6}, paths=EDITIONS_PATHS
+    )
+
+
+async def test_iter_editions_follows_next_links(openlib_caller):
+    openlib_caller.editions_max_pages = 2
+
+    pages = {
+        "https://openlibrary.org/works/OL1W/editions.json": make_editions_page(
+            0, 2, next_link="/works/OL1W/editions.json?offset=2"
+        ),
+        "https://openlibrary.org/works/OL1W/editions.json?offset=2": make_editions_page(
+            2, 2, next_link="/works/OL1W/editions.json?offset=4"
+        ),
+    }
+    openlib_caller.fetch_with_semaphore = AsyncMock(side_effect=lambda url, params={}, paths=None: pages[url])
+
+    entries = [entry async for entry in openlib_caller.iter_editions("OL1W")]
+
+    # stops at editions_max_pages even though there is another next link
+    assert len(entries) == 4
+    assert openlib_caller.fetch_with_semaphore.call_count == 2
+
+
+async def test_add_editions_data_stops_when_goals_met(openlib_caller):
+    openlib_caller.editions_min_isbns = 3
+    openlib_caller.editions_concurrency = 1
+
+    async def fetch_page(url, params=None, paths=None):
+        return make_editions_page(params["offset"], 2, size=100)
+
+    openlib_caller.fetch_with_semaphore = AsyncMock(side_effect=fetch_page)
+    book = {"title": "Test", "first_publish_year": 2001}
+
+    book = await openlib_caller._add_editions_data("OL1W", book, make_editions_page(0, 2, size=100))
+
+    assert openlib_caller.fetch_with_semaphore.call_count == 1
+    assert len(book["isbns_13"]) == 3
+    assert book["first_publish_year"] == 2000
+
+
 """ Test helper functions """
 
 
@@ -175,6 +297,18 @@ def test_extract_year():
     assert extract_year("2023") == 2023
     assert not extract_year("invalid-date")
 
+    assert extract_year("December 19, 1999") == 1999
+    assert extract_year("Dec 19, 1999") == 1999
+    assert extract_year("19 December 1999") == 1999
+    assert extract_year("19 Dec 1999") == 1999
+    assert extract_year("c1999") == 1999
+    assert extract_year("1999?") == 1999
+    assert extract_year("[1999]") == 1999
+    assert extract_year("  1999 ") == 1999
+    assert extract_year("") is None
+    assert extract_year("12345") is None
+    assert extract_year("19--") is None
+
 
 def test_validate_openlib_work_id():
     assert validate_openlib_work_id("/works/OL12345W") is True
@@ -223,6 +357,92 @@ async def test_get_author_results(openlib_caller):
     assert result is None
 
 
+@pytest.mark.asyncio
+async def test_get_authors_results(openlib_caller):
+    async def fake_author(author_id):
+        await asyncio.sleep(0.01)
+        return {"name": f"name {author_id}", "key": author_id, "remote_ids": {"wikidata": "Q1"}}
+
+    openlib_caller.search_authors = AsyncMock(return_value={})
+    openlib_caller.get_author_results = AsyncMock(side_effect=fake_author)
+
+    authors = await openlib_caller.get_authors_results(["OL1A", "OL2A", "OL1A", "OL3A"])
+
+    # remote_ids are needed for every author by default, which only the author pages have
+    openlib_caller.search_authors.assert_not_called()
+    assert openlib_caller.get_author_results.call_count == 3
+    assert [author["key"] for author in authors] == ["OL1A", "OL2A", "OL1A", "OL3A"]
+    assert authors[1]["remote_ids"] == {"wikidata": "Q1"}
+
+    assert await openlib_caller.get_authors_results([]) == []
+
+
+@pytest.mark.asyncio
+async def test_get_authors_results_uses_search_docs(openlib_caller):
+    openlib_caller.fetch_with_semaphore = AsyncMock(
+        return_value={
+            "numFound": 2,
+            "docs": [
+                {"key": "OL1A", "name": "First Author", "birth_date": "1812"},
+                {"key": "OL2A", "name": ""},
+            ],
+        }
+    )
+    openlib_caller.get_author_results = AsyncMock(return_value={"name": "Second Author", "key": "/authors/OL2A"})
+
+    authors = await openlib_caller.get_authors_results(["/authors/OL1A", "OL2A", "OL3A", "OL1A"], remote_ids_for=[])
+
+    openlib_caller.fetch_with_semaphore.assert_called_once_with(
+        openlib_caller.search_authors_url,
+        {
+            "q": 'key:("/authors/OL1A" OR "/authors/OL2A" OR "/authors/OL3A")',
+            "limit": 3,
+            "fields": "key,name,birth_date,death_date",
+        },
+    )
+    # missing a name, or not found at all
+    assert [fetch.args for fetch in openlib_caller.get_author_results.call_args_list] == [("OL2A",), ("OL3A",)]
+    assert authors[0] == {
+        "name": "First Author",
+        "death_date": "",
+        "birth_date": "1812",
+        "key": "/authors/OL1A",
+        "remote_ids": {},
+    }
+    assert authors[3] is authors[0]
+    assert authors[1]["name"] == "Second Author"
+
+
+@pytest.mark.asyncio
+async def test_get_authors_results_pages_only_for_remote_ids(openlib_caller):
+    openlib_caller.search_authors = AsyncMock(
+        return_value={"/authors/OL1A": {"name": "First", "key": "/authors/OL1A", "remote_ids": {}}}
+    )
+    openlib_caller.get_author_results = AsyncMock(return_value={"name": "Second", "remote_ids": {"wikidata": "Q2"}})
+
+    authors = await openlib_caller.get_authors_results(["OL1A", "/authors/OL2A"], remote_ids_for=["OL2A"])
+
+    openlib_caller.search_authors.assert_called_once_with(["/authors/OL1A"])
+    openlib_caller.get_author_results.assert_called_once_with("/authors/OL2A")
+    assert [author["name"] for author in authors] == ["First", "Second"]
+    assert authors[1]["remote_ids"] == {"wikidata": "Q2"}
+
+
+@pytest.mark.asyncio
+async def test_search_authors_chunks_long_queries(openlib_caller):
+    openlib_caller.fetch_with_semaphore = AsyncMock(return_value=None)
+    author_keys = [f"/authors/OL{num}A" for num in range(300)]
+
+    assert await openlib_caller.search_authors(author_keys) == {}
+
+    calls = openlib_caller.fetch_with_semaphore.call_args_list
+    assert len(calls) > 1
+    assert sum(fetch.args[1]["limit"] for fetch in calls) == 300
+    for fetch in calls:
+        url = str(httpx.URL(fetch.args[0], params=fetch.args[1]))
+        assert len(url) <= MAX_SEARCH_URL_LENGTH
+
+
 @pytest.mark.asyncio
 async def test_search_books(openlib_caller):
     openlib_caller.fetch_with_semaphore = AsyncMock(return_value={"docs": []})
@@ -231,6 +451,7 @@ async def test_search_books(openlib_caller):
     # Test with title and author
     result = await openlib_caller.search_books(title="t", author="a")
     openlib_caller.fetch_with_semaphore.assert_called_once()
+    assert openlib_caller.fetch_with_semaphore.call_args.kwargs["paths"] == SEARCH_PATHS
     openlib_caller.parse_books_search_results.assert_called_once_with(response={"docs": []}, limit=10)
     assert result == [{"parsed": True}]
 
@@ -255,74 +476,90 @@ async def test_search_books(openlib_caller):
 
 @pytest.mark.asyncio
 async def test_get_complete_book_data(openlib_caller):
-    # Mock get_work_id_results to return a book dict
-    openlib_caller.get_work_id_results = AsyncMock(return_value={"key": "work_id"})
-
     # Define a side effect for fetch_with_semaphore to return different data based on URL
-    async def fetch_side_effect(url):
+    async def fetch_side_effect(url, paths=None):
         if "search.json" in url:
             # Mock search API response expected by _enrich_book_from_search
             return {"docs": [], "num_found": 0}
         elif "editions.json" in url:
             # Mock editions API response expected by _get_complete_book_data
             return {"entries": []}
-        else:
-            # Default fallback (if needed)
-            return None
+        elif url.endswith("OL12345W.json"):
+            return {"title": "Work Title", "key": "/works/OL12345W"}
+        return None
 
     openlib_caller.fetch_with_semaphore = AsyncMock(side_effect=fetch_side_effect)
 
-    with patch(
-        "calls.openlib.OpenLibCaller.parse_editions_response", return_value={"key": "work_id", "parsed_editions": True}
-    ) as mock_parse_editions:
-        # Input book with openlib_work_key triggers enrichment & work ID fetch
-        book_input = {"openlib_work_key": "OL12345W"}
+    # Input book with openlib_work_key triggers enrichment & work ID fetch
+    book_input = {"openlib_work_key": "OL12345W"}
 
-        result = await openlib_caller._get_complete_book_data(book=book_input)
+    result = await openlib_caller._get_complete_book_data(book=book_input)
 
-        # Check get_work_id_results called with correct work_id
-        openlib_caller.get_work_id_results.assert_called_once_with("OL12345W", book=book_input)
+    # search, work and editions are each fetched once
+    assert openlib_caller.fetch_with_semaphore.call_count == 3
 
-        # Check fetch_with_semaphore called at least twice (search + editions)
-        assert openlib_caller.fetch_with_semaphore.call_count >= 2
-
-        # Check parse_editions_response called with editions response and enriched book
-        mock_parse_editions.assert_called_once_with({"entries": []}, {"key": "work_id"})
-
-        # Confirm result includes what parse_editions_response returns
-        assert result.get("parsed_editions") is True
+    # work page is merged, then editions data added
+    assert result["title"] == "Work Title"
+    assert result["openlib_work_key"] == "/works/OL12345W"
+    assert result["isbns_13"] == set()
+    assert result["publishers"] == set()
 
     # Additional test cases:
 
     # Test with work_id argument instead of book dict
-    openlib_caller.get_work_id_results.reset_mock()
     openlib_caller.fetch_with_semaphore.reset_mock()
     result = await openlib_caller._get_complete_book_data(work_id="OL12345W")
-    openlib_caller.get_work_id_results.assert_called_once_with("OL12345W", book={})
+    assert result["title"] == "Work Title"
+    openlib_caller.fetch_with_semaphore.assert_any_call("https://openlibrary.org/works/OL12345W.json")
 
     # Test with neither book nor work_id
     result = await openlib_caller._get_complete_book_data()
     assert result is None
 
-    # Test get_work_id_results returns None
-    openlib_caller.get_work_id_results.return_value = None
-    result = await openlib_caller._get_complete_book_data(work_id="OL12345W")
+    # Test work page returns None
+    result = await openlib_caller._get_complete_book_data(work_id="OL999W")
     assert result is None
 
-    # Reset get_work_id_results return value for next test
-    openlib_caller.get_work_id_results.return_value = {"key": "OL12345W"}
-
     # Test fetch_with_semaphore returns None for editions
-    async def fetch_none(url):
+    async def fetch_none(url, paths=None):
         if "search.json" in url:
             return {"docs": [], "num_found": 0}
         elif "editions.json" in url:
             return None
-        return None
+        return {"title": "Work Title", "key": "/works/OL12345W"}
 
     openlib_caller.fetch_with_semaphore = AsyncMock(side_effect=fetch_none)
     result = await openlib_caller._get_complete_book_data(work_id="OL12345W")
-    assert result is not None  # It should still return the book from get_work_id_results
+    assert result is not None  # It should still return the book from the work page
+    assert "isbns_13" not in result
+
+
+@pytest.mark.asyncio
+async def test_get_complete_book_data_fetches_concurrently(openlib_caller):
+    in_flight = [0]
+    max_in_flight = [0]
+
+    async def slow_fetch(url, paths=None):
+        in_flight[0] += 1
+        max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        await asyncio.sleep(0.05)
+        in_flight[0] -= 1
+        if "search.json" in url:
+            return {"docs": [{"key": "/works/OL1W", "title": "Search Title", "first_publish_year": 1990}]}
+        elif "editions.json" in url:
+            return {"entries": [{"publish_date": "1985", "isbn_13": ["9780000000001"]}]}
+        return {"title": "Work Title", "key": "/works/OL1W"}
+
+    openlib_caller.fetch_with_semaphore = AsyncMock(side_effect=slow_fetch)
+
+    book = await openlib_caller._get_complete_book_data(work_id="OL1W")
+
+    assert max_in_flight[0] == 3
+    # search result is enriched first, then work page, then editions
+    assert book["author_names"] == []
+    assert book["title"] == "Work Title"
+    assert book["first_publish_year"] == 1985
+    assert book["isbns_13"] == {"9780000000001"}
 
 
 @pytest.mark.asyncio
@@ -335,11 +572,13 @@ async def test_get_book_data_for_db(openlib_caller):
         author_data = {"name": "Test Author", "key": "author_key1"}
 
         openlib_caller._get_complete_book_data = AsyncMock(return_value=book_data)
+        openlib_caller.search_authors = AsyncMock(return_value={})
         openlib_caller.get_author_results = AsyncMock(return_value=author_data)
 
         book, authors = await openlib_caller.get_book_data_for_db(work_id="OL12345")
 
         assert openlib_caller._get_complete_book_data.call_count == 1
+        openlib_caller.search_authors.assert_not_called()
         assert openlib_caller.get_author_results.call_count == 2
         openlib_caller.get_author_results.assert_any_call("author_key1")
         openlib_caller.get_author_results.assert_any_call("author_key2")
@@ -350,6 +589,23 @@ async def test_get_book_data_for_db(openlib_caller):
         assert len(authors) == 2
         assert authors[0]["name"] == "Test Author"
 
+        # authors already stored come from the batched search instead of their author pages
+        openlib_caller._get_complete_book_data.return_value = {
+            "authors": [{"author": {"key": "/authors/OL1A"}}, {"author": {"key": "/authors/OL2A"}}],
+            "title": "Test Book",
+        }
+        openlib_caller.search_authors = AsyncMock(return_value={"/authors/OL1A": author_data})
+        openlib_caller.get_author_results.reset_mock()
+        stored_authors = AsyncMock(return_value={"/authors/OL1A"})
+
+        book, authors = await openlib_caller.get_book_data_for_db(work_id="OL12345", stored_authors=stored_authors)
+
+        stored_authors.assert_called_once_with(["/authors/OL1A", "/authors/OL2A"])
+        openlib_caller.search_authors.assert_called_once_with(["/authors/OL1A"])
+        openlib_caller.get_author_results.assert_called_once_with("/authors/OL2A")
+        assert len(authors) == 2
+        openlib_caller._get_complete_book_data.return_value = book_data
+
     # Test invalid work id
     with patch("calls.openlib.validate_openlib_work_id", return_value=False):
         result = await openlib_caller.get_book_data_for_db("invalid_work_id")
@@ -373,19 +629,26 @@ async def test_get_book_data_for_db(openlib_caller):
 @pytest.mark.asyncio
 async def test_get_complete_books_data(openlib_caller):
     clean_results = [
-        {"openlib_work_key": "work1"},
-        {"openlib_work_key": "work2"},
+        {"openlib_work_key": "/works/OL1W"},
+        {"openlib_work_key": "/works/OL2W"},
+        {"openlib_work_key": "/works/OL1W"},
     ]
     complete_book_data = {"title": "Complete Book", "author_keys": ["author1", "author2"]}
     author_data = {"name": "Author Name"}
+    search_result = {"title": "Search Book", "openlib_work_key": "/works/OL1W"}
 
+    openlib_caller.enrich_books_from_search = AsyncMock(return_value={"/works/OL1W": search_result})
     openlib_caller._get_complete_book_data = AsyncMock(return_value=complete_book_data)
+    openlib_caller.search_authors = AsyncMock(return_value={})
     openlib_caller.get_author_results = AsyncMock(return_value=author_data)
 
     books, authors = await openlib_caller.get_complete_books_data(clean_results)
 
+    openlib_caller.enrich_books_from_search.assert_called_once_with(["/works/OL1W", "/works/OL2W"])
     assert openlib_caller._get_complete_book_data.call_count == 2
-    assert openlib_caller.get_author_results.call_count == 4  # 2 books * 2 authors each
+    openlib_caller._get_complete_book_data.assert_any_call(search_result, work_id="/works/OL1W", searched=True)
+    openlib_caller._get_complete_book_data.assert_any_call(clean_results[1], work_id="/works/OL2W", searched=True)
+    assert openlib_caller.get_author_results.call_count == 2  # shared authors only fetched once
     assert len(books) == 2
     assert len(authors) == 4
     assert books[0]["title"] == "Complete Book"
@@ -396,3 +659,102 @@ async def test_get_complete_books_data(openlib_caller):
     openlib_caller._get_complete_book_data.return_value = None
     result = await openlib_caller.get_complete_books_data(clean_results)
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_get_complete_books_data_upstream_calls(openlib_caller):
+    num_books = 6
+    author_keys = {f"/works/OL{num}W": ["OL100A", f"OL{num}A"] for num in range(num_books)}
+    stored = {"/authors/OL100A", "/authors/OL1A", "/authors/OL3A"}
+    calls = []
+
+    async def fake_fetch(url, params={}, paths=None):
+        calls.append(url)
+        if url == openlib_caller.search_url:
+            keys = re.findall(r'"(/works/OL\d+W)"', params["q"])
+            return {"num_found": len(keys), "docs": [{"key": key, "author_key": author_keys[key]} for key in keys]}
+        if url == openlib_caller.search_authors_url:
+            keys = re.findall(r'"/authors/(OL\d+A)"', params["q"])
+            return {"numFound": len(keys), "docs": [{"key": key, "name": f"name {key}"} for key in keys]}
+        if url.endswith("/editions.json"):
+            return {"entries": [], "size": 0}
+        if "/authors/" in url:
+            return {"key": url.removeprefix(openlib_caller.root_url).removesuffix(".json"), "name": "page name"}
+        return {"title": "work title"}
+
+    openlib_caller.fetch_with_semaphore = AsyncMock(side_effect=fake_fetch)
+    stored_authors = AsyncMock(side_effect=lambda keys: stored & set(keys))
+
+    books, authors = await openlib_caller.get_complete_books_data(
+        [{"openlib_work_key": key} for key in author_keys], stored_authors=stored_authors
+    )
+
+    stored_authors.assert_called_once_with(["/authors/OL100A"] + [f"/authors/OL{num}A" for num in range(num_books)])
+    author_pages = sorted(url for url in calls if "/authors/OL" in url)
+    assert author_pages == [openlib_caller.get_author_url(f"OL{num}A") for num in (0, 2, 4, 5)]
+    # one books search, a work and editions page per book, one author search, a page per unstored author
+    assert calls.count(openlib_caller.search_url) == 1
+    assert calls.count(openlib_caller.search_authors_url) == 1
+    assert len(calls) == 1 + 2 * num_books + 1 + 4
+    assert len(books) == num_books
+    assert len(authors) == 2 * num_books
+
+    calls.clear()
+    await openlib_caller.get_complete_books_data(
+        [{"openlib_work_key": key} for key in author_keys], with_remote_ids=False
+    )
+    assert not [url for url in calls if "/authors/OL" in url]
+    assert len(calls) == 1 + 2 * num_books + 1
+
+
+@pytest.mark.asyncio
+async def test_enrich_books_from_search(openlib_caller):
+    async def fake_search(url, params, paths=None):
+        keys = re.findall(r'"(/works/OL\d+W)"', params["q"])
+        return {
+            "num_found": len(keys),
+            "docs": [{"key": key, "title": f"title {key}"} for key in keys if key != "/works/OL3W"],
+        }
+
+    openlib_caller.fetch_with_semaphore = AsyncMock(side_effect=fake_search)
+
+    results = await openlib_caller.enrich_books_from_search(["OL1W", "/works/OL2W", "OL3W", "OL1W", "invalid"])
+
+    openlib_caller.fetch_with_semaphore.assert_called_once_with(
+        "https://openlibrary.org/search.json",
+        {
+            "q": 'key:("/works/OL1W" OR "/works/OL2W" OR "/works/OL3W")',
+            "limit": 3,
+            "fields": openlib_caller.search_fields,
+        },
+        paths=SEARCH_PATHS,
+    )
+    assert set(results) == {"/works/OL1W", "/works/OL2W"}
+    assert results["/works/OL2W"]["title"] == "title /works/OL2W"
+
+
+@pytest.mark.asyncio
+async def test_enrich_books_from_search_chunks_long_urls(openlib_caller):
+    openlib_caller.fetch_with_semaphore = AsyncMock(return_value={"num_found": 0, "docs": []})
+    work_ids = [f"OL{100000000 + i}W" for i in range(200)]
+
+    await openlib_caller.enrich_books_from_search(work_ids)
+
+    calls = openlib_caller.fetch_with_semaphore.call_args_list
+    assert len(calls) > 1
+    assert sum(call.args[1]["limit"] for call in calls) == 200
+    for call in calls:
+        url = str(httpx.URL(call.args[0], params=call.args[1]))
+        assert len(url) <= MAX_SEARCH_URL_LENGTH
+
+
+def test_normalise_author_key():
+    assert normalise_author_key("OL1A") == "/authors/OL1A"
+    assert normalise_author_key("/authors/OL1A") == "/authors/OL1A"
+    assert normalise_author_key("author1") == ""
+
+
+def test_normalise_work_key():
+    assert normalise_work_key("OL1W") == "/works/OL1W"
+    assert normalise_work_key("/works/OL1W") == "/works/OL1W"
+    assert normalise_work_key("work1") == ""
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from calls.rate_limit import TokenBucket, get_host_limiter, rate_limit_stats
+
+
+async def test_token_bucket_allows_burst():
+    bucket = TokenBucket(rate=1, burst=3)
+
+    waits = [await bucket.acquire() for _ in range(3)]
+
+    assert waits == [0.0, 0.0, 0.0]
+    assert bucket.wait_time > 0.9
+
+
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, burst=1)
+    loop = asyncio.get_running_loop()
+
+    start = loop.time()
+    await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+
+    # first request is free, the other four wait 0.05s each in turn
+    assert loop.time() - start >= 0.19
+    assert bucket.queue_depth == 0
+
+
+async def test_token_bucket_reports_queue_depth():
+    bucket = TokenBucket(rate=10, burst=1)
+    await bucket.acquire()
+
+    waiters = [asyncio.create_task(bucket.acquire()) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    assert bucket.queue_depth == 3
+    assert bucket.stats()["wait_time"] > 0.3
+
+    await asyncio.gather(*waiters)
+    assert bucket.queue_depth == 0
+    assert bucket.stats()["waits"] == 3
+    assert bucket.stats()["wait_seconds"] >= 0.6
+
+
+async def test_cancelled_waiter_returns_token():
+    bucket = TokenBucket(rate=10, burst=1)
+    await bucket.acquire()
+
+    waiter = asyncio.create_task(bucket.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert bucket.wait_time <= 0.1
+
+
+def test_token_bucket_requires_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_get_host_limiter_shared_by_host():
+    first = get_host_limiter("https://ratelimit.example.com/works/OL1W.json", rate=2, burst=2)
+    second = get_host_limiter("https://RateLimit.example.com/search.json", rate=5, burst=1)
+
+    assert first is second
+    assert first.rate == 2
+    assert get_host_limiter("https://other.example.com", rate=2) is not first
+    assert rate_limit_stats()["ratelimit.example.com"]["queue_depth"] == 0
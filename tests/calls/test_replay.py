@@ -0,0 +1,95 @@
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from calls.client import Client
+from calls.openlib import OpenLibCaller
+from calls.replay import (
+    FixtureStore,
+    RecordingTransport,
+    ReplayTransport,
+    create_stub_app,
+    fixture_key,
+    make_transport,
+)
+
+
+WORK_URL = "https://openlibrary.org/works/OL1W.json"
+
+
+def upstream(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/works/OL1W.json":
+        return httpx.Response(200, json={"key": "/works/OL1W", "title": "Test"}, headers={"ETag": '"v1"'})
+    if request.url.path == "/search.json":
+        return httpx.Response(200, json={"num_found": 0, "docs": []})
+    return httpx.Response(500)
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    directory = tmp_path / "fixtures"
+    store = FixtureStore(directory)
+    store.save(WORK_URL, 200, httpx.Headers({"content-type": "application/json"}), b'{"title": "Test"}')
+    return directory
+
+
+def test_fixture_key_ignores_host_and_param_order():
+    assert fixture_key("https://openlibrary.org/search.json?q=test&limit=1") == "/search.json?limit=1&q=test"
+    assert fixture_key("http://127.0.0.1:8001/search.json?limit=1&q=test") == "/search.json?limit=1&q=test"
+
+
+async def test_record_then_replay(tmp_path):
+    directory = tmp_path / "fixtures"
+    recorder = Client(max_retries=1, transport=RecordingTransport(directory, transport=httpx.MockTransport(upstream)))
+
+    recorded = await recorder.fetch_results(WORK_URL)
+    await recorder.fetch_results("https://openlibrary.org/search.json", {"q": "test"})
+    assert await recorder.fetch_results("https://openlibrary.org/missing.json") is None
+    await recorder.close_session()
+
+    assert {path.parent.name for path in directory.glob("*/*.json")} == {"works", "search"}
+
+    replayer = Client(max_retries=1, transport=ReplayTransport(directory))
+    assert await replayer.fetch_results(WORK_URL) == recorded
+    assert await replayer.fetch_results("https://openlibrary.org/search.json?q=test") == {"num_found": 0, "docs": []}
+    assert await replayer.fetch_results("https://openlibrary.org/works/OL2W.json") is None
+    await replayer.close_session()
+
+
+async def test_replay_synthetic_errors(fixtures):
+    client = Client(max_retries=1, transport=ReplayTransport(fixtures, error_rate=1.0))
+
+    assert await client.fetch_results(WORK_URL) is None
+    await client.close_session()
+
+
+async def test_replay_is_repeatable_with_seed(fixtures):
+    def run():
+        transport = ReplayTransport(fixtures, latency=0.001, jitter=0.001, error_rate=0.5, seed=1)
+        return [transport.faults.random.random() for _ in range(5)]
+
+    assert run() == run()
+
+
+def test_make_transport(tmp_path):
+    assert make_transport("live", tmp_path) is None
+    assert isinstance(make_transport("record", tmp_path), RecordingTransport)
+    assert isinstance(make_transport("replay", tmp_path), ReplayTransport)
+    with pytest.raises(ValueError):
+        make_transport("invalid", tmp_path)
+
+
+def test_stub_app_serves_fixtures(fixtures):
+    with TestClient(create_stub_app(fixtures)) as client:
+        response = client.get("/works/OL1W.json")
+        assert response.status_code == 200
+        assert response.json() == {"title": "Test"}
+
+        assert client.get("/works/OL2W.json").status_code == 404
+
+
+async def test_caller_uses_root_url(fixtures):
+    caller = OpenLibCaller(client=Client(), root_url="http://127.0.0.1:8001/")
+
+    assert caller.get_work_id_url("/works/OL1W") == "http://127.0.0.1:8001/works/OL1W.json"
+    assert caller.search_url == "http://127.0.0.1:8001/search.json"
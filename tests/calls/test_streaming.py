@@ -0,0 +1,116 @@
+import json
+
+import httpx
+import pytest
+
+from calls.client import Client
+from calls.openlib import EDITIONS_PATHS, SEARCH_PATHS, EditionsAggregator, OpenLibCaller
+from calls.streaming import stream_json
+
+
+pytest.importorskip("ijson")
+
+EDITIONS_PAGE = {
+    "links": {"self": "/works/OL1W/editions.json", "work": "/works/OL1W", "next": "/works/OL1W/editions.json?offset=2"},
+    "size": 2,
+    "entries": [
+        {
+            "key": "/books/OL1M",
+            "title": "Test",
+            "isbn_13": ["9780000000001"],
+            "publishers": ["Penguin"],
+            "publish_date": "March 1985",
+            "number_of_pages": 300,
+            "identifiers": {"goodreads": ["1"]},
+            "languages": [{"key": "/languages/eng"}],
+        },
+        {"key": "/books/OL2M", "isbn_10": ["0000000002"], "publish_date": "1990", "covers": [1, 2, 3]},
+    ],
+}
+
+SEARCH_PAGE = {
+    "numFound": 1,
+    "num_found": 1,
+    "docs": [
+        {
+            "key": "/works/OL1W",
+            "title": "Test",
+            "author_name": ["Test Author"],
+            "author_key": ["OL1A"],
+            "first_publish_year": 1985,
+            "ia": ["a", "b", "c"],
+            "edition_key": ["OL1M", "OL2M"],
+        }
+    ],
+}
+
+
+async def chunked(payload: dict, size: int = 7):
+    body = json.dumps(payload).encode()
+    for i in range(0, len(body), size):
+        yield body[i : i + size]
+
+
+async def test_stream_json_keeps_only_paths():
+    result = await stream_json(chunked(EDITIONS_PAGE), EDITIONS_PATHS)
+
+    assert result == {
+        "links": {"next": "/works/OL1W/editions.json?offset=2"},
+        "size": 2,
+        "entries": [
+            {
+                "isbn_13": ["9780000000001"],
+                "publishers": ["Penguin"],
+                "publish_date": "March 1985",
+                "number_of_pages": 300,
+            },
+            {"isbn_10": ["0000000002"], "publish_date": "1990"},
+        ],
+    }
+
+
+async def test_stream_json_keeps_container_values():
+    payload = {"a": {"b": [1, {"c": 2}], "d": 3}, "e": 4}
+
+    assert await stream_json(chunked(payload, size=3), ["a.b"]) == {"a": {"b": [1, {"c": 2}]}}
+
+
+async def test_streamed_editions_parse_the_same():
+    streamed = await stream_json(chunked(EDITIONS_PAGE), EDITIONS_PATHS)
+
+    full, projected = EditionsAggregator(), EditionsAggregator()
+    for entry in EDITIONS_PAGE["entries"]:
+        full.add(entry)
+    for entry in streamed["entries"]:
+        projected.add(entry)
+
+    assert projected.update_book({}) == full.update_book({})
+
+
+async def test_streamed_search_parses_the_same():
+    caller = OpenLibCaller(client=Client(), pprint_results=False)
+    streamed = await stream_json(chunked(SEARCH_PAGE), SEARCH_PATHS)
+
+    assert "ia" not in streamed["docs"][0]
+    assert caller.parse_books_search_results(streamed) == caller.parse_books_search_results(SEARCH_PAGE)
+
+
+async def test_client_streams_when_paths_given():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=EDITIONS_PAGE)
+
+    client = Client(max_retries=1, stream=True)
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    streamed = await client.fetch_results("https://openlibrary.org/works/OL1W/editions.json", paths=EDITIONS_PATHS)
+    full = await client.fetch_results("https://openlibrary.org/works/OL1W/editions.json")
+
+    assert "key" not in streamed["entries"][0]
+    assert full == EDITIONS_PAGE
+    await client.close_session()
+
+
+async def test_client_needs_ijson_to_stream(mocker):
+    mocker.patch("calls.client.streaming_available", return_value=False)
+
+    assert Client(stream=True).stream is False
@@ -3,6 +3,7 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from db import Database
+from db.migrate import load_migrations
 
 
 @pytest.fixture
@@ -24,13 +25,13 @@ async def test_database_init(db: Database):
 async def test_startup(db: Database):
     with (
         patch.object(db, "set_queries", new_callable=AsyncMock) as mock_set_queries,
-        patch.object(db, "create_schema", new_callable=AsyncMock) as mock_create_schema,
+        patch.object(db, "check_schema", new_callable=AsyncMock) as mock_check_schema,
     ):
         await db.start_up()
 
         asyncpg.create_pool.assert_called_once()
         mock_set_queries.assert_awaited_once()
-        mock_create_schema.assert_awaited_once()
+        mock_check_schema.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -56,10 +57,56 @@ async def test_run_query(db: Database):
 
 
 @pytest.mark.asyncio
-async def test_create_schema(db: Database):
-    with patch.object(db, "run_query", new_callable=AsyncMock) as mock_run_query:
-        await db.create_schema()
-        mock_run_query.assert_awaited_once_with("create_schema")
+async def test_run_query_with_local_settings(db: Database):
+    db.queries = MagicMock()
+    db.queries.test_query = AsyncMock(return_value="test_result")
+    db.pool.acquire = MagicMock()
+
+    mock_conn = AsyncMock()
+    mock_conn.transaction = MagicMock()
+    db.pool.acquire.return_value.__aenter__.return_value = mock_conn
+
+    result = await db.run_query("test_query", local_settings={"pg_trgm.word_similarity_threshold": 0.3}, param="value")
+
+    assert result == "test_result"
+    mock_conn.transaction.return_value.__aenter__.assert_awaited_once()
+    mock_conn.execute.assert_awaited_once_with(
+        "SELECT set_config($1, $2, true)", "pg_trgm.word_similarity_threshold", "0.3"
+    )
+    db.queries.test_query.assert_awaited_once_with(mock_conn, param="value")
+
+
+@pytest.fixture
+def mock_conn(db: Database):
+    conn = AsyncMock()
+    db.pool.acquire = MagicMock()
+    db.pool.acquire.return_value.__aenter__.return_value = conn
+    return conn
+
+
+@pytest.mark.asyncio
+async def test_check_schema_up_to_date(db: Database, mock_conn):
+    mock_conn.fetchval.return_value = load_migrations()[-1].version
+
+    with patch.object(db, "migrate", new_callable=AsyncMock) as mock_migrate:
+        assert await db.check_schema() == 0
+        mock_migrate.assert_not_awaited()
+
+    mock_conn.fetchval.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_check_schema_migrates_when_behind(db: Database, mock_conn):
+    mock_conn.fetchval.return_value = 1
+
+    with patch.object(db, "migrate", new_callable=AsyncMock) as mock_migrate:
+        assert await db.check_schema() == 0
+        mock_migrate.assert_awaited_once()
+
+    db.migrate_on_startup = False
+    with patch.object(db, "migrate", new_callable=AsyncMock) as mock_migrate:
+        assert await db.check_schema() == len(load_migrations()) - 1
+        mock_migrate.assert_not_awaited()
 
 
 @pytest.mark.asyncio
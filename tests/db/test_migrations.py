@@ -0,0 +1,252 @@
+import asyncio
+import contextlib
+import os
+from unittest.mock import AsyncMock, MagicMock, call
+
+import asyncpg
+import pytest
+
+import db.migrate
+from db.migrate import MIGRATION_LOCK_ID, Migration, get_schema_version, load_migrations, migrate
+
+
+TEST_POSTGRES_DSN = os.environ.get("TEST_POSTGRES_DSN")
+
+
+@pytest.fixture
+def mock_conn():
+    conn = AsyncMock()
+    conn.transaction = MagicMock()
+    conn.fetch.return_value = [{"version": 1}]
+    conn.fetchval.return_value = True
+    return conn
+
+
+class FakeDatabase:
+    """
+    The advisory lock and schema_migrations table shared by FakeConnections, like a single postgres
+    """
+
+    def __init__(self):
+        self.lock_holder = None
+        self.applied: list[int] = []
+        self.migrating = 0
+
+
+class FakeConnection:
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetchval(self, query, *args):
+        if "pg_try_advisory_lock" in query:
+            if self.database.lock_holder is None:
+                self.database.lock_holder = self
+            return self.database.lock_holder is self
+        return None
+
+    async def fetch(self, query, *args):
+        return [{"version": version} for version in self.database.applied]
+
+    async def execute(self, query, *args):
+        if "pg_advisory_lock(" in query:
+            raise AssertionError("waiting in pg_advisory_lock holds a snapshot")
+        if "pg_advisory_unlock" in query and self.database.lock_holder is self:
+            self.database.lock_holder = None
+        if query.startswith("CREATE INDEX CONCURRENTLY"):
+            self.database.migrating += 1
+            # give the other migrator a chance to run while the index builds
+            await asyncio.sleep(0.01)
+            assert self.database.migrating == 1, "two migrators ran at once"
+            self.database.migrating -= 1
+        if query.startswith("INSERT INTO schema_migrations"):
+            self.database.applied.append(args[0])
+
+
+def test_load_migrations():
+    migrations = load_migrations()
+
+    assert [migration.version for migration in migrations] == list(range(1, len(migrations) + 1))
+    assert migrations[0].name == "initial_schema"
+    assert migrations[0].transactional
+    trigram = next(migration for migration in migrations if migration.name == "trigram_indexes")
+    assert not trigram.transactional
+    drop_index = next(migration for migration in migrations if migration.name == "drop_reviews_created_at_id_index")
+    assert not drop_index.transactional
+
+
+def test_load_migrations_rejects_bad_files(tmp_path):
+    (tmp_path / "0001_first.sql").write_text("SELECT 1;")
+    (tmp_path / "1_again.sql").write_text("SELECT 1;")
+
+    with pytest.raises(ValueError, match="unique"):
+        load_migrations(tmp_path)
+
+    (tmp_path / "1_again.sql").unlink()
+    (tmp_path / "second.sql").write_text("SELECT 1;")
+
+    with pytest.raises(ValueError, match="0001_name.sql"):
+        load_migrations(tmp_path)
+
+
+def test_migration_statements():
+    migration = Migration(
+        version=2,
+        name="indexes",
+        sql="-- an index\nCREATE INDEX CONCURRENTLY a ON t (a);\n\nCREATE INDEX CONCURRENTLY b\n    ON t (b);\n",
+    )
+
+    assert migration.statements() == [
+        "-- an index\nCREATE INDEX CONCURRENTLY a ON t (a)",
+        "CREATE INDEX CONCURRENTLY b\n    ON t (b)",
+    ]
+
+
+async def test_get_schema_version_without_table(mock_conn):
+    mock_conn.fetchval.side_effect = asyncpg.UndefinedTableError("missing")
+    assert await get_schema_version(mock_conn) == 0
+
+
+async def test_migrate_applies_pending_under_lock(mock_conn):
+    migrations = [
+        Migration(1, "first", "CREATE TABLE a (id INT);"),
+        Migration(2, "second", "CREATE TABLE b (id INT);"),
+        Migration(3, "third", "CREATE INDEX CONCURRENTLY b_id ON b (id);\nCREATE INDEX CONCURRENTLY a_id ON a (id);"),
+    ]
+
+    applied = await migrate(mock_conn, migrations)
+
+    assert [migration.version for migration in applied] == [2, 3]
+    mock_conn.fetchval.assert_any_call("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_ID)
+    executed = mock_conn.execute.call_args_list
+    assert executed[-1] == call("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+    assert call("CREATE TABLE a (id INT);") not in executed
+    assert call("CREATE TABLE b (id INT);") in executed
+    # concurrent index builds run a statement at a time, outside a transaction
+    assert call("CREATE INDEX CONCURRENTLY b_id ON b (id)") in executed
+    assert call("CREATE INDEX CONCURRENTLY a_id ON a (id)") in executed
+    assert mock_conn.transaction.call_count == 1
+    assert call("INSERT INTO schema_migrations (version, name) VALUES ($1, $2)", 3, "third") in executed
+
+
+async def test_migrate_unlocks_after_failure(mock_conn):
+    mock_conn.fetch.return_value = []
+
+    async def fail_on_migration(query, *args):
+        if query.startswith("CREATE TABLE a"):
+            raise asyncpg.PostgresError("broken")
+
+    mock_conn.execute.side_effect = fail_on_migration
+
+    with pytest.raises(asyncpg.PostgresError):
+        await migrate(mock_conn, [Migration(1, "first", "CREATE TABLE a (id INT);")])
+
+    assert mock_conn.execute.call_args_list[-1] == call("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+
+async def test_migrate_polls_for_lock(mock_conn, monkeypatch):
+    monkeypatch.setattr(db.migrate, "MIGRATION_LOCK_POLL_SECONDS", 0)
+    mock_conn.fetchval.side_effect = [False, False, True]
+
+    await migrate(mock_conn, [Migration(1, "first", "CREATE TABLE a (id INT);")])
+
+    assert mock_conn.fetchval.call_args_list == [call("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_ID)] * 3
+
+
+async def test_concurrent_migrators_apply_once(monkeypatch):
+    monkeypatch.setattr(db.migrate, "MIGRATION_LOCK_POLL_SECONDS", 0.001)
+    database = FakeDatabase()
+    migrations = [
+        Migration(1, "first", "CREATE TABLE a (id INT);"),
+        Migration(2, "index", "CREATE INDEX CONCURRENTLY IF NOT EXISTS a_id ON a (id);"),
+    ]
+
+    first, second = await asyncio.gather(
+        migrate(FakeConnection(database), migrations), migrate(FakeConnection(database), migrations)
+    )
+
+    assert sorted([len(first), len(second)]) == [0, 2]
+    assert database.applied == [1, 2]
+    assert database.lock_holder is None
+
+
+async def test_invalid_index_dropped_before_rebuild(mock_conn):
+    mock_conn.fetch.return_value = []
+    mock_conn.fetchval.side_effect = [True, False]
+    migration = Migration(1, "index", "CREATE INDEX CONCURRENTLY IF NOT EXISTS a_id ON a (id);")
+
+    await migrate(mock_conn, [migration])
+
+    mock_conn.fetchval.assert_called_with("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)", "a_id")
+    executed = mock_conn.execute.call_args_list
+    drop = executed.index(call("DROP INDEX CONCURRENTLY IF EXISTS a_id"))
+    assert executed.index(call("CREATE INDEX CONCURRENTLY IF NOT EXISTS a_id ON a (id)")) == drop + 1
+
+
+async def test_valid_index_kept(mock_conn):
+    mock_conn.fetch.return_value = []
+    mock_conn.fetchval.side_effect = [True, True]
+
+    await migrate(mock_conn, [Migration(1, "index", "CREATE INDEX CONCURRENTLY IF NOT EXISTS a_id ON a (id);")])
+
+    assert call("DROP INDEX CONCURRENTLY IF EXISTS a_id") not in mock_conn.execute.call_args_list
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_DSN, reason="TEST_POSTGRES_DSN not set")
+async def test_migrate_real_database():
+    conn = await asyncpg.connect(TEST_POSTGRES_DSN)
+    try:
+        await conn.execute("DROP SCHEMA IF EXISTS migrate_test CASCADE; CREATE SCHEMA migrate_test")
+        await conn.execute("SET search_path TO migrate_test, public")
+
+        applied = await migrate(conn)
+        assert await get_schema_version(conn) == applied[-1].version
+        # running again, like a second worker starting, applies nothing
+        assert await migrate(conn) == []
+    finally:
+        await conn.execute("DROP SCHEMA IF EXISTS migrate_test CASCADE")
+        await conn.close()
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_DSN, reason="TEST_POSTGRES_DSN not set")
+async def test_concurrent_migrators_real_database():
+    """
+    Two workers starting together, with concurrent index builds among the migrations
+    """
+    first, second = await asyncio.gather(asyncpg.connect(TEST_POSTGRES_DSN), asyncpg.connect(TEST_POSTGRES_DSN))
+    try:
+        await first.execute("DROP SCHEMA IF EXISTS migrate_test CASCADE; CREATE SCHEMA migrate_test")
+        for conn in (first, second):
+            await conn.execute("SET search_path TO migrate_test, public")
+
+        results = await asyncio.wait_for(asyncio.gather(migrate(first), migrate(second)), timeout=60)
+
+        assert sorted(len(applied) for applied in results) == [0, len(load_migrations())]
+        assert await get_schema_version(second) == load_migrations()[-1].version
+    finally:
+        await first.execute("DROP SCHEMA IF EXISTS migrate_test CASCADE")
+        await asyncio.gather(first.close(), second.close())
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_DSN, reason="TEST_POSTGRES_DSN not set")
+async def test_retry_rebuilds_invalid_index():
+    conn = await asyncpg.connect(TEST_POSTGRES_DSN)
+    migration = Migration(1, "unique_index", "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS t_a_idx ON t (a);")
+    try:
+        await conn.execute("DROP SCHEMA IF EXISTS migrate_test CASCADE; CREATE SCHEMA migrate_test")
+        await conn.execute("SET search_path TO migrate_test, public")
+        await conn.execute("CREATE TABLE t (a INT); INSERT INTO t VALUES (1), (1)")
+
+        # the duplicate fails the build, leaving an invalid index behind
+        with pytest.raises(asyncpg.UniqueViolationError):
+            await migrate(conn, [migration])
+        await conn.execute("DELETE FROM t WHERE ctid = (SELECT max(ctid) FROM t)")
+
+        assert await migrate(conn, [migration]) == [migration]
+        assert await conn.fetchval("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass('t_a_idx')")
+    finally:
+        await conn.execute("DROP SCHEMA IF EXISTS migrate_test CASCADE")
+        await conn.close()
@@ -0,0 +1,105 @@
+"""
+Checks the review feed against a real postgres, set TEST_POSTGRES_DSN to a database the tests can create schemas in
+"""
+
+import json
+import os
+from pathlib import Path
+
+import aiosql
+import asyncpg
+import pytest
+
+import db
+from db.migrate import migrate
+from db.models import Review
+
+
+TEST_POSTGRES_DSN = os.environ.get("TEST_POSTGRES_DSN")
+
+pytestmark = pytest.mark.skipif(not TEST_POSTGRES_DSN, reason="TEST_POSTGRES_DSN not set")
+
+queries = aiosql.from_path(Path(db.__file__).parent / "sql", driver_adapter="asyncpg")
+
+
+@pytest.fixture
+async def conn():
+    conn = await asyncpg.connect(TEST_POSTGRES_DSN)
+    await conn.execute("DROP SCHEMA IF EXISTS review_feed_test CASCADE; CREATE SCHEMA review_feed_test")
+    await conn.execute("SET search_path TO review_feed_test, public")
+    await migrate(conn)
+
+    await conn.execute("INSERT INTO users (username) VALUES ('anon')")
+    await conn.execute(
+        "INSERT INTO books (title, author_names, openlib_work_key) VALUES ('Bleak House', ARRAY['Dickens'], '/works/OL1W')"
+    )
+    await conn.execute("INSERT INTO authors (openlib_id, name) VALUES ('/authors/OL1A', 'Charles Dickens')")
+    await conn.execute("INSERT INTO book_authors (book_id, author_id) VALUES (1, 1)")
+    yield conn
+
+    await conn.execute("DROP SCHEMA review_feed_test CASCADE")
+    await conn.execute("SET search_path TO DEFAULT")
+    await conn.close()
+
+
+async def test_insert_review_adds_to_feed(conn):
+    await queries.insert_review(conn, user_id=1, book_id=1, content="Very foggy")
+
+    records = await queries.get_most_recent_book_reviews(conn, limit=10)
+    review = Review.from_db_record(records[0])
+
+    assert review.content == "Very foggy"
+    assert review.book.title == "Bleak House"
+    assert [author.name for author in review.book.authors] == ["Charles Dickens"]
+
+
+async def test_refresh_book_in_feed(conn):
+    await queries.insert_review(conn, user_id=1, book_id=1, content="Very foggy")
+    await conn.execute("UPDATE books SET first_publish_year = 1853 WHERE id = 1")
+    await conn.execute("INSERT INTO authors (openlib_id, name) VALUES ('/authors/OL2A', 'Hablot Browne')")
+    await conn.execute("INSERT INTO book_authors (book_id, author_id) VALUES (1, 2)")
+
+    await queries.refresh_book_in_review_feed(conn, book_id=1)
+
+    feed = await conn.fetchrow("SELECT first_publish_year, authors FROM review_feed")
+    assert feed["first_publish_year"] == 1853
+    assert [author["name"] for author in json.loads(feed["authors"])] == ["Charles Dickens", "Hablot Browne"]
+
+
+async def test_pages_keep_reviews_with_the_same_timestamp(conn):
+    await conn.execute(
+        "INSERT INTO reviews (user_id, book_id, content, created_at) "
+        "SELECT 1, 1, 'Review ' || n, '2025-01-01'::timestamptz FROM generate_series(1, 7) n"
+    )
+    await queries.rebuild_review_feed(conn)
+
+    page = await queries.get_most_recent_book_reviews(conn, limit=3)
+    seen = []
+    while page:
+        seen.extend(record["review_id"] for record in page)
+        page = await queries.get_recent_reviews_by_cursor(
+            conn, limit=3, cursor=page[-1]["created_at"], previous_review_id=page[-1]["review_id"]
+        )
+
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+
+async def test_feed_pages_read_index_only(conn):
+    await conn.execute(
+        "INSERT INTO reviews (user_id, book_id, content) SELECT 1, 1, 'Review ' || n FROM generate_series(1, 5000) n"
+    )
+    await queries.rebuild_review_feed(conn)
+    await conn.execute("ANALYZE review_feed")
+    last = await conn.fetchrow("SELECT created_at, review_id FROM review_feed ORDER BY review_id LIMIT 1 OFFSET 2500")
+
+    plan = await conn.fetch(
+        f"EXPLAIN {queries.get_recent_reviews_by_cursor.sql}", last["created_at"], last["review_id"], 20
+    )
+    plan_text = "\n".join(row[0] for row in plan)
+
+    assert "review_feed_created_at_review_id_idx" in plan_text
+    assert "Join" not in plan_text
+
+
+async def test_unused_reviews_index_dropped(conn):
+    assert await conn.fetchval("SELECT to_regclass('reviews_created_at_id_idx')") is None
@@ -0,0 +1,100 @@
+"""
+Checks query plans against a real postgres, set TEST_POSTGRES_DSN to a database the tests can create schemas in
+"""
+
+import os
+from pathlib import Path
+
+import aiosql
+import asyncpg
+import pytest
+
+import db
+from db.migrate import migrate
+
+
+TEST_POSTGRES_DSN = os.environ.get("TEST_POSTGRES_DSN")
+
+pytestmark = pytest.mark.skipif(not TEST_POSTGRES_DSN, reason="TEST_POSTGRES_DSN not set")
+
+queries = aiosql.from_path(Path(db.__file__).parent / "sql", driver_adapter="asyncpg")
+
+
+@pytest.fixture
+async def conn():
+    conn = await asyncpg.connect(TEST_POSTGRES_DSN)
+    await conn.execute("DROP SCHEMA IF EXISTS search_plan_test CASCADE; CREATE SCHEMA search_plan_test")
+    await conn.execute("SET search_path TO search_plan_test, public")
+    await migrate(conn)
+    yield conn
+
+    await conn.execute("DROP SCHEMA search_plan_test CASCADE")
+    await conn.execute("SET search_path TO DEFAULT")
+    await conn.close()
+
+
+async def test_search_books_uses_search_index(conn):
+    await conn.execute(
+        """
+        INSERT INTO books (title, author_names, openlib_work_key, openlib_tags, openlib_description)
+        SELECT 'Book ' || n, ARRAY['Author ' || n], '/works/OL' || n || 'W', ARRAY['fiction'], 'About book ' || n
+        FROM generate_series(1, 5000) n
+        """
+    )
+    await conn.execute(
+        """
+        INSERT INTO books (title, author_names, openlib_work_key)
+        VALUES ('Great Expectations', ARRAY['Charles Dickens'], '/works/OL1000000W')
+        """
+    )
+    await conn.execute("ANALYZE books")
+
+    search_vector = await conn.fetchval("SELECT search_vector FROM books WHERE openlib_work_key = '/works/OL1000000W'")
+    assert "'dicken':4B" in search_vector
+
+    plan = await conn.fetch(f"EXPLAIN {queries.search_books.sql}", "great:* & dickens:*", 10, 0)
+    plan_text = "\n".join(row[0] for row in plan)
+
+    assert "books_search_vector_idx" in plan_text
+    assert "Seq Scan on books" not in plan_text
+
+
+async def test_fuzzy_search_books_uses_trigram_indexes(conn):
+    await conn.execute(
+        """
+        INSERT INTO books (title, author_names, openlib_work_key)
+        SELECT 'Book ' || n, ARRAY['Author ' || n], '/works/OL' || n || 'W'
+        FROM generate_series(1, 5000) n
+        """
+    )
+    await conn.execute("INSERT INTO authors (openlib_id, name) VALUES ('/authors/OL1A', 'Fyodor Dostoevsky')")
+    await conn.execute("INSERT INTO book_authors (book_id, author_id) SELECT 1, id FROM authors")
+    await conn.execute("ANALYZE books; ANALYZE authors")
+
+    books = await queries.fuzzy_search_books(conn, search_query="Dostoyevsky", limit=10, threshold=0.6)
+    assert [book["book_id"] for book in books] == [1]
+
+    plan = await conn.fetch(f"EXPLAIN {queries.fuzzy_search_books.sql}", "Dostoyevsky", 0.6, 10)
+    plan_text = "\n".join(row[0] for row in plan)
+
+    assert "books_title_trgm_idx" in plan_text
+    assert "Seq Scan on books" not in plan_text
+
+
+async def test_searches_find_books_without_authors(conn):
+    await conn.execute(
+        """
+        INSERT INTO books (title, author_names, openlib_work_key)
+        VALUES ('Crime and Punishment', ARRAY[]::text[], '/works/OL1W')
+        """
+    )
+
+    books = await queries.search_books(conn, ts_query="crime:*", limit=10, offset=0)
+    assert [(book["book_id"], book["authors"]) for book in books] == [(1, "[]")]
+
+    # under the default pg_trgm.word_similarity_threshold of 0.6, so only found with it lowered
+    assert await queries.fuzzy_search_books(conn, search_query="Punshmint", limit=10, threshold=0.3) == []
+    async with conn.transaction():
+        await conn.execute("SELECT set_config('pg_trgm.word_similarity_threshold', '0.3', true)")
+        books = await queries.fuzzy_search_books(conn, search_query="Punshmint", limit=10, threshold=0.3)
+    assert [book["book_id"] for book in books] == [1]
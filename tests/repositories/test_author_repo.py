@@ -43,3 +43,15 @@ async def test_check_if_author_exists_false(repo, mock_db):
     mock_db.run_query.return_value = None
     result = await repo.check_if_author_exists("openlib123")
     assert result is False
+
+
+@pytest.mark.asyncio
+async def test_get_stored_openlib_ids(repo, mock_db):
+    mock_db.run_query.return_value = [{"openlib_id": "/authors/OL1A"}]
+
+    result = await repo.get_stored_openlib_ids(["/authors/OL1A", "/authors/OL2A"])
+
+    mock_db.run_query.assert_called_once_with(
+        "get_openlib_ids_of_stored_authors", openlib_ids=["/authors/OL1A", "/authors/OL2A"]
+    )
+    assert result == {"/authors/OL1A"}
@@ -3,7 +3,7 @@ import pytest
 from db.models.book import Book
 from db.models.review import Review
 
-from repositories.book_repository import BookRepository
+from repositories.book_repository import BookRepository, build_ts_query
 
 
 @pytest.fixture
@@ -63,3 +63,55 @@ async def test_get_book_and_reviews_by_book_id(repo, mock_db, mock_book_record,
     assert reviews[0].id == 10
     assert reviews[1].id == 11
     assert reviews[0].content == "Review content 10"
+
+
+@pytest.mark.asyncio
+async def test_search_books(repo, mock_db, mock_book_record):
+    mock_db.run_query.return_value = [{**mock_book_record, "book_id": 1, "rank": 0.5}]
+
+    books = await repo.search_books('"great expectations" dick', limit=10, offset=20)
+
+    mock_db.run_query.assert_called_once_with(
+        "search_books", ts_query="(great <-> expectations) & dick:*", limit=10, offset=20
+    )
+    assert books[0].id == 1
+    assert books[0].title == "Mock Book"
+
+
+@pytest.mark.asyncio
+async def test_search_books_without_terms(repo, mock_db):
+    assert await repo.search_books(" ?! ") == []
+    mock_db.run_query.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_search_books_falls_back_to_fuzzy_search(repo, mock_db, mock_book_record):
+    mock_db.run_query.side_effect = [[], [{**mock_book_record, "book_id": 2, "score": 0.75}]]
+
+    books = await repo.search_books('"Dostoyevsky"', limit=10)
+
+    assert mock_db.run_query.call_args_list[1].args == ("fuzzy_search_books",)
+    assert mock_db.run_query.call_args_list[1].kwargs == {
+        "local_settings": {"pg_trgm.word_similarity_threshold": 0.6},
+        "search_query": "Dostoyevsky",
+        "limit": 10,
+        "threshold": 0.6,
+    }
+    assert books[0].id == 2
+
+
+@pytest.mark.asyncio
+async def test_later_search_pages_do_not_fall_back(repo, mock_db):
+    mock_db.run_query.return_value = []
+
+    assert await repo.search_books("Dostoyevsky", offset=100) == []
+    mock_db.run_query.assert_called_once()
+
+
+def test_build_ts_query():
+    assert build_ts_query("Oliver Twist") == "Oliver:* & Twist:*"
+    assert build_ts_query('"oliver twist"') == "(oliver <-> twist)"
+    assert build_ts_query('"dickens"') == "dickens"
+    # tsquery operators are dropped rather than passed through
+    assert build_ts_query("o'brien & (dickens | !austen):*") == "o:* & brien:* & dickens:* & austen:*"
+    assert build_ts_query('""') == ""
@@ -1,6 +1,8 @@
+from datetime import datetime, timezone
+
 import pytest
 from db.models.review import Review
-from repositories.review_repository import ReviewRepository
+from repositories.review_repository import MAX_REVIEW_ID, ReviewRepository
 
 
 @pytest.mark.asyncio
@@ -122,3 +124,48 @@ async def test_get_reviews_by_book_id(mock_db, mock_review_record, monkeypatch):
     reviews = await repo.get_reviews_by_book_id(book_id=42)
     assert all(r.book_id == 42 for r in reviews)
     assert len(reviews) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_recent_reviews_by_cursor(mock_db, mock_review_record):
+    repo = ReviewRepository(mock_db)
+    cursor = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    mock_db.run_query.return_value = [mock_review_record(review_id=9, book_id=1)]
+
+    reviews = await repo.get_recent_reviews_by_cursor(limit=5, cursor=cursor, review_id=10)
+
+    mock_db.run_query.assert_called_once_with(
+        "get_recent_reviews_by_cursor", limit=5, cursor=cursor, previous_review_id=10
+    )
+    assert reviews[0].id == 9
+
+
+@pytest.mark.asyncio
+async def test_get_recent_reviews_by_cursor_without_review_id(mock_db):
+    repo = ReviewRepository(mock_db)
+    cursor = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    mock_db.run_query.return_value = []
+
+    await repo.get_recent_reviews_by_cursor(cursor=cursor)
+
+    assert mock_db.run_query.call_args.kwargs["previous_review_id"] == MAX_REVIEW_ID
+    assert await repo.get_recent_reviews_by_cursor(cursor=None) == []
+    mock_db.run_query.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_refresh_book_in_feed(mock_db):
+    repo = ReviewRepository(mock_db)
+
+    await repo.refresh_book_in_feed(3)
+
+    mock_db.run_query.assert_called_once_with("refresh_book_in_review_feed", book_id=3)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_feed(mock_db):
+    repo = ReviewRepository(mock_db)
+
+    await repo.rebuild_feed()
+
+    mock_db.run_query.assert_called_once_with("rebuild_review_feed")
@@ -5,6 +5,7 @@ from server.form_validators import (
     get_errors,
     is_required,
     is_openlib_work_id,
+    is_openlib_work_id_or_isbn,
     must_be_empty,
     validate_csrf_token,
     book_submit_fields,
@@ -22,6 +23,13 @@ def test_is_openlib_work_id_valid_and_invalid():
     assert is_openlib_work_id("INVALID") == {"success": False, "error": "Invalid openlibrary work ID"}
 
 
+def test_is_openlib_work_id_or_isbn():
+    assert is_openlib_work_id_or_isbn("/works/OL123W") == {"success": True, "value": "/works/OL123W"}
+    assert is_openlib_work_id_or_isbn("9780141439563") == {"success": True, "value": "9780141439563"}
+    assert is_openlib_work_id_or_isbn("014143960X") == {"success": True, "value": "014143960X"}
+    assert is_openlib_work_id_or_isbn("12345")["success"] is False
+
+
 def test_must_be_empty():
     assert must_be_empty("") == {"success": True, "value": ""}
     assert must_be_empty(None) == {"success": True, "value": None}
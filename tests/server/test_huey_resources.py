@@ -0,0 +1,9 @@
+from server.huey_resources import HueyResourceContainer
+
+
+def test_huey_lookups_run_concurrently():
+    resources = HueyResourceContainer()
+
+    # pacing is left to the client's rate limit, not a single request at a time
+    assert resources.openlib_caller.max_concurrent_requests > 1
+    assert resources.client.requests_per_second
@@ -1,6 +1,8 @@
 import pytest
 from unittest.mock import AsyncMock, Mock
 
+from starlette.datastructures import Secret
+
 from db.models import Author, Book, Review
 from server.form_validators import book_submit_fields, search_form_fields
 from server.resources import resources
@@ -61,6 +63,13 @@ def mock_openlib_caller(monkeypatch):
     return async_mock
 
 
+@pytest.fixture
+def mock_google_caller(monkeypatch):
+    async_mock = AsyncMock(return_value=[])
+    monkeypatch.setattr(resources.google_caller, "search_books", async_mock)
+    return async_mock
+
+
 @pytest.fixture
 def mock_queue_repo(monkeypatch):
     async_mock = AsyncMock()
@@ -107,6 +116,36 @@ def test_book_page(client, mock_book_repo):
     assert response.status_code == 200
 
 
+def test_cover(client, monkeypatch, tmp_path):
+    cover_path = tmp_path / "1-M.jpg"
+    cover_path.write_bytes(b"jpeg")
+    get_cover = AsyncMock(side_effect=lambda cover_id, size: cover_path if cover_id == 1 else None)
+    monkeypatch.setattr(resources.cover_store, "get", get_cover)
+
+    response = client.get("/covers/1-M.jpg")
+    assert response.status_code == 200
+    assert response.content == b"jpeg"
+    assert response.headers["content-type"] == "image/jpeg"
+    assert "immutable" in response.headers["cache-control"]
+    get_cover.assert_called_once_with(1, "M")
+
+    assert client.get("/covers/2-M.jpg").status_code == 404
+    assert client.get("/covers/1-XL.jpg").status_code == 404
+
+
+def test_call_metrics(client, monkeypatch):
+    assert client.get("/api/metrics").status_code == 404
+
+    monkeypatch.setattr("config.settings.CALL_METRICS_TOKEN", Secret("metrics-token"))
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer metrics-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE booksanon_api_request_seconds histogram" in response.text
+
+
 def test_author_page(client, mock_book_repo, mock_author_repo):
     response = client.get("/author/1")
     assert response.status_code == 200
@@ -170,7 +209,7 @@ def test_search_api(client, mock_book_repo, mock_book_record, mock_review_repo):
     mock_book_repo["search_books"].assert_called_once_with(search_query="Mock Book")
 
 
-def test_search_openlib(client, mock_openlib_caller, mock_review_repo):
+def test_search_openlib(client, mock_openlib_caller, mock_google_caller, mock_review_repo):
     mock_review_repo["get_most_recent_book_reviews"].return_value = []
     client.get("/")
     csrf_response = client.get("/api/csrf-token")